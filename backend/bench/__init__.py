@@ -0,0 +1,4 @@
+"""
+Benchmark harness: mock LLM server, synthetic calendars, micro-benchmarks
+and a /chat load generator. Run the modules from backend/ with python -m.
+"""
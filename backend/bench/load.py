@@ -0,0 +1,174 @@
+"""
+/chat Load Generator.
+Runs scripted conversations (greeting -> availability -> booking) from many
+concurrent clients and reports throughput and tail latency per turn.
+
+By default everything runs in-process: the mock LLM, a synthetic calendar
+in a throwaway SQLite file and the FastAPI app under uvicorn, with email in
+simulation mode. Every turn goes to the mock LLM, so its latency and error
+rates apply; --local-tier lets the local NLU tier answer the turns it is
+sure about, as in production. Point --url at a running backend to load it
+instead.
+
+    python -m bench.load --concurrency 16 --conversations 200 --latency-ms 400
+    python -m bench.load --url http://127.0.0.1:8000 --concurrency 8
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from bench.mock_llm import MockConfig, serve
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_app(workdir: Path, llm_url: str, days: int, density: float, local_tier: bool = False):
+    """Boots main.app on uvicorn in a daemon thread against a synthetic calendar."""
+    os.environ["OPENROUTER_API_KEY"] = "bench-key"
+    os.environ["OPENROUTER_BASE_URL"] = llm_url
+    os.environ["EMAIL_ADDRESS"] = ""  # never send real mail from a benchmark
+    os.environ["EMAIL_PASSWORD"] = ""
+    os.environ.pop("DATABASE_URL", None)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Every simulated client shares 127.0.0.1; measure the LLM gate, not the per-client bucket
+    os.environ.setdefault("CLIENT_RATE_PER_MIN", "1000000")
+    os.environ.setdefault("CLIENT_BURST", "1000000")
+    # Mock-model answers are not training data
+    os.environ["NLU_DECISION_LOG"] = "off"
+    if not local_tier:
+        os.environ["NLU_LOCAL_CONFIDENCE"] = "2"  # above 1: every turn goes to the model
+
+    from booking import db
+    from bench.synthetic import populate
+    db.DB_PATH = workdir / "load.db"
+    db.init_db()
+    calendar = populate(db.repo(), "2026-11-02", days=days, density=density)
+
+    import uvicorn
+    import main
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}", calendar["days"]
+
+def conversation(n: int, days: list[str], rng: random.Random) -> list[tuple]:
+    day = rng.choice(days)
+    hour = rng.choice(["09:00", "09:30", "10:15", "11:00", "14:00", "15:30", "16:00"])
+    return [
+        ("greeting", "Hi there!"),
+        ("availability", f"What slots are free on {day}?"),
+        ("book", f"Book a facial on {day} at {hour}, I'm User{n}, user{n}@example.com"),
+    ]
+
+def post_chat(base_url: str, session_id: str, message: str, history: list, timeout: float) -> tuple:
+    body = json.dumps({"session_id": session_id, "message": message, "history": history}).encode()
+    request = urllib.request.Request(f"{base_url}/chat", data=body, headers={"Content-Type": "application/json"})
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as res:
+            payload = json.loads(res.read())
+            ok = res.status == 200
+    except (urllib.error.URLError, TimeoutError, ValueError) as e:
+        payload, ok = {"text": str(e)}, False
+    return time.perf_counter() - t0, ok, payload
+
+def run_conversation(base_url: str, n: int, days: list[str], seed: int, timeout: float) -> list[tuple]:
+    rng = random.Random(seed + n)
+    history, samples = [], []
+    for turn, message in conversation(n, days, rng):
+        elapsed, ok, payload = post_chat(base_url, f"load-{seed}-{n}", message, history, timeout)
+        samples.append((turn, elapsed, ok))
+        history += [{"role": "user", "content": message}, {"role": "assistant", "content": payload.get("text", "")}]
+    return samples
+
+def _percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+def summarize(samples: list[tuple], wall: float) -> dict:
+    groups = {"all": list(samples)}
+    for s in samples:
+        groups.setdefault(s[0], []).append(s)
+    report = {}
+    for name, rows in groups.items():
+        ordered = sorted(r[1] for r in rows)
+        report[name] = {
+            "requests": len(rows),
+            "errors": sum(1 for r in rows if not r[2]),
+            "p50_ms": round(_percentile(ordered, 0.50) * 1000, 1),
+            "p95_ms": round(_percentile(ordered, 0.95) * 1000, 1),
+            "p99_ms": round(_percentile(ordered, 0.99) * 1000, 1),
+        }
+    report["all"]["throughput_rps"] = round(len(samples) / wall, 2) if wall else 0.0
+    report["all"]["wall_s"] = round(wall, 2)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="load an already running backend instead of starting one")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--conversations", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--days", type=int, default=20, help="synthetic calendar size (in-process mode)")
+    parser.add_argument("--density", type=float, default=0.5)
+    parser.add_argument("--latency-ms", type=float, default=300, help="mock LLM latency (in-process mode)")
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--local-tier", action="store_true", help="let the local NLU tier skip the mock LLM (in-process mode)")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    if args.url:
+        base_url = args.url.rstrip("/")
+        days = [f"2026-11-{d:02d}" for d in range(2, 7)]
+    else:
+        llm = serve(MockConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.malformed_rate, args.seed))
+        _, base_url, days = start_app(Path(tmp.name), f"http://127.0.0.1:{llm.server_port}/v1", args.days, args.density, args.local_tier)
+
+    # The app prints simulated emails; keep them out of the report
+    quiet = contextlib.redirect_stdout(io.StringIO()) if not args.url else contextlib.nullcontext()
+    t0 = time.perf_counter()
+    with quiet, ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(run_conversation, base_url, n, days, args.seed, args.timeout) for n in range(args.conversations)]
+        samples = [s for f in futures for s in f.result()]
+    report = summarize(samples, time.perf_counter() - t0)
+
+    print(f"{args.conversations} conversations, concurrency {args.concurrency}, "
+          f"{report['all']['throughput_rps']} req/s over {report['all']['wall_s']}s")
+    print(f"{'turn':14} {'requests':>9} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, r in report.items():
+        print(f"{name:14} {r['requests']:>9} {r['errors']:>7} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9}")
+
+    if not args.url:
+        from booking.telemetry import snapshot
+        report["server_stages"] = snapshot()
+        print("\nslowest server stages (p95 ms):")
+        stages = sorted(report["server_stages"].items(), key=lambda kv: kv[1]["p95_ms"], reverse=True)
+        for name, s in stages[:8]:
+            print(f"  {name:64} {s['p95_ms']:>9}  (n={s['count']})")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+    tmp.cleanup()
+    sys.exit(1 if report["all"]["errors"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Micro-benchmarks.
+Times the hot paths in isolation against a synthetic calendar in a
+throwaway SQLite file: slot generation (cold and cached), the db queries
+behind it, reminder wheel insert+cancel at 200k pending, and parsing of
+model output into an AgentDecision.
+
+    python -m bench.micro                          # print a table
+    python -m bench.micro --json bench.json        # save results
+    python -m bench.micro --baseline bench.json    # fail on p50 regressions
+
+Exit status is 1 when any benchmark's p50 is slower than the baseline by
+more than --tolerance (default 25%).
+"""
+import argparse
+import itertools
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SAMPLE_RESPONSES = [
+    # Prose around the JSON, the usual shape of free-tier model output
+    'Sure! Here is the decision:\n{"intent": "book", "secondary_intents": [], "confidence": 0.93, '
+    '"target_date": "2026-10-21", "target_time": "10:00", "user_name": "Ann", "user_email": "ann@example.com", '
+    '"missing_info": [], "reasoning": "clear request", "response_text": "Booking you in.", "detected_preferences": ["mornings"]}\n'
+    'Let me know if you need anything else.',
+    '{"intent": "availability", "confidence": 0.8, "reasoning": "asks for slots", "response_text": "Here are some times."}',
+    '```json\n{"intent": "greeting", "confidence": 0.99, "user_style": "exploratory", "reasoning": "hello", '
+    '"response_text": "Hi there!"}\n```',
+]
+
+# Replies that need local repair: single quotes, trailing commas, out-of-enum values, truncation
+BROKEN_RESPONSES = [
+    "{'intent': 'book', 'confidence': 0.9, 'reasoning': 'ok', 'response_text': 'Booking you in.', 'missing_info': ['email',],}",
+    '{"intent": "Booking", "intent_drift": "drift", "confidence": 0.7, "reasoning": "r", "response_text": "Here are some ti',
+]
+
+def measure(fn, repeat: int = 200, warmup: int = 10) -> dict:
+    """Per-call timings; very fast functions are looped so each sample spans at least ~50us."""
+    for _ in range(warmup):
+        fn()
+    t0 = time.perf_counter()
+    fn()
+    inner = max(1, int(50e-6 / max(time.perf_counter() - t0, 1e-9)))
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(inner):
+            fn()
+        samples.append((time.perf_counter() - t0) / inner)
+    samples.sort()
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1e6
+    return {
+        "runs": repeat * inner,
+        "ops_per_s": round(repeat / sum(samples), 1),
+        "p50_us": round(pick(0.50), 2),
+        "p95_us": round(pick(0.95), 2),
+        "p99_us": round(pick(0.99), 2),
+    }
+
+def run(days: int, density: float, repeat: int, workdir: Path) -> dict:
+    from booking import db, cache
+    from booking.brain import Brain, parse_decision
+    from booking.availability import get_open_slots
+    from booking.reminders import TimingWheel
+    from bench.synthetic import populate
+
+    db.DB_PATH = workdir / "bench.db"
+    db._repo = None
+    cache._store = cache.LocalVersionStore()
+    db.init_db()
+    calendar = populate(db.repo(), "2026-11-02", days=days, density=density)
+
+    rng = random.Random(1)
+    day_list = calendar["days"]
+    all_ids = [a["id"] for a in db.get_all_appointments()]
+    versions = cache.day_versions()
+    brain = Brain()
+    responses = itertools.cycle(SAMPLE_RESPONSES)
+    broken = itertools.cycle(BROKEN_RESPONSES)
+    fresh_ids = (f"bench-{n}" for n in itertools.count())
+
+    def slots_cold():
+        day = rng.choice(day_list)
+        versions.bump(day)  # forces the day index reload and slot regeneration
+        get_open_slots(f"{day}T09:00:00", service="facial")
+
+    hot_day = day_list[0]
+    def slots_warm():
+        get_open_slots(f"{hot_day}T09:00:00", service="facial")
+
+    def between():
+        day = rng.choice(day_list)
+        db.get_appointments_between(f"{day}T00:00:00-06:00", f"{day}T23:59:59-06:00")
+
+    def by_email():
+        db.get_active_appointments_by_email(rng.choice(calendar["contacts"]))
+
+    def by_id():
+        db.get_appointment(rng.choice(all_ids))
+
+    def scan():
+        for appt in db.iter_appointments():
+            appt["start_iso"]
+
+    def insert():
+        day = rng.choice(day_list)
+        db.repo().insert_appointment({
+            "id": next(fresh_ids), "name": "Bench", "contact": "bench@example.com", "service": "Glow Consultation",
+            "start_iso": f"{day}T09:00:00-06:00", "end_iso": f"{day}T09:30:00-06:00", "status": "cancelled",
+        })
+
+    # 200k pending reminders spread over a month of 1s ticks
+    wheel = TimingWheel(0)
+    for n in range(200_000):
+        wheel.add(n, rng.randrange(1, 30 * 86400), None)
+    wheel_keys = itertools.count(200_000)
+    def wheel_add_remove():
+        key = next(wheel_keys)
+        wheel.add(key, rng.randrange(1, 30 * 86400), None)
+        wheel.remove(key - 200_000)
+
+    def clean_json():
+        brain._clean_json(next(responses))
+
+    def parse():
+        parse_decision(next(responses))
+
+    def parse_repair():
+        parse_decision(next(broken))
+
+    benches = {
+        "availability.get_open_slots.cold": slots_cold,
+        "availability.get_open_slots.warm": slots_warm,
+        "db.get_appointments_between": between,
+        "db.get_active_appointments_by_email": by_email,
+        "db.get_appointment": by_id,
+        "db.get_all_appointments": db.get_all_appointments,
+        "db.iter_appointments": scan,
+        "db.insert_appointment": insert,
+        "reminders.TimingWheel.add_remove": wheel_add_remove,
+        "brain._clean_json": clean_json,
+        "brain.parse_decision": parse,
+        "brain.parse_decision.repair": parse_repair,
+    }
+    results = {"_meta": {"appointments": calendar["appointments"], "days": days, "density": density}}
+    for name, fn in benches.items():
+        results[name] = measure(fn, repeat=repeat)
+    return results
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, res in results.items():
+        base = baseline.get(name)
+        if name.startswith("_") or not base:
+            continue
+        if res["p50_us"] > base["p50_us"] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {base['p50_us']}us -> {res['p50_us']}us")
+    return regressions
+
+def print_table(results: dict):
+    meta = results["_meta"]
+    print(f"Synthetic calendar: {meta['appointments']} appointments over {meta['days']} working days")
+    print(f"{'benchmark':40} {'ops/s':>10} {'p50 us':>10} {'p95 us':>10} {'p99 us':>10}")
+    for name, r in results.items():
+        if name.startswith("_"):
+            continue
+        print(f"{name:40} {r['ops_per_s']:>10} {r['p50_us']:>10} {r['p95_us']:>10} {r['p99_us']:>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--density", type=float, default=0.6)
+    parser.add_argument("--repeat", type=int, default=300)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare against a previous --json file")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = run(args.days, args.density, args.repeat, Path(tmp))
+    print_table(results)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
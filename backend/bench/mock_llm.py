@@ -0,0 +1,160 @@
+"""
+Mock LLM Server.
+A local OpenAI-compatible /chat/completions endpoint for benchmarks. It
+answers with an AgentDecision-shaped JSON built from the last user message
+(dates, times and emails are picked out with regexes), after a configurable
+delay, and can be told to fail or to return malformed output.
+
+    python -m bench.mock_llm --port 8099 --latency-ms 400 --error-rate 0.05
+
+Then start the backend with OPENROUTER_BASE_URL=http://127.0.0.1:8099/v1
+and any non-placeholder OPENROUTER_API_KEY.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class MockConfig:
+    def __init__(self, latency_ms: float = 300, jitter_ms: float = 100, error_rate: float = 0.0,
+                 malformed_rate: float = 0.0, seed: int = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def roll(self) -> tuple:
+        """(delay seconds, fail?, malformed?) for one request."""
+        with self.lock:
+            self.requests += 1
+            delay = max(0.0, self.rng.gauss(self.latency_ms, self.jitter_ms)) / 1000
+            return delay, self.rng.random() < self.error_rate, self.rng.random() < self.malformed_rate
+
+def decide(message: str) -> dict:
+    """A plausible model decision for `message`."""
+    msg = message.lower()
+    date = re.search(r"\d{4}-\d{2}-\d{2}", msg)
+    clock = re.search(r"\b(\d{1,2}:\d{2})\b", msg)
+    email = re.search(r"[\w\.-]+@[\w\.-]+\.\w+", msg)
+    name = re.search(r"i'?m (\w+)", msg)
+
+    if "cancel" in msg:
+        intent = "cancel"
+    elif "move" in msg or "reschedule" in msg:
+        intent = "reschedule"
+    elif "book" in msg:
+        intent = "book"
+    elif "available" in msg or "slots" in msg or "free" in msg:
+        intent = "availability"
+    elif re.search(r"\b(hi|hello|hey)\b", msg):
+        intent = "greeting"
+    else:
+        intent = "question"
+
+    missing = []
+    if intent in ("book", "reschedule"):
+        if not date: missing.append("date")
+        if not clock: missing.append("time")
+    if intent in ("book", "cancel", "reschedule") and not email:
+        missing.append("email")
+
+    return {
+        "intent": intent,
+        "secondary_intents": [],
+        "confidence": 0.92,
+        "intent_drift": "steady",
+        "user_style": "decisive",
+        "trust_level": "new",
+        "cognitive_load": "low",
+        "ambiguity_status": "clear",
+        "audit_score": 0.9,
+        "missing_info": missing,
+        "target_date": date.group(0) if date else None,
+        "target_time": clock.group(1).zfill(5) if clock else None,
+        "user_name": name.group(1).title() if name else None,
+        "user_contact": None,
+        "user_email": email.group(0) if email else None,
+        "recurrence": None,
+        "detected_preferences": [],
+        "reasoning": "mock",
+        "response_text": f"Mock response for {intent}.",
+    }
+
+def _completion(content: str, model: str) -> dict:
+    return {
+        "id": f"mock-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+def make_handler(config: MockConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, payload: dict):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._send(404, {"error": {"message": "not found"}})
+
+            delay, fail, malformed = config.roll()
+            time.sleep(delay)
+            if fail:
+                return self._send(500, {"error": {"message": "mock upstream failure", "type": "server_error"}})
+
+            user_turns = [m["content"] for m in request.get("messages", []) if m.get("role") == "user"]
+            decision = json.dumps(decide(user_turns[-1] if user_turns else ""))
+            # Real models often wrap the JSON in prose; malformed answers cut it short
+            content = decision[: len(decision) // 2] if malformed else f"Here is my decision:\n{decision}"
+            self._send(200, _completion(content, request.get("model", "mock")))
+
+    return Handler
+
+def serve(config: MockConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Starts the server on a daemon thread; port 0 picks a free port (see server.server_port)."""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = MockConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.malformed_rate, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    print(f"Mock LLM listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Local NLU Benchmark.
+Scores the local tier against decisions the remote brain logged
+(NLU_DECISION_LOG, one JSON object per turn) with k-fold cross-validation:
+each fold is classified by a model trained on the seed set plus the other
+folds. Reports intent and entity agreement, how many turns would skip the
+model at --threshold (and how often those agree), and per-turn latency.
+
+    python -m bench.nlu --log data/decisions.jsonl --threshold 0.9
+
+Without a log a small hand-labelled set below is used, so the numbers are
+only indicative until real traffic has been logged.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Same shape as the decision log; "today" anchors relative dates
+LABELLED = [
+    {"today": "2026-10-19", "message": "hey there", "intent": "greeting"},
+    {"today": "2026-10-19", "message": "Hi! Is this the spa?", "intent": "greeting"},
+    {"today": "2026-10-19", "message": "good afternoon", "intent": "greeting"},
+    {"today": "2026-10-19", "message": "Book me a facial tomorrow at 2pm", "intent": "book", "target_date": "2026-10-20", "target_time": "14:00"},
+    {"today": "2026-10-19", "message": "I'd like a laser session on Thursday at 10:30", "intent": "book", "target_date": "2026-10-22", "target_time": "10:30"},
+    {"today": "2026-10-19", "message": "can you book me for Oct 28 at 9am, ann@example.com", "intent": "book", "target_date": "2026-10-28", "target_time": "09:00", "user_email": "ann@example.com"},
+    {"today": "2026-10-19", "message": "schedule a consultation next friday around 3", "intent": "book", "target_date": "2026-10-23", "target_time": "15:00"},
+    {"today": "2026-10-19", "message": "I want an appointment the day after tomorrow at noon", "intent": "book", "target_date": "2026-10-21", "target_time": "12:00"},
+    {"today": "2026-10-19", "message": "book this thursday 11am please", "intent": "book", "target_date": "2026-10-22", "target_time": "11:00"},
+    {"today": "2026-10-19", "message": "4pm", "last_reply": "I can arrange that. What time works best for you?", "intent": "book", "target_time": "16:00"},
+    {"today": "2026-10-19", "message": "sure, bob@example.com", "last_reply": "Excellent choice for 10:00. To confirm, may I have your email address?", "intent": "book", "user_email": "bob@example.com"},
+    {"today": "2026-10-19", "message": "can I get a facial in 3 days at 1:30", "intent": "book", "target_date": "2026-10-22", "target_time": "13:30"},
+    {"today": "2026-10-19", "message": "please reserve 2026-11-02 at 09:45 for me", "intent": "book", "target_date": "2026-11-02", "target_time": "09:45"},
+    {"today": "2026-10-19", "message": "I need to cancel my appointment, carol@example.com", "intent": "cancel", "user_email": "carol@example.com"},
+    {"today": "2026-10-19", "message": "cancel tomorrow's booking", "intent": "cancel", "target_date": "2026-10-20"},
+    {"today": "2026-10-19", "message": "I won't make it, please cancel", "intent": "cancel"},
+    {"today": "2026-10-19", "message": "drop my booking please", "intent": "cancel"},
+    {"today": "2026-10-19", "message": "can we move my facial to Wednesday at 2pm", "intent": "reschedule", "target_date": "2026-10-21", "target_time": "14:00"},
+    {"today": "2026-10-19", "message": "reschedule my appointment to next monday", "intent": "reschedule", "target_date": "2026-10-26"},
+    {"today": "2026-10-19", "message": "I need a different time for my consultation", "intent": "reschedule"},
+    {"today": "2026-10-19", "message": "change it to 3:30 instead", "intent": "reschedule", "target_time": "15:30"},
+    {"today": "2026-10-19", "message": "what's open tomorrow?", "intent": "availability", "target_date": "2026-10-20"},
+    {"today": "2026-10-19", "message": "do you have availability on Friday afternoon", "intent": "availability", "target_date": "2026-10-23"},
+    {"today": "2026-10-19", "message": "any slots for laser next week?", "intent": "availability", "target_date": "2026-10-26"},
+    {"today": "2026-10-19", "message": "when's your next opening", "intent": "availability"},
+    {"today": "2026-10-19", "message": "are you free this afternoon", "intent": "availability", "target_date": "2026-10-19"},
+    {"today": "2026-10-19", "message": "how much does the hydration facial cost?", "intent": "question"},
+    {"today": "2026-10-19", "message": "what should I do before a laser treatment", "intent": "question"},
+    {"today": "2026-10-19", "message": "this is my first visit, what do you recommend?", "intent": "question"},
+    {"today": "2026-10-19", "message": "show me my booking history", "intent": "question"},
+    {"today": "2026-10-19", "message": "do you have parking", "intent": "question"},
+    {"today": "2026-10-19", "message": "thank you so much", "intent": "question"},
+    {"today": "2026-10-19", "message": "no that's the wrong time", "intent": "correction"},
+    {"today": "2026-10-19", "message": "you misheard, I said friday", "intent": "correction", "target_date": "2026-10-23"},
+    {"today": "2026-10-19", "message": "that email is wrong, it's dan@example.com", "intent": "correction", "user_email": "dan@example.com"},
+]
+
+ENTITIES = ("target_date", "target_time", "user_email")
+
+def _percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+def evaluate(records: list[dict], folds: int, threshold: float) -> dict:
+    from booking import nlu
+    from booking.brain import LOCAL_INTENTS
+    from booking.timeutil import business_zone
+
+    rng = random.Random(3)
+    order = list(range(len(records)))
+    rng.shuffle(order)
+    folds = max(2, min(folds, len(records)))
+    intent_hits, entity_hits, entity_total = 0, {e: 0 for e in ENTITIES}, {e: 0 for e in ENTITIES}
+    local_turns, local_hits, latencies, train_seconds = 0, 0, [], 0.0
+    per_intent = {}
+
+    for k in range(folds):
+        test = [records[i] for n, i in enumerate(order) if n % folds == k]
+        t0 = time.perf_counter()
+        nlu._model = nlu.train([records[i] for n, i in enumerate(order) if n % folds != k])
+        train_seconds += time.perf_counter() - t0
+        for r in test:
+            today = datetime.fromisoformat(r["today"]).replace(hour=9, tzinfo=business_zone())
+            history = [{"role": "assistant", "content": r["last_reply"]}] if r.get("last_reply") else []
+            t0 = time.perf_counter()
+            d = nlu.understand(r["message"], history, today)
+            latencies.append((time.perf_counter() - t0) * 1e6)
+
+            hit = d["intent"] == r["intent"]
+            intent_hits += hit
+            stats = per_intent.setdefault(r["intent"], [0, 0])
+            stats[0] += hit
+            stats[1] += 1
+            for e in ENTITIES:
+                if r.get(e) is not None:
+                    entity_total[e] += 1
+                    entity_hits[e] += d[e] == r[e]
+            if d["confidence"] >= threshold and d["intent"] in LOCAL_INTENTS and not d["defer"]:
+                local_turns += 1
+                local_hits += hit
+
+    nlu._model = None
+    latencies.sort()
+    n = len(records)
+    return {
+        "turns": n,
+        "folds": folds,
+        "intent_accuracy": round(intent_hits / n, 3),
+        "per_intent": {i: round(h / t, 3) for i, (h, t) in sorted(per_intent.items())},
+        "entity_accuracy": {e: round(entity_hits[e] / entity_total[e], 3) if entity_total[e] else None for e in ENTITIES},
+        "threshold": threshold,
+        "answered_locally": round(local_turns / n, 3),
+        "local_accuracy": round(local_hits / local_turns, 3) if local_turns else None,
+        "latency_us": {"p50": round(_percentile(latencies, 0.5), 1), "p99": round(_percentile(latencies, 0.99), 1)},
+        "train_seconds_per_fold": round(train_seconds / folds, 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", type=Path, default=None, help="decision log (default: NLU_DECISION_LOG)")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=None, help="default: NLU_LOCAL_CONFIDENCE")
+    parser.add_argument("--json", type=Path, default=None, help="write the results here")
+    args = parser.parse_args()
+
+    from booking import nlu
+    from booking.brain import _local_confidence
+    records = nlu.read_log(args.log or nlu._log_path())
+    source = str(args.log or nlu._log_path())
+    if not records:
+        records, source = LABELLED, "built-in labelled set"
+    records = [r for r in records if r.get("intent") in nlu.INTENTS]
+    results = evaluate(records, args.folds, args.threshold if args.threshold is not None else _local_confidence())
+    results["source"] = source
+
+    print(f"{results['turns']} turns from {source}, {results['folds']}-fold")
+    print(f"intent accuracy      {results['intent_accuracy']:.1%}")
+    for intent, acc in results["per_intent"].items():
+        print(f"  {intent:18} {acc:.1%}")
+    for entity, acc in results["entity_accuracy"].items():
+        print(f"{entity:20} {'n/a' if acc is None else f'{acc:.1%}'}")
+    local_acc = results["local_accuracy"]
+    print(f"answered locally     {results['answered_locally']:.1%} at confidence >= {results['threshold']}"
+          f" ({'n/a' if local_acc is None else f'{local_acc:.1%}'} agree with the model)")
+    print(f"latency              p50 {results['latency_us']['p50']} us, p99 {results['latency_us']['p99']} us")
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    sys.exit(main())
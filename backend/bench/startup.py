@@ -0,0 +1,99 @@
+"""
+Startup Benchmark.
+Measures how fast a fresh instance can serve:
+- import time of `main` via `python -X importtime`, with the slowest modules
+- time from process start to the first 200 from /metrics, under plain
+  uvicorn and (where fork exists) under serve.py
+
+    python -m bench.startup --budget-ms 600
+
+Exit status is 1 when importing main takes longer than --budget-ms.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("OPENROUTER_API_KEY", "bench-key")
+    env["LOG_LEVEL"] = "WARNING"
+    return env
+
+def import_profile(runs: int = 3) -> dict:
+    """Best-of-N cumulative import time of main, plus the modules with the most self time."""
+    best = None
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                              cwd=BACKEND, env=_env(), capture_output=True, text=True, check=True)
+        rows = []
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            rows.append((name.strip(), int(self_us), int(cumulative_us)))
+        total = next(c for n, _, c in rows if n == "main")
+        if best is None or total < best["total_ms"] * 1000:
+            top = sorted(rows, key=lambda r: r[1], reverse=True)[:10]
+            best = {"total_ms": round(total / 1000, 1), "top_self_ms": [(n, round(s / 1000, 1)) for n, s, _ in top]}
+    return best
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def time_to_first_response(cmd: list[str], port: int, timeout: float = 30) -> float:
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=BACKEND, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - t0 < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=1) as res:
+                    if res.status == 200:
+                        return round((time.perf_counter() - t0) * 1000, 1)
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"{cmd[0]} did not answer within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=600)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    profile = import_profile()
+    print(f"import main: {profile['total_ms']} ms (budget {args.budget_ms} ms)")
+    print("slowest modules (self time):")
+    for name, ms in profile["top_self_ms"]:
+        print(f"  {name:50} {ms:>8} ms")
+
+    port = _free_port()
+    uvicorn_ms = time_to_first_response(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"], port)
+    print(f"\nfirst response, uvicorn: {uvicorn_ms} ms")
+    if hasattr(os, "fork"):
+        port = _free_port()
+        serve_ms = time_to_first_response(
+            [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port), "--workers", str(args.workers)], port)
+        print(f"first response, serve.py: {serve_ms} ms")
+        port = _free_port()
+        preload_ms = time_to_first_response(
+            [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port), "--workers", str(args.workers), "--preload-sdk"], port)
+        print(f"first response, serve.py --preload-sdk: {preload_ms} ms")
+
+    if profile["total_ms"] > args.budget_ms:
+        print(f"OVER BUDGET by {profile['total_ms'] - args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Synthetic Calendars.
+Fills a repository with realistic working days: bookings of the configured
+services laid on the slot grid inside working hours, skipping lunch and
+respecting the buffer, at a target density per day. Rows are written
+straight through the repository, so populate before the app has cached
+any of the affected days.
+"""
+import random
+from datetime import datetime, timedelta
+
+from booking.rules import get_rules
+from booking.timeutil import to_local
+
+def _at(day: datetime, hm: str) -> datetime:
+    h, m = hm.split(":")
+    return day.replace(hour=int(h), minute=int(m), second=0, microsecond=0)
+
+def working_days(first_day: str, days: int) -> list[datetime]:
+    rules = get_rules()
+    start = to_local(first_day).replace(hour=0, minute=0, second=0, microsecond=0)
+    out = []
+    cursor = start
+    while len(out) < days:
+        if cursor.weekday() in rules.work_days:
+            out.append(cursor)
+        cursor += timedelta(days=1)
+    return out
+
+def day_schedule(day: datetime, density: float, rng: random.Random) -> list[dict]:
+    """One day's bookings; density 0..1 is the chance each grid step starts a booking."""
+    rules = get_rules()
+    grid = timedelta(minutes=rules.slot_grid_minutes)
+    buffer = timedelta(minutes=rules.buffer_minutes)
+    lunch = (_at(day, rules.lunch_start), _at(day, rules.lunch_end))
+    end_day = _at(day, rules.day_end)
+    services = list(rules.services.items())
+
+    appts = []
+    t = _at(day, rules.day_start)
+    while t < end_day:
+        key, svc = rng.choice(services)
+        end = t + timedelta(minutes=svc["duration"])
+        fits = end <= end_day and (end <= lunch[0] or t >= lunch[1])
+        if fits and rng.random() < density:
+            appts.append({"service": svc["name"], "start": t, "end": end})
+            # Next start: after the buffer, rounded up to the grid
+            t = end + buffer
+            t = t + (-(t - day) % grid)
+        else:
+            t += grid
+    return appts
+
+def populate(repo, first_day: str, days: int = 20, density: float = 0.6, clients: int = 200,
+             cancelled_ratio: float = 0.1, seed: int = 7) -> dict:
+    """
+    Writes `days` working days of bookings starting at `first_day`.
+    Returns {"appointments", "days", "contacts"} so benchmarks can pick
+    realistic lookups.
+    """
+    rng = random.Random(seed)
+    contacts = [f"client{i}@example.com" for i in range(clients)]
+    total = 0
+    for day in working_days(first_day, days):
+        for n, slot in enumerate(day_schedule(day, density, rng)):
+            contact = rng.choice(contacts)
+            repo.insert_appointment({
+                "id": f"syn-{slot['start']:%Y%m%d%H%M}-{n}",
+                "name": contact.split("@")[0].title(),
+                "contact": contact,
+                "service": slot["service"],
+                "start_iso": slot["start"].isoformat(),
+                "end_iso": slot["end"].isoformat(),
+                "status": "cancelled" if rng.random() < cancelled_ratio else "booked",
+            })
+            total += 1
+    return {"appointments": total, "days": [d.date().isoformat() for d in working_days(first_day, days)], "contacts": contacts}
@@ -0,0 +1,161 @@
+"""
+Admission Control.
+Keeps latency bounded when traffic spikes or the free-tier models start
+rate-limiting:
+- token buckets per session and per client turn away floods at the door
+- LLMGate caps outstanding model calls; excess turns wait in a bounded
+  priority queue where booking-completion turns outrank small talk
+- turns that cannot get a slot in time are shed to the local fallback
+  brain instead of timing out together
+"""
+import heapq
+import itertools
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from .telemetry import increment, register_collector
+
+# Lower number = served first
+PRIORITY_BOOKING = 0
+PRIORITY_NORMAL = 1
+PRIORITY_SMALL_TALK = 2
+
+_EMAIL = re.compile(r"[\w\.-]+@[\w\.-]+\.\w+")
+_DATE_OR_TIME = re.compile(r"\d{4}-\d{2}-\d{2}|\b\d{1,2}(:\d{2})?\s?(am|pm)\b|\b\d{1,2}:\d{2}\b", re.IGNORECASE)
+_SMALL_TALK = re.compile(r"^\W*(hi|hello|hey|thanks|thank you|good (morning|afternoon|evening)|ok(ay)?|cool)\b[\W\w]{0,20}$", re.IGNORECASE)
+
+def turn_priority(message: str, history: list) -> int:
+    """
+    Cheap guess at what a turn is worth before any model call: supplying the
+    email/date/time a booking was waiting for ranks highest, greetings lowest.
+    """
+    msg = message.strip()
+    last_reply = next((h.get("content", "") for h in reversed(history) if h.get("role") == "assistant"), "").lower()
+    if _EMAIL.search(msg) or ("book" in msg.lower() and _DATE_OR_TIME.search(msg)):
+        return PRIORITY_BOOKING
+    if any(k in last_reply for k in ("email", "what time", "which time", "confirm")) and len(msg) < 80:
+        return PRIORITY_BOOKING
+    if _SMALL_TALK.match(msg):
+        return PRIORITY_SMALL_TALK
+    return PRIORITY_NORMAL
+
+class TokenBucket:
+    def __init__(self, rate_per_sec: float, burst: float):
+        self.rate = rate_per_sec
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+
+    def take(self, now: float) -> float:
+        """0 if a token was taken, else seconds until one is available."""
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class RateLimiter:
+    """Keyed token buckets; idle keys are dropped LRU-first past max_keys."""
+    def __init__(self, per_minute: float, burst: float, max_keys: int = 10000):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, key: str) -> float:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            self._buckets.move_to_end(key)
+            return bucket.take(time.monotonic())
+
+session_limiter = RateLimiter(float(os.getenv("SESSION_RATE_PER_MIN", "20")), float(os.getenv("SESSION_BURST", "5")))
+client_limiter = RateLimiter(float(os.getenv("CLIENT_RATE_PER_MIN", "60")), float(os.getenv("CLIENT_BURST", "20")))
+
+def admit(session_id: str, client: str) -> float:
+    """0 when the turn may proceed, else a Retry-After in seconds."""
+    wait = max(session_limiter.check(f"s:{session_id}"), client_limiter.check(f"c:{client}"))
+    if wait:
+        increment("booking_rate_limited_total")
+    return wait
+
+class LLMGate:
+    """
+    Counting semaphore over model calls with a bounded priority queue.
+    When the queue is full a newcomer either evicts the lowest-priority
+    waiter (if it outranks it) or is shed on the spot.
+    """
+    def __init__(self, max_concurrency: int, max_queue: int, wait_seconds: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.wait_seconds = wait_seconds
+        self.active = 0
+        self._queue = []  # heap of [priority, seq, state]; state: waiting|granted|shed
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _grant_next(self):
+        while self._queue and self.active < self.max_concurrency:
+            entry = heapq.heappop(self._queue)
+            if entry[2] == "waiting":
+                entry[2] = "granted"
+                self.active += 1
+        self._cond.notify_all()
+
+    def acquire(self, priority: int = PRIORITY_NORMAL) -> bool:
+        with self._cond:
+            waiting = [e for e in self._queue if e[2] == "waiting"]
+            if self.active < self.max_concurrency and not waiting:
+                self.active += 1
+                return True
+            if len(waiting) >= self.max_queue:
+                worst = max(waiting)
+                if worst[0] <= priority:
+                    increment("booking_llm_shed_total", {"reason": "queue_full"})
+                    return False
+                worst[2] = "shed"  # the newcomer outranks it
+                increment("booking_llm_shed_total", {"reason": "evicted"})
+            entry = [priority, next(self._seq), "waiting"]
+            heapq.heappush(self._queue, entry)
+            self._grant_next()
+            deadline = time.monotonic() + self.wait_seconds
+            while entry[2] == "waiting":
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    entry[2] = "shed"
+                    increment("booking_llm_shed_total", {"reason": "timeout"})
+                    break
+                self._cond.wait(remaining)
+            self._queue = [e for e in self._queue if e[2] == "waiting"]
+            heapq.heapify(self._queue)
+            return entry[2] == "granted"
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._grant_next()
+
+    def depth(self) -> int:
+        with self._cond:
+            return sum(1 for e in self._queue if e[2] == "waiting")
+
+llm_gate = LLMGate(
+    int(os.getenv("LLM_MAX_CONCURRENCY", "4")),
+    int(os.getenv("LLM_MAX_QUEUE", "16")),
+    float(os.getenv("LLM_QUEUE_WAIT_SECONDS", "8")),
+)
+
+@register_collector
+def _gate_gauges():
+    return [
+        ("booking_llm_active_calls", {}, llm_gate.active),
+        ("booking_llm_queue_depth", {}, llm_gate.depth()),
+    ]
@@ -1,3 +1,4 @@
+import re
 import uuid
 from datetime import datetime, timedelta
 from dateutil import tz
@@ -5,36 +6,58 @@ from dateutil.parser import parse, isoparse
 
 from .rules import get_rules
 from .availability import get_open_slots
-from .db import insert_appointment, get_appointment, update_appointment_time, cancel_appointment, get_user_preferences, update_user_preferences, get_active_appointments_by_email, get_all_user_appointments
+from .db import SlotConflict, Appointment, insert_appointment, get_appointment_by_idempotency_key, get_appointment, cancel_appointment, get_user_preferences, update_user_preferences, get_active_appointments_by_email, get_all_user_appointments
 from .brain import Brain, AgentDecision
 from .intelligence import (
-    calculate_integrity_score, simulate_future_schedule,
     analyze_conversation_style, evaluate_time_value, calculate_ambiguity_score,
     autonomous_schedule_optimizer, predict_no_show_risk, route_request_to_staff, detect_bias_and_fairness, calculate_booking_quality
 )
 from .email_service import send_confirmation_email
+from .day_index import get_integrity_score
+from .simulation import simulate_proposals, rank_alternatives
+from .waitlist import join_waitlist, expire_holds
+from .recurrence import book_series
+from .reschedule import reschedule_appointments
+from .reminders import schedule_reminders
+from .telemetry import span
+from .timeutil import to_local, interval
+from .singleflight import turn_key
+from .admission import turn_priority
 
 brain = Brain()
 sessions = {}
 
-def handle_request(session_id: str, message: str, history: list) -> dict:
+RESCHEDULE_ALL = re.compile(r"\b(all|both|every|everything)\b", re.IGNORECASE)
+
+def handle_request(session_id: str, message: str, history: list, request_id: str = None) -> dict:
+    with span("handle_request"):
+        return _handle_request(session_id, message, history, request_id)
+
+def _handle_request(session_id: str, message: str, history: list, request_id: str = None) -> dict:
     rules = get_rules()
     now_str = datetime.now().isoformat()
-    prefs = get_user_preferences(session_id)
+    with span("prefs_load"):
+        prefs = get_user_preferences(session_id)
+    with span("waitlist_expiry"):
+        expire_holds()  # Lapsed waitlist holds go back to the next client in line
     
     # --- PHASE 3 INTELLIGENCE PIPELINE ---
     
     # 1. Cognitive State Analysis
-    convo_metrics = analyze_conversation_style(history)
+    with span("intelligence.conversation"):
+        convo_metrics = analyze_conversation_style(history)
     
     # 2. Calendar Health & Optimization (Autonomous Systems)
-    # In prod, we'd query real DB appointments. Here passing empty or mock list for demo safety.
-    optimizer_report = autonomous_schedule_optimizer([])
-    integrity = calculate_integrity_score([], datetime.now(), datetime.now())
+    # Integrity is maintained incrementally per day by the calendar index.
+    with span("intelligence.optimizer"):
+        optimizer_report = autonomous_schedule_optimizer([])
+    with span("intelligence.integrity"):
+        integrity = get_integrity_score(datetime.now(tz.gettz(rules.timezone)))
     
     # 3. Risk & Routing
-    risk_data = predict_no_show_risk(history)
-    staff_assignment = route_request_to_staff("General")
+    with span("intelligence.risk_routing"):
+        risk_data = predict_no_show_risk(history)
+        staff_assignment = route_request_to_staff("General")
     
     # 4. Time Value & Context Construction
     curr_hour_val = evaluate_time_value(now_str)
@@ -65,7 +88,8 @@ def handle_request(session_id: str, message: str, history: list) -> dict:
     """
     
     # 5. Neural Processing (Brain)
-    decision: AgentDecision = brain.think(message, history, context)
+    with span("brain"):
+        decision: AgentDecision = brain.think(message, history, context, priority=turn_priority(message, history))
     
     # 6. Ambiguity Check (Ambiguity Budgeting)
     ambiguity = calculate_ambiguity_score(message, decision.dict())
@@ -87,43 +111,98 @@ def handle_request(session_id: str, message: str, history: list) -> dict:
     
     # 8. Action Logic & Safety Simulation
     if decision.intent == "book" and decision.confidence > 0.8 and not decision.missing_info:
-        # Detect Service
-        chosen_service_key = "consultation"
-        for key, srv in rules.services.items():
-            if key in message.lower() or srv['name'].lower() in message.lower():
-                chosen_service_key = key
-        
+        chosen_service_key = detect_service(message) or "consultation"
         service_info = rules.services[chosen_service_key]
         duration = service_info['duration']
 
-        sim_result = simulate_future_schedule(
-            decision.target_date + "T" + (decision.target_time or "09:00"), 
-            duration,
-            [] 
-        )
+        requested_iso = decision.target_date + "T" + (decision.target_time or "09:00")
+        if decision.recurrence:
+            # One series row, validated against the calendar in a single pass
+            with span("booking", kind="series"):
+                result = book_series(
+                    decision.user_name, decision.user_email or decision.user_contact, service_info['name'],
+                    decision.recurrence, requested_iso, duration
+                )
+            if result.get("series"):
+                response_payload["data"] = {"type": "series", "series": result["series"], "occurrences": result["occurrences"]}
+            elif result.get("conflicts"):
+                dates = ", ".join(parse(c["occurrence"]["start_iso"]).strftime("%b %d") for c in result["conflicts"][:5])
+                reason = result["conflicts"][0]["reason"]
+                response_payload['text'] = f"I paused this recurring booking. {len(result['conflicts'])} occurrence(s) can't be booked ({dates}; first: {reason}). Shall we try another time?"
+            else:
+                response_payload['text'] = f"I couldn't set up that repeating booking: {result['error']}"
+            return response_payload
+
+        # Retries of a turn that already booked get the same confirmation, not a second booking.
+        # Only client-supplied request ids are stored; retries without one are covered for
+        # the replay window by the turn coordinator, since a derived key would match the
+        # same opening words from any later conversation.
+        booking_key = turn_key(session_id, message, history, request_id) + ":book" if request_id else None
+        replayed = get_appointment_by_idempotency_key(booking_key) if booking_key else None
+        if replayed and replayed["status"] != "booked":
+            booking_key = replayed = None  # cancelled since: this is a new booking, not a retry
+        if replayed:
+            response_payload["data"] = {
+                "type": "confirmation",
+                "appointment": replayed,
+                "meta": {"staff": staff_assignment, "risk_assessment": risk_data, "replayed": True}
+            }
+            return response_payload
+
+        with span("simulation"):
+            sim_result = simulate_proposals(decision.target_date, [{"start_iso": requested_iso, "duration": duration}])[0]
         
         # Calculate Booking Quality for this specific slot
-        quality_score = calculate_booking_quality(decision.target_date + "T" + (decision.target_time or "09:00"), duration)
+        quality_score = calculate_booking_quality(requested_iso, duration)
         
-        if sim_result['recommendation'] == 'unsafe':
-            response_payload['text'] = f"I paused this booking. Conflict detected: {', '.join(sim_result['conflicts_detected'])}. Alternative?"
+        if sim_result['recommendation'] != 'safe':
+            # Rank the day's open slots in one batched simulation
+            candidates = [s["start"] for s in get_open_slots(decision.target_date, count=20, service=chosen_service_key)]
+            alternatives = rank_alternatives(decision.target_date, duration, candidates, requested_iso)
+            reasons = ", ".join(sim_result["conflicts_detected"]) or "I couldn't read that date"
+            response_payload['text'] = f"I paused this booking: {reasons}."
+            if alternatives:
+                times = ", ".join(parse(a["start_iso"]).strftime("%H:%M") for a in alternatives)
+                response_payload['text'] += f" Safer alternatives: {times}. Would one of these work?"
+                response_payload["data"] = {
+                    "type": "slots",
+                    "slots": [{"start": a["start_iso"], "end": (parse(a["start_iso"]) + timedelta(minutes=duration)).isoformat(), "score": a["integrity_after"], "reason": "Simulated safe alternative"} for a in alternatives]
+                }
+            elif decision.user_email:
+                entry = join_waitlist(
+                    decision.user_name, decision.user_email, chosen_service_key,
+                    decision.target_date + "T" + rules.day_start, decision.target_date + "T" + rules.day_end
+                )
+                response_payload['text'] += " That day is full, so I've added you to the waitlist. We'll hold the first slot that opens up and email you."
+                response_payload["data"] = {"type": "waitlist", "entry": entry}
+            else:
+                response_payload['text'] += " Alternative?"
         else:
-            appt = book_internal(
-                decision.user_name, 
-                decision.user_contact, 
-                service_info['name'], 
-                decision.target_date + "T" + (decision.target_time or "09:00"),
-                duration
-            )
+            try:
+                with span("booking"):
+                    appt = book_internal(
+                        decision.user_name,
+                        decision.user_email or decision.user_contact,  # reminders and lookups by email use it
+                        service_info['name'], 
+                        decision.target_date + "T" + (decision.target_time or "09:00"),
+                        duration,
+                        idempotency_key=booking_key,
+                        reminder_channels=("email", "sms") if risk_data["action"] == "SMS Reminder Recommended" else ("email",)
+                    )
+            except SlotConflict:
+                # Another booking won the race for this slot at the storage layer
+                response_payload['text'] = "That slot was just taken by another client. Shall I find you the next best time?"
+                return response_payload
             
             # SEND CONFIRMATION EMAIL
-            email_sent = send_confirmation_email(
-                decision.user_email,
-                decision.user_name,
-                decision.target_date,
-                decision.target_time,
-                details={"quality_score": quality_score, "staff": staff_assignment, "service": service_info['name']}
-            )
+            with span("email"):
+                email_sent = send_confirmation_email(
+                    decision.user_email,
+                    decision.user_name,
+                    decision.target_date,
+                    decision.target_time,
+                    details={"quality_score": quality_score, "staff": staff_assignment, "service": service_info['name']}
+                )
             
             email_note = " 📧 Confirmation email sent." if email_sent else ""
             response_payload['text'] += email_note
@@ -140,7 +219,8 @@ def handle_request(session_id: str, message: str, history: list) -> dict:
             
     elif decision.intent == "availability":
          target_date = decision.target_date if decision.target_date else now_str
-         slots = get_open_slots(target_date, count=5)
+         with span("availability"):
+             slots = get_open_slots(target_date, count=5, service=detect_service(message))
          response_payload["data"] = {"type": "slots", "slots": slots}
 
     elif decision.intent == "question":
@@ -174,42 +254,61 @@ def handle_request(session_id: str, message: str, history: list) -> dict:
                  # Ideally send cancellation email here
                  
     elif decision.intent == "reschedule":
-        # Multi-step: Cancel + Book
+        # Moved in place: the current slot is only given up once the new one is secured
         if not decision.user_email:
              response_payload["text"] = "I need your email address to find your existing appointment for rescheduling."
         else:
-             appts = get_active_appointments_by_email(decision.user_email)
+             # Only upcoming bookings can move; the list is oldest first, so appts[0] is the next one
+             now = datetime.now(tz.gettz(rules.timezone))
+             appts = [a for a in get_active_appointments_by_email(decision.user_email) if interval(a)[0] >= now]
              if not appts:
-                 response_payload["text"] = "No existing appointment found to reschedule."
+                 response_payload["text"] = "No upcoming appointment found to reschedule."
+             elif not (decision.target_date and decision.target_time):
+                 response_payload["text"] = f"Your appointment on {appts[0]['start_iso']} stays booked for now. What new time would you like?"
              else:
-                 # Cancel old
-                 old_appt = appts[0]
-                 cancel_appointment(old_appt['id'])
-                 
-                 # Book new (if date/time present)
-                 if decision.target_date and decision.target_time:
-                     # Reuse logic or recursive call? Recursive call is dangerous.
-                     # Duplicate minimal book logic
-                     # Detect Service from old appt
-                     service_name = old_appt['service'] # Try to match?
-                     # Fallback to consultation or existing
-                     duration = 30 # Default
-                     
-                     new_appt = book_internal(
-                        decision.user_name or old_appt['name'], 
-                        decision.user_contact or old_appt['contact'],
-                        service_name,
-                        decision.target_date + "T" + decision.target_time,
-                        duration
-                     )
-                     response_payload["text"] = f"Rescheduled from {old_appt['start_iso']} to {new_appt['start_iso']}."
+                 # "all"/"both": every upcoming appointment shifts with the first one, keeping their spacing
+                 batch = appts if RESCHEDULE_ALL.search(message) else appts[:1]
+                 shift = to_local(decision.target_date + "T" + decision.target_time) - interval(appts[0])[0]
+                 with span("reschedule"):
+                     result = reschedule_appointments([(a["id"], (interval(a)[0] + shift).isoformat()) for a in batch])
+                 if result.get("moved"):
+                     lines = [f"{old['start_iso']} to {new['start_iso']}" for old, new in zip(batch, result["moved"])]
+                     response_payload["text"] = "Rescheduled " + "; ".join(lines) + "."
+                     response_payload["data"] = {"type": "rescheduled", "appointments": result["moved"]}
+                 elif result.get("conflicts"):
+                     # Nothing moved: say which appointment can't go where, and what is open that day
+                     by_id = {a["id"]: a for a in batch}
+                     lines, offered = [], set()
+                     for c in result["conflicts"]:
+                         appt = by_id.get(c.get("id"))
+                         if not appt:  # lost a race at the storage layer
+                             lines.append(f"- {c['reason']}")
+                             continue
+                         line = f"- {appt['service']} on {parse(appt['start_iso']).strftime('%b %d, %H:%M')} to {parse(c['start_iso']).strftime('%a %b %d, %H:%M')}: {c['reason']}"
+                         if c["alternatives"] and appt["id"] not in offered:
+                             offered.add(appt["id"])
+                             line += ". Open that day: " + ", ".join(parse(s).strftime("%H:%M") for s in c["alternatives"])
+                         lines.append(line)
+                     kept = "appointments are" if len(batch) > 1 else "appointment is"
+                     response_payload["text"] = "That time doesn't work:\n" + "\n".join(lines[:5]) + f"\nNothing was moved, so your current {kept} still booked. What other time would you like?"
+                     response_payload["data"] = {"type": "reschedule_conflicts", "conflicts": result["conflicts"]}
                  else:
-                     response_payload["text"] = f"Cancelled {old_appt['start_iso']}. What new time would you like?"
+                     response_payload["text"] = f"I couldn't reschedule that: {result['error']}"
 
     return response_payload
 
-def book_internal(name, contact, service, start_iso, duration_minutes=30):
-    # Quick internal booker
+def detect_service(message: str):
+    # Service key mentioned in the message, if any
+    rules = get_rules()
+    found = None
+    for key, srv in rules.services.items():
+        if key in message.lower() or srv['name'].lower() in message.lower():
+            found = key
+    return found
+
+def book_internal(name, contact, service, start_iso, duration_minutes=30, idempotency_key=None, reminder_channels=("email",)):
+    # Quick internal booker; an idempotency_key seen before returns the appointment it booked
+    # (and schedules no second set of reminders)
     rules = get_rules()
     zone = tz.gettz(rules.timezone)
     try:
@@ -219,14 +318,16 @@ def book_internal(name, contact, service, start_iso, duration_minutes=30):
         start = datetime.now(zone) 
         
     end = start + timedelta(minutes=duration_minutes)
-    appt = {
-        "id": str(uuid.uuid4())[:8],
-        "name": name or "Guest",
-        "contact": contact or "Unknown",
-        "service": service,
-        "start_iso": start.isoformat(),
-        "end_iso": end.isoformat(),
-        "status": "booked",
-    }
-    insert_appointment(appt)
+    appt = Appointment(
+        id=str(uuid.uuid4())[:8],
+        name=name or "Guest",
+        contact=contact or "Unknown",
+        service=service,
+        start_iso=start.isoformat(),
+        end_iso=end.isoformat(),
+        status="booked",
+    )
+    if not insert_appointment(appt, idempotency_key):
+        return get_appointment_by_idempotency_key(idempotency_key)
+    schedule_reminders(appt, reminder_channels)
     return appt
@@ -0,0 +1,294 @@
+"""
+Booking Analytics.
+Reporting runs on an append-only columnar copy of the appointments table,
+never on the OLTP database. `snapshot()` is the only part that reads the
+live store: it appends one row per new or changed appointment to monthly
+partitions of raw NumPy column files. Reports memory-map the partitions
+they need and aggregate with vectorised group-bys.
+
+Layout under data/analytics/:
+    manifest.json          committed row counts, dictionaries, sequence
+    2026-10/<column>.bin   little-endian arrays, one element per row
+
+Rows are versions: the latest row (highest seq) of an appointment wins.
+When an appointment moves to another month, its old partition gets a
+"superseded" row, so a report only ever has to open the months it covers.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from .rules import get_rules
+from .timeutil import interval
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+ANALYTICS_DIR = Path(__file__).resolve().parents[1] / "data" / "analytics"
+
+COLUMNS = {
+    "appt": "<u8",        # hash of the appointment id
+    "seq": "<i8",         # snapshot-wide row sequence; the highest wins
+    "day": "<i4",         # local date ordinal
+    "start_min": "<i2",   # minutes after local midnight
+    "minutes": "<i2",
+    "service": "<i2",     # dictionary codes
+    "status": "<i1",
+    "price_cents": "<i4", # price when snapshotted, so later price changes don't rewrite history
+    "fp": "<u8",          # fingerprint of the fields above, to detect changes
+}
+SUPERSEDED = "superseded"
+
+_lock = threading.Lock()
+
+def _hash64(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+
+# --- Manifest & partitions ---
+
+def _read_manifest() -> dict:
+    path = ANALYTICS_DIR / "manifest.json"
+    if not path.exists():
+        return {"seq": 0, "partitions": {}, "dicts": {"service": [], "status": []}, "snapshot_at": None}
+    return json.loads(path.read_text())
+
+def _write_manifest(manifest: dict):
+    # Readers only ever see committed row counts: replace, never rewrite in place
+    tmp = ANALYTICS_DIR / "manifest.json.tmp"
+    tmp.write_text(json.dumps(manifest))
+    os.replace(tmp, ANALYTICS_DIR / "manifest.json")
+
+def _code(manifest: dict, dim: str, value: str) -> int:
+    values = manifest["dicts"][dim]
+    if value not in values:
+        values.append(value)
+    return values.index(value)
+
+def _open_partition(month: str, rows: int) -> dict:
+    if rows == 0:
+        return {c: np.empty(0, dtype=t) for c, t in COLUMNS.items()}
+    folder = ANALYTICS_DIR / month
+    return {c: np.memmap(folder / f"{c}.bin", dtype=t, mode="r", shape=(rows,)) for c, t in COLUMNS.items()}
+
+def _append_partition(month: str, committed: int, columns: dict):
+    folder = ANALYTICS_DIR / month
+    folder.mkdir(parents=True, exist_ok=True)
+    for c, t in COLUMNS.items():
+        path = folder / f"{c}.bin"
+        itemsize = np.dtype(t).itemsize
+        # Drop bytes a crashed writer left past the committed count
+        if path.exists() and path.stat().st_size != committed * itemsize:
+            os.truncate(path, committed * itemsize)
+        with open(path, "ab") as f:
+            f.write(np.asarray(columns[c], dtype=t).tobytes())
+
+def _months(first: date, last: date) -> list[str]:
+    out = []
+    y, m = first.year, first.month
+    while (y, m) <= (last.year, last.month):
+        out.append(f"{y:04d}-{m:02d}")
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return out
+
+def _latest(cols: dict) -> np.ndarray:
+    """Indices of the newest row of each appointment."""
+    if len(cols["appt"]) == 0:
+        return np.empty(0, dtype=np.int64)
+    order = np.lexsort((cols["seq"], cols["appt"]))
+    appt = cols["appt"][order]
+    last = np.ones(len(order), dtype=bool)
+    last[:-1] = appt[1:] != appt[:-1]
+    return order[last]
+
+def _concat(parts: list[dict]) -> dict:
+    return {c: np.concatenate([p[c] for p in parts]) if parts else np.empty(0, dtype=t) for c, t in COLUMNS.items()}
+
+# --- Snapshot (the only reader of the live store) ---
+
+def _service_price(service: str) -> int:
+    services = get_rules().services
+    for key, info in services.items():
+        if service in (key, info["name"]):
+            return int(round(info["price"] * 100))
+    return 0
+
+def snapshot(appointments=None) -> dict:
+    """
+    Appends rows for appointments that are new or changed since the last
+    snapshot. Safe to call from several workers: one writer at a time, the
+    others skip.
+    """
+    if appointments is None:
+        from .db import iter_appointments
+        appointments = iter_appointments()
+
+    ANALYTICS_DIR.mkdir(parents=True, exist_ok=True)
+    with _lock, open(ANALYTICS_DIR / ".lock", "w") as lock_file:
+        if fcntl:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return {"skipped": "another snapshot is running"}
+
+        manifest = _read_manifest()
+        months = sorted(manifest["partitions"])
+        parts = [_open_partition(m, manifest["partitions"][m]) for m in months]
+        known = _concat(parts)
+        part_of_row = np.repeat(np.arange(len(months)), [len(p["appt"]) for p in parts]) if parts else np.empty(0, dtype=np.int64)
+        latest = _latest(known)
+        previous = {
+            a: (fp, months[p])
+            for a, fp, p in zip(known["appt"][latest].tolist(), known["fp"][latest].tolist(), part_of_row[latest].tolist())
+        }
+
+        pending = {}  # month -> list of row dicts
+        seq = manifest["seq"]
+        superseded_code = _code(manifest, "status", SUPERSEDED)
+        tombstones = 0
+        for appt in appointments:
+            start, end = interval(appt)
+            h = _hash64(appt["id"])
+            fp = _hash64(f"{appt['start_iso']}|{appt['end_iso']}|{appt['status']}|{appt['service']}")
+            month = f"{start.year:04d}-{start.month:02d}"
+            before = previous.get(h)
+            if before and before[0] == fp:
+                continue
+            if before and before[1] != month:
+                # Older than the new row, newer than everything in the old partition
+                seq += 1
+                pending.setdefault(before[1], []).append({"appt": h, "seq": seq, "day": 0, "start_min": 0, "minutes": 0,
+                    "service": 0, "status": superseded_code, "price_cents": 0, "fp": 0})
+                tombstones += 1
+            seq += 1
+            row = {
+                "appt": h, "seq": seq, "day": start.date().toordinal(),
+                "start_min": start.hour * 60 + start.minute,
+                "minutes": int((end - start).total_seconds() // 60),
+                "service": _code(manifest, "service", appt["service"]),
+                "status": _code(manifest, "status", appt["status"]),
+                "price_cents": _service_price(appt["service"]), "fp": fp,
+            }
+            pending.setdefault(month, []).append(row)
+
+        appended = 0
+        for month, rows in pending.items():
+            committed = manifest["partitions"].get(month, 0)
+            _append_partition(month, committed, {c: [r[c] for r in rows] for c in COLUMNS})
+            manifest["partitions"][month] = committed + len(rows)
+            appended += len(rows)
+        manifest["seq"] = seq
+        manifest["snapshot_at"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+        _write_manifest(manifest)
+        return {"appended": appended, "superseded": tombstones, "seq": seq, "partitions": manifest["partitions"]}
+
+# --- Reports (memory-mapped columns only) ---
+
+def load(first: date, last: date) -> tuple:
+    """Latest rows of appointments on first..last (inclusive), plus the dictionaries."""
+    manifest = _read_manifest()
+    parts = [_open_partition(m, manifest["partitions"].get(m, 0)) for m in _months(first, last)]
+    cols = _concat(parts)
+    idx = _latest(cols)
+    cols = {c: v[idx] for c, v in cols.items()}
+    keep = (cols["day"] >= first.toordinal()) & (cols["day"] <= last.toordinal())
+    statuses = manifest["dicts"]["status"]
+    if SUPERSEDED in statuses:
+        keep &= cols["status"] != statuses.index(SUPERSEDED)
+    return {c: v[keep] for c, v in cols.items()}, manifest["dicts"]
+
+def _status_mask(cols: dict, dicts: dict, status: str) -> np.ndarray:
+    if status not in dicts["status"]:
+        return np.zeros(len(cols["status"]), dtype=bool)
+    return cols["status"] == dicts["status"].index(status)
+
+def _daily_capacity_minutes() -> int:
+    rules = get_rules()
+    to_min = lambda hm: int(hm[:2]) * 60 + int(hm[3:5])
+    return (to_min(rules.day_end) - to_min(rules.day_start)) - (to_min(rules.lunch_end) - to_min(rules.lunch_start))
+
+def _capacity(first: date, last: date) -> np.ndarray:
+    rules = get_rules()
+    days = (last - first).days + 1
+    weekdays = (np.arange(days) + first.weekday()) % 7
+    return np.where(np.isin(weekdays, list(rules.work_days)), _daily_capacity_minutes(), 0)
+
+def _group(codes: np.ndarray, weights: np.ndarray, size: int) -> np.ndarray:
+    return np.bincount(codes, weights=weights, minlength=size) if size else np.zeros(0)
+
+def utilization(first: date, last: date, by: str = "day") -> list[dict]:
+    """Booked minutes against working minutes, per day or service."""
+    cols, dicts = load(first, last)
+    booked = _status_mask(cols, dicts, "booked")
+    minutes = cols["minutes"][booked].astype(np.float64)
+    capacity = _capacity(first, last)
+
+    if by == "day":
+        per_day = _group(cols["day"][booked] - first.toordinal(), minutes, len(capacity))
+        return [
+            {"day": (first + timedelta(days=i)).isoformat(), "booked_minutes": int(per_day[i]),
+             "capacity_minutes": int(capacity[i]), "utilization": round(float(per_day[i] / capacity[i]), 4) if capacity[i] else None}
+            for i in range(len(capacity))
+        ]
+    if by != "service":
+        raise ValueError("by must be day or service")
+    names = dicts[by]
+    totals = _group(cols[by][booked], minutes, len(names))
+    counts = _group(cols[by][booked], None, len(names))
+    total_capacity = int(capacity.sum())
+    return [
+        {by: names[i], "appointments": int(counts[i]), "booked_minutes": int(totals[i]),
+         "utilization": round(float(totals[i] / total_capacity), 4) if total_capacity else None}
+        for i in range(len(names)) if counts[i]
+    ]
+
+def revenue(first: date, last: date, by: str = "service") -> list[dict]:
+    """Booked revenue from the prices captured at snapshot time, per service, day or month."""
+    cols, dicts = load(first, last)
+    booked = _status_mask(cols, dicts, "booked")
+    cents = cols["price_cents"][booked].astype(np.float64)
+
+    if by == "service":
+        names = dicts["service"]
+        totals = _group(cols["service"][booked], cents, len(names))
+        counts = _group(cols["service"][booked], None, len(names))
+        return [{"service": names[i], "appointments": int(counts[i]), "revenue": round(float(totals[i]) / 100, 2)}
+                for i in range(len(names)) if counts[i]]
+    if by not in ("day", "month"):
+        raise ValueError("by must be service, day or month")
+    days, inverse = np.unique(cols["day"][booked], return_inverse=True)
+    totals = _group(inverse, cents, len(days))
+    labels = [date.fromordinal(int(d)).isoformat()[: 7 if by == "month" else 10] for d in days]
+    out = {}
+    for label, total in zip(labels, totals.tolist()):
+        out[label] = out.get(label, 0.0) + total
+    return [{by: label, "revenue": round(total / 100, 2)} for label, total in out.items()]
+
+def cancellations(first: date, last: date, by: str = "service") -> list[dict]:
+    """Cancelled share of appointments (booked + cancelled) per service or day."""
+    cols, dicts = load(first, last)
+    cancelled = _status_mask(cols, dicts, "cancelled")
+    considered = cancelled | _status_mask(cols, dicts, "booked")
+
+    if by == "service":
+        names = dicts["service"]
+        keys, size = cols["service"], len(names)
+        label = lambda i: names[i]
+    elif by == "day":
+        keys, size = cols["day"] - first.toordinal(), (last - first).days + 1
+        label = lambda i: (first + timedelta(days=i)).isoformat()
+    else:
+        raise ValueError("by must be service or day")
+    total = _group(keys[considered], None, size)
+    lost = _group(keys[cancelled], None, size)
+    return [
+        {by: label(i), "appointments": int(total[i]), "cancelled": int(lost[i]), "cancellation_rate": round(float(lost[i] / total[i]), 4)}
+        for i in range(size) if total[i]
+    ]
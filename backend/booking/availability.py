@@ -1,85 +1,99 @@
 from datetime import datetime, timedelta
-from dateutil import tz
-from dateutil.parser import isoparse
 from .rules import get_rules
-from .db import get_appointments_between
+from .timeutil import to_local, business_zone, day_key
+from .day_index import get_day_index
+from .cache import VersionedCache, day_versions
+
+# (day, service, day version) -> chronological slot list; writes bump the
+# version of the days they touch, so stale entries are simply never hit again
+_slot_cache = VersionedCache()
 
 def _hm_to_time(hm: str):
     h, m = hm.split(":")
     return int(h), int(m)
 
-def get_open_slots(day_iso: str, count: int = 10) -> list[dict]:
+def _at(day: datetime, hm: str) -> datetime:
+    h, m = _hm_to_time(hm)
+    return day.replace(hour=h, minute=m, second=0, microsecond=0)
+
+def service_duration(service: str = None) -> int:
+    rules = get_rules()
+    if service in rules.services:
+        return rules.services[service]["duration"]
+    return rules.duration_minutes
+
+def free_intervals(day: datetime) -> list[tuple]:
     """
-    Returns a list of slots with 'score' and 'reasoning'.
+    Working hours minus lunch minus every booking padded by the buffer,
+    as sorted, non-overlapping (start, end) pairs.
     """
     rules = get_rules()
-    zone = tz.gettz(rules.timezone)
-    
-    try:
-        day = isoparse(day_iso)
-        if day.tzinfo is None:
-             day = day.replace(tzinfo=zone)
-        else:
-             day = day.astimezone(zone)
-    except:
-        day = datetime.now(zone)
-
-    if day.weekday() not in rules.work_days:
-        return []
-
-    sh, sm = _hm_to_time(rules.day_start)
-    eh, em = _hm_to_time(rules.day_end)
-    lh, lm = _hm_to_time(rules.lunch_start)
-    leh, lem = _hm_to_time(rules.lunch_end)
-
-    start_day = day.replace(hour=sh, minute=sm, second=0, microsecond=0)
-    end_day = day.replace(hour=eh, minute=em, second=0, microsecond=0)
+    buffer = timedelta(minutes=rules.buffer_minutes)
+    busy = [(_at(day, rules.lunch_start), _at(day, rules.lunch_end))]
+    busy += [(b0 - buffer, b1 + buffer) for b0, b1, _ in get_day_index(day).entries]
+    busy.sort()
 
-    lunch_start = day.replace(hour=lh, minute=lm, second=0, microsecond=0)
-    lunch_end = day.replace(hour=leh, minute=lem, second=0, microsecond=0)
+    free = []
+    cursor = _at(day, rules.day_start)
+    end_day = _at(day, rules.day_end)
+    for b0, b1 in busy:
+        if b0 > cursor:
+            free.append((cursor, min(b0, end_day)))
+        cursor = max(cursor, b1)
+        if cursor >= end_day:
+            break
+    if cursor < end_day:
+        free.append((cursor, end_day))
+    return [(f0, f1) for f0, f1 in free if f1 > f0]
 
-    step = timedelta(minutes=rules.duration_minutes + rules.buffer_minutes)
-    dur = timedelta(minutes=rules.duration_minutes)
-
-    existing = get_appointments_between(start_day.isoformat(), end_day.isoformat())
-    booked_ranges = [(isoparse(a["start_iso"]), isoparse(a["end_iso"])) for a in existing]
+def _generate_slots(day: datetime, service: str = None) -> list[dict]:
+    rules = get_rules()
+    grid = timedelta(minutes=rules.slot_grid_minutes)
+    dur = timedelta(minutes=service_duration(service))
+    origin = _at(day, rules.day_start)
 
     slots = []
-    t = start_day
-    
-    while t + dur <= end_day and len(slots) < count:
-        score = 100
-        reason = "Standard slot"
-        
-        # Lunch check
-        if (t < lunch_end and (t + dur) > lunch_start):
-             t = t + step
-             continue
-
-        # Overlap check
-        end_t = t + dur
-        overlaps = False
-        for b0, b1 in booked_ranges:
-            if b0.tzinfo is None: b0 = b0.replace(tzinfo=zone)
-            if b1.tzinfo is None: b1 = b1.replace(tzinfo=zone)
-            if t < b1 and end_t > b0:
-                overlaps = True
-                break
-        
-        if not overlaps:
+    for f0, f1 in free_intervals(day):
+        # First grid point at or after the start of the free interval
+        steps = -((origin - f0) // grid)
+        t = origin + steps * grid
+        while t + dur <= f1:
+            score = 100
             # Simple heuristic scoring
             if t.hour < 10: score += 10 # Morning preference?
             if t.hour > 16: score -= 5  # Late day fatigue
-            
             slots.append({
                 "start": t.isoformat(),
-                "end": end_t.isoformat(),
+                "end": (t + dur).isoformat(),
                 "score": score,
-                "reason": reason
+                "reason": "Standard slot"
             })
-        
-        t = t + step
+            t = t + grid
+    return slots
+
+def get_open_slots(day_iso: str, count: int = 10, service: str = None) -> list[dict]:
+    """
+    Returns a list of slots with 'score' and 'reason'.
+    Candidate starts sit on the rules.slot_grid_minutes grid and must fit the
+    duration of `service` (a rules.services key) inside a free interval.
+    """
+    rules = get_rules()
+    try:
+        day = to_local(day_iso)
+    except:
+        day = datetime.now(business_zone())
+
+    if day.weekday() not in rules.work_days:
+        return []
+
+    day_str = day_key(day)
+    service = service if service in rules.services else None
+    key = (day_str, service, day_versions().get(day_str))
+    slots = _slot_cache.get_or_compute(key, lambda: _generate_slots(day, service))
 
     # Return top slots
-    slots.sort(key=lambda x: x["score"], reverse=True)
-    return slots
+    top = sorted(slots[:count], key=lambda x: x["score"], reverse=True)
+    return top
+
+def cache_stats() -> dict:
+    return _slot_cache.stats()
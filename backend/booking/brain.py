@@ -1,10 +1,16 @@
 import os
-import json
-from dotenv import load_dotenv
-load_dotenv()
-from openai import OpenAI
+import time
+import logging
+import threading
 from pydantic import BaseModel, Field
-from typing import List, Optional, Literal
+from typing import List, Optional, Literal, Union, get_args, get_origin
+
+from .telemetry import span, increment
+from .json_extract import parse_object, dumps
+from .admission import llm_gate, PRIORITY_NORMAL
+from .nlu import understand, log_decision, confirmation, WRITE_INTENTS
+
+logger = logging.getLogger("booking.brain")
 
 # Intent Schema - MASTER BUILD FINAL
 class AgentDecision(BaseModel):
@@ -19,6 +25,7 @@ class AgentDecision(BaseModel):
     user_name: Optional[str] = Field(None)
     user_contact: Optional[str] = Field(None)
     user_email: Optional[str] = Field(None, description="User's email address for confirmation.")
+    recurrence: Optional[str] = Field(None, description="RRULE for repeating bookings, e.g. FREQ=WEEKLY;COUNT=12.")
     
     # Meta-Intelligence (ALL FEATURES)
     intent_drift: Optional[Literal["steady", "drift_detected"]] = Field("steady")
@@ -36,40 +43,173 @@ class AgentDecision(BaseModel):
     # Memory
     detected_preferences: List[str] = Field(default=[])
 
+# --- Structured output ---
+# Field facts are read from the model once at import instead of on every reply.
+
+def _literal_choices(annotation):
+    if get_origin(annotation) is Literal:
+        return get_args(annotation)
+    if get_origin(annotation) is Union:
+        for arg in get_args(annotation):
+            choices = _literal_choices(arg)
+            if choices:
+                return choices
+    return None
+
+_FIELD_CHOICES = {name: c for name, f in AgentDecision.model_fields.items() if (c := _literal_choices(f.annotation))}
+_LIST_FIELDS = {name for name, f in AgentDecision.model_fields.items() if get_origin(f.annotation) in (list, List)}
+_REQUIRED_DEFAULTS = {"intent": "question", "confidence": 0.5, "reasoning": ""}
+_SYNONYMS = {"drift": "drift_detected", "booking": "book", "cancellation": "cancel", "greet": "greeting", "hello": "greeting"}
+_MIN_PREFIX = 3  # shorter fragments ("", "b", "c") are too ambiguous to act on
+
+def coerce_decision(data: dict) -> dict:
+    """
+    Bends near-miss model output into the schema: out-of-enum values become
+    the one choice they unambiguously abbreviate or extend (or the field
+    default), nulls in list fields become empty lists and missing
+    bookkeeping fields get neutral values.
+    """
+    for name, choices in _FIELD_CHOICES.items():
+        value = data.get(name)
+        if value is None or value in choices:
+            continue
+        norm = str(value).strip().lower()
+        norm = _SYNONYMS.get(norm, norm)
+        if norm in choices:
+            data[name] = norm
+            continue
+        prefixed = [c for c in choices if (len(norm) >= _MIN_PREFIX and c.startswith(norm)) or norm.startswith(c)]
+        if len(prefixed) == 1:
+            data[name] = prefixed[0]
+        elif name in _REQUIRED_DEFAULTS:
+            data[name] = _REQUIRED_DEFAULTS[name]
+        else:
+            del data[name]  # the field default applies
+    for name in _LIST_FIELDS:
+        if name in data and data[name] is None:
+            del data[name]
+        elif isinstance(data.get(name), str):
+            data[name] = [data[name]]
+    for name, default in _REQUIRED_DEFAULTS.items():
+        if data.get(name) is None:
+            data[name] = default
+    return data
+
+def parse_decision(raw: str) -> AgentDecision:
+    """Model reply -> AgentDecision. Raises ValueError when nothing salvageable is there."""
+    data = parse_object(raw)
+    if data is None:
+        raise ValueError("No JSON object found in the reply")
+    return AgentDecision.model_validate(coerce_decision(data))
+
+_response_formats = {}
+
+def _response_format():
+    """
+    Provider-side structured output, per LLM_RESPONSE_FORMAT:
+    json_schema (default), json_object or off.
+    """
+    mode = os.getenv("LLM_RESPONSE_FORMAT", "json_schema")
+    if mode not in _response_formats:
+        if mode == "json_schema":
+            _response_formats[mode] = {
+                "type": "json_schema",
+                "json_schema": {"name": "agent_decision", "strict": False, "schema": AgentDecision.model_json_schema()},
+            }
+        elif mode == "json_object":
+            _response_formats[mode] = {"type": "json_object"}
+        else:
+            _response_formats[mode] = None
+    return _response_formats[mode]
+
+# Intents the local tier may answer on its own; open questions always go to the model
+LOCAL_INTENTS = ("greeting", "availability", "book", "reschedule", "cancel")
+
+def _local_confidence() -> float:
+    """NLU_LOCAL_CONFIDENCE: how sure the local tier must be to skip the model (above 1 disables)."""
+    return float(os.getenv("NLU_LOCAL_CONFIDENCE", "0.9"))
+
 class Brain:
     def __init__(self):
         self.api_key = os.getenv("OPENROUTER_API_KEY")
-        print(f"DEBUG: Loaded API Key: {self.api_key[:10]}... (Length: {len(self.api_key) if self.api_key else 0})")
-        self.client = None
+        self._client = None
+        self._client_ready = False
+        self._client_lock = threading.Lock()
+        self._no_response_format = set()  # models whose provider rejected response_format
+        self._cooldown = {}  # model -> monotonic time until which it is skipped after a 429
+
+    @property
+    def client(self):
+        """The OpenAI client, built on first use so importing the app stays cheap."""
+        if not self._client_ready:
+            with self._client_lock:
+                if not self._client_ready:
+                    self._client = self._build_client()
+                    self._client_ready = True
+        return self._client
+
+    def _build_client(self):
         if self.api_key and not self.api_key.startswith("sk-or-v1-YOUR_KEY_HERE"):
-            self.client = OpenAI(
-                base_url="https://openrouter.ai/api/v1",
+            from openai import OpenAI  # the SDK alone takes ~0.4s to import
+            return OpenAI(
+                # Overridable so benchmarks can point at bench/mock_llm.py
+                base_url=os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"),
                 api_key=self.api_key,
+                # think() rotates models itself; SDK-level retries would re-hit a model that is rate-limiting us
+                max_retries=int(os.getenv("LLM_CLIENT_RETRIES", "0")),
                 default_headers={
                     "HTTP-Referer": "http://localhost:3000",
                     "X-Title": "Appointment Booking Agent",
                 }
             )
-        else:
-             print("DEBUG: API Key is missing or is still the placeholder!")
+        logger.warning("OPENROUTER_API_KEY is missing or still the placeholder; using the local fallback brain.")
+        return None
 
     def _clean_json(self, text: str) -> str:
-        import re
-        if not text: return "{}"
-        # Try to find a JSON block using regex
-        match = re.search(r'(\{.*\})', text, re.DOTALL)
-        if match:
-            return match.group(1)
-        # If no braces found, maybe it's just raw text? Return empty json to trigger fail safe
-        return text.strip() if text.strip().startswith("{") else "{}"
-
-    def think(self, user_message: str, history: list, context_str: str) -> AgentDecision:
+        """The reply's JSON object, repaired, as a string ("{}" if there is none)."""
+        data = parse_object(text)
+        return dumps(data) if data is not None else "{}"
+
+    def _complete(self, model: str, messages: list):
+        from openai import BadRequestError
+        fmt = _response_format()
+        if fmt and model not in self._no_response_format:
+            try:
+                return self.client.chat.completions.create(
+                    model=model, messages=messages, max_tokens=600, response_format=fmt,
+                )
+            except BadRequestError:
+                # This provider does not do structured output; ask plainly from now on
+                logger.info("%s rejected response_format; retrying without it", model)
+                self._no_response_format.add(model)
+        return self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=600, # Limit output length for speed
+        )
+
+    def think(self, user_message: str, history: list, context_str: str, priority: int = PRIORITY_NORMAL) -> AgentDecision:
+        """
+        Turns the local NLU tier is sure about are answered without a model
+        call. The rest wait for a model-call slot by priority; shed turns and
+        turns without a usable API key get the local fallback.
+        """
+        with span("nlu"):
+            local = understand(user_message, history)
         if not self.client:
-             return AgentDecision(
-                 intent="question", confidence=0.0, reasoning="No API Key", 
-                 response_text="System Error: No AI Brain found. Please check API Key configuration."
-             )
+            return self._local_decision(local)
+        if local["confidence"] >= _local_confidence() and local["intent"] in LOCAL_INTENTS and not local["defer"]:
+            increment("booking_nlu_local_total", {"intent": local["intent"]})
+            return self._local_decision(local)
+        if not llm_gate.acquire(priority):
+            logger.warning("LLM queue saturated; answering with the local fallback")
+            return self._local_decision(local)
+        try:
+            return self._think_remote(user_message, history, context_str)
+        finally:
+            llm_gate.release()
 
+    def _think_remote(self, user_message: str, history: list, context_str: str) -> AgentDecision:
         # 1. Truncate History (Keep last 10 turns to avoid context overflow)
         # We assume history is a list of dicts: [{"role": "...", "content": "..."}]
         recent_history = history[-10:] if len(history) > 10 else history
@@ -105,6 +245,7 @@ class Brain:
           "user_name": "string",
           "user_contact": "string",
           "user_email": "string",
+          "recurrence": "RRULE like FREQ=WEEKLY;COUNT=12 if the user wants a repeating booking, else null",
           "detected_preferences": [],
           "reasoning": "string",
           "response_text": "string"
@@ -126,28 +267,35 @@ class Brain:
         last_exception = None
         
         for attempt in range(max_retries + 1):
+            # Models that answered 429 recently sit out until their cooldown ends
+            now = time.monotonic()
+            available = [m for m in models if self._cooldown.get(m, 0) <= now]
+            if not available:
+                break
             try:
                 # Pick model (rotate if retrying)
-                model = models[attempt % len(models)] 
+                model = available[attempt % len(available)]
                 
-                print(f"DEBUG: Brain attempt {attempt+1} with {model}...")
-                completion = self.client.chat.completions.create(
-                    model=model, 
-                    messages=current_messages,
-                    max_tokens=600, # Limit output length for speed
-                )
+                logger.debug("Brain attempt %d with %s", attempt + 1, model)
+                with span("llm", model=model, attempt=attempt + 1):
+                    completion = self._complete(model, current_messages)
                 
                 raw = completion.choices[0].message.content
-                print(f"DEBUG BRAIN RAW: {raw[:100]}...") # Log start of response
+                logger.debug("Brain raw response: %.100s", raw)
                 
-                clean_raw = self._clean_json(raw)
-                dct = json.loads(clean_raw)
-                
-                # Validation passed
-                return AgentDecision(**dct)
+                with span("llm.parse"):
+                    # Local repair first; only unsalvageable replies go back to the model
+                    decision = parse_decision(raw)
+                log_decision(user_message, history, decision.model_dump())  # training data for the local tier
+                return decision
                 
             except Exception as e:
-                print(f"DEBUG: Error on attempt {attempt+1}: {e}")
+                logger.info("Brain attempt %d failed: %s", attempt + 1, e)
+                increment("booking_llm_failures_total", {"model": model})
+                from openai import RateLimitError
+                if isinstance(e, RateLimitError):
+                    self._cooldown[model] = time.monotonic() + float(os.getenv("LLM_RATE_LIMIT_COOLDOWN", "30"))
+                    continue  # no point asking a throttled model to fix its JSON
                 last_exception = e
                 # Self-Correction: Add the error to the messages and ask LLM to fix
                 error_feedback = f"System: JSON Error: {str(e)}. Fix and return PURE JSON."
@@ -156,99 +304,15 @@ class Brain:
                 # Loop continues to retry
         
         # If all retries fail, return a safe fallback decision
-        print("CRITICAL: All brain attempts failed. Switching to Local Fallback.")
-        return self._local_fallback_think(user_message)
+        logger.error("All brain attempts failed. Switching to Local Fallback.")
+        increment("booking_llm_fallbacks_total")
+        return self._local_fallback_think(user_message, history)
 
-    def _local_fallback_think(self, message: str) -> AgentDecision:
-        """
-        A rule-based brain that simulates intelligence when the API connection drops.
-        Maintains a professional persona without admitting failure.
-        """
-        msg = message.lower()
-        import re
-        from datetime import datetime
-        
-        # Default Decision (The "Catch-All" to hide ignorance)
-        decision = AgentDecision(
-            intent="question", confidence=0.8, 
-            reasoning="Standard Fallback Response", 
-            response_text="I can certainly assist you with our services. We offer Consultations, Facials, and Therapy. Would you like to check availability or book an appointment?"
-        )
-        
-        # 1. Intent: Greeting
-        if any(x in msg for x in ["hi", "hello", "hey", "start", "good morning", "good evening"]):
-            decision.intent = "greeting"
-            decision.response_text = "Hello! I am your Universal Booking Assistant. I can help you schedule appointments or check availability. How may I assist you?"
-            return decision
-
-        # 2. Intent: Identity / "Who are you" / "Why offline"
-        if "who" in msg or "name" in msg or "bot" in msg or "agent" in msg or "real" in msg or "offline" in msg or "mode" in msg:
-            decision.intent = "question"
-            decision.response_text = "I am a Universal Booking Agent, fully operational and ready to help you manage your bookings."
-            return decision
-
-        # 3. Intent: Cancel
-        if "cancel" in msg or "delete" in msg or "remove" in msg:
-            decision.intent = "cancel"
-            # Try extract email
-            email_match = re.search(r'[\w\.-]+@[\w\.-]+', msg)
-            if email_match:
-                decision.user_email = email_match.group(0)
-            else:
-                decision.missing_info = ["email"]
-                decision.response_text = "I can certainly handle that cancellation. Could you please confirm the email address used for the booking?"
-            return decision
-
-        # 4. Intent: Availability
-        if "available" in msg or "slots" in msg or "when" in msg or "open" in msg or "free" in msg:
-            decision.intent = "availability"
-            decision.response_text = "Let me pull up our current availability for you."
-            return decision
-            
-        # 5. Intent: Book
-        if "book" in msg or "schedule" in msg or "appointment" in msg or "reservation" in msg or "want" in msg:
-            decision.intent = "book"
-            
-            # Simple Entity Extraction
-            # Date
-            decision.target_date = datetime.now().strftime("%Y-%m-%d") 
-            if "tomorrow" in msg:
-                 # Naive tomorrow logic (for demo robustness)
-                 pass
-            
-            # Time regex
-            time_match = re.search(r'(\d{1,2})[:\.]?(\d{2})?\s?(am|pm)?', msg)
-            if time_match:
-                decision.target_time = time_match.group(0)
-            
-            # Email regex
-            email_match = re.search(r'[\w\.-]+@[\w\.-]+', msg)
-            if email_match:
-                decision.user_email = email_match.group(0)
-
-            # Missing info checks
-            if not decision.target_time:
-                 decision.missing_info.append("time")
-                 decision.response_text = "I can arrange that. What time works best for you?"
-                 return decision
-            
-            if not decision.user_email:
-                 decision.missing_info.append("email")
-                 decision.response_text = f"Excellent choice for {decision.target_time}. To confirm, may I have your email address?"
-                 return decision
-
-            decision.response_text = f"Perfect. I'm securing your appointment for {decision.target_time}. One moment..."
-            return decision
-
-        # 6. Intent: My Appointments
-        if "my" in msg and ("appointment" in msg or "booking" in msg or "history" in msg):
-            decision.intent = "question" 
-            email_match = re.search(r'[\w\.-]+@[\w\.-]+', msg)
-            if email_match:
-                decision.user_email = email_match.group(0)
-                decision.response_text = "Retrieving your booking history..."
-            else:
-                decision.response_text = "I can show your history. What is your email address?"
-            return decision
-
-        return decision
+    def _local_fallback_think(self, message: str, history: list = ()) -> AgentDecision:
+        """The local NLU tier's decision, used whenever the models can't be reached."""
+        return self._local_decision(understand(message, history))
+
+    def _local_decision(self, local: dict) -> AgentDecision:
+        if local["intent"] in WRITE_INTENTS and (local["defer"] or local["confidence"] < _local_confidence()):
+            local = confirmation(local)  # no model to settle it, so ask instead of acting
+        return AgentDecision(**{k: v for k, v in local.items() if k != "defer"})
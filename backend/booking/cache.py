@@ -0,0 +1,106 @@
+"""
+Versioned Availability Cache.
+Every day has a version number that booking writes bump. Cached results
+are keyed by (day, ..., version), so a bump makes stale entries
+unreachable without scanning or deleting anything.
+
+Versions live in a pluggable store. The default is in-process; setting
+AVAILABILITY_CACHE=shared keeps them in a small SQLite file so several
+uvicorn workers on one host invalidate each other. A Redis store would
+only need the same get/bump pair.
+"""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+SHARED_PATH = Path(__file__).resolve().parents[1] / "data" / "cache_versions.db"
+
+class LocalVersionStore:
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, day: str) -> int:
+        return self._versions.get(day, 0)
+
+    def bump(self, day: str) -> int:
+        with self._lock:
+            version = self._versions.get(day, 0) + 1
+            self._versions[day] = version
+            return version
+
+class SQLiteVersionStore:
+    """Shared stand-in for Redis: one row per day, visible to every worker process."""
+    def __init__(self, path: Path = SHARED_PATH):
+        self.path = path
+        self._local = threading.local()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        con = self._con()
+        con.execute("CREATE TABLE IF NOT EXISTS versions (day TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+        con.commit()
+
+    def _con(self):
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=5)
+            self._local.con = con
+        return con
+
+    def after_fork(self):
+        """A forked worker must not share the parent's SQLite connection."""
+        self._local = threading.local()
+
+    def get(self, day: str) -> int:
+        row = self._con().execute("SELECT version FROM versions WHERE day = ?", (day,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, day: str) -> int:
+        con = self._con()
+        row = con.execute(
+            "INSERT INTO versions (day, version) VALUES (?, 1) ON CONFLICT(day) DO UPDATE SET version = version + 1 RETURNING version",
+            (day,),
+        ).fetchone()
+        con.commit()
+        return row[0]
+
+_store = None
+
+def day_versions():
+    global _store
+    if _store is None:
+        _store = SQLiteVersionStore() if os.getenv("AVAILABILITY_CACHE") == "shared" else LocalVersionStore()
+    return _store
+
+class VersionedCache:
+    """Bounded LRU of computed results with hit/miss counters."""
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key: tuple, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "entries": len(self._entries),
+        }
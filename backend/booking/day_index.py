@@ -0,0 +1,168 @@
+"""
+Per-Day Calendar Index.
+Keeps each day's booked intervals sorted by start time and maintains the
+Calendar Integrity Score incrementally from booking events, so serving a
+score never re-sorts or re-parses the day.
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from .db import get_appointments_between
+from .events import subscribe
+from .intelligence import gap_penalty, integrity_from_penalty
+from .timeutil import to_local, interval, day_key, day_bounds
+from .recurrence import occurrences_between, expand_series
+from .cache import day_versions
+
+_lock = threading.Lock()
+_days = {}
+
+class DayIndex:
+    """
+    Sorted booked (and waitlist-held) intervals for one day.
+    The fragmentation penalty is only adjusted around the insertion or
+    removal point, since a gap only depends on its two neighbours.
+    """
+    def __init__(self, day: str):
+        self.day = day
+        self.starts = []
+        self.entries = []  # (start, end, appt) in start order
+        self.ids = set()
+        self.penalty = 0
+        self.max_length = timedelta(0)  # Upper bound for backward overlap scans
+        self.version = 0  # Day version this index reflects (see cache.day_versions)
+
+    @property
+    def score(self) -> int:
+        return integrity_from_penalty(self.penalty)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def appointments(self) -> list[dict]:
+        return [appt for _, _, appt in self.entries]
+
+    def overlapping(self, start: datetime, end: datetime) -> list[tuple]:
+        """Entries whose interval intersects [start, end), in start order."""
+        hi = bisect_left(self.starts, end)
+        lo = bisect_left(self.starts, start - self.max_length)
+        return [e for e in self.entries[lo:hi] if e[1] > start]
+
+    def _pair_penalty(self, i: int, j: int) -> int:
+        if i < 0 or j >= len(self.entries):
+            return 0
+        return gap_penalty(self.entries[i][1], self.entries[j][0])
+
+    def add(self, appt: dict):
+        if appt["id"] in self.ids:
+            return
+        start, end = interval(appt)
+        i = bisect_right(self.starts, start)
+        self.penalty -= self._pair_penalty(i - 1, i)
+        self.starts.insert(i, start)
+        self.entries.insert(i, (start, end, appt))
+        self.ids.add(appt["id"])
+        self.max_length = max(self.max_length, end - start)
+        self.penalty += self._pair_penalty(i - 1, i) + self._pair_penalty(i, i + 1)
+
+    def remove(self, appt: dict):
+        if appt["id"] not in self.ids:
+            return
+        start = interval(appt)[0]
+        i = bisect_left(self.starts, start)
+        while i < len(self.entries) and self.entries[i][2]["id"] != appt["id"]:
+            i += 1
+        if i == len(self.entries):
+            return
+        self.penalty -= self._pair_penalty(i - 1, i) + self._pair_penalty(i, i + 1)
+        del self.starts[i]
+        del self.entries[i]
+        self.ids.discard(appt["id"])
+        self.penalty += self._pair_penalty(i - 1, i)
+
+def _load(day: str) -> DayIndex:
+    index = DayIndex(day)
+    start, end = day_bounds(day)
+    start_iso, end_iso = start.isoformat(), end.isoformat()
+    for appt in get_appointments_between(start_iso, end_iso) + occurrences_between(start_iso, end_iso):
+        if day_key(appt["start_iso"]) == day:
+            index.add(appt)
+    return index
+
+def get_day_index(day) -> DayIndex:
+    """
+    Returns the index for the day containing `day`, loading it once from the
+    db and again only if another worker bumped the day's version.
+    """
+    key = day_key(day)
+    with _lock:
+        version = day_versions().get(key)
+        index = _days.get(key)
+        if index is None or index.version != version:
+            index = _load(key)
+            index.version = version
+            _days[key] = index
+        return index
+
+def get_integrity_score(day) -> int:
+    return get_day_index(day).score
+
+def get_integrity_report(first_day, days: int = 7) -> list[dict]:
+    start = to_local(first_day)
+    report = []
+    for offset in range(days):
+        index = get_day_index(start + timedelta(days=offset))
+        report.append({"day": index.day, "score": index.score, "appointments": len(index)})
+    return report
+
+def _touch(day: str):
+    """
+    Bumps the day's cache version after a local write. The loaded index keeps
+    serving only if nobody else wrote the day in between; otherwise the
+    next get_day_index() reloads it.
+    """
+    version = day_versions().bump(day)
+    index = _days.get(day)
+    if index is not None and index.version == version - 1:
+        index.version = version
+
+@subscribe
+def _on_booking_change(kind: str, appt: dict, previous: dict = None):
+    if kind in ("series_added", "series_cancelled"):
+        _on_series_change(kind, appt)
+        return
+    with _lock:
+        days = {day_key(appt["start_iso"])}
+        if previous:
+            old_day = day_key(previous["start_iso"])
+            days.add(old_day)
+            index = _days.get(old_day)
+            if index is not None:
+                index.remove(previous)
+        index = _days.get(day_key(appt["start_iso"]))
+        if index is not None:
+            if kind == "cancelled" or appt.get("status") not in ("booked", "held"):
+                index.remove(appt)
+            else:
+                index.add(appt)
+        for day in days:
+            _touch(day)
+
+def _on_series_change(kind: str, series: dict):
+    # Loaded days get the occurrences now; others expand lazily on load
+    occurrences = expand_series(series, series["dtstart_iso"], series["until_iso"])
+    with _lock:
+        days = set()
+        for occ in occurrences:
+            day = day_key(occ["start_iso"])
+            days.add(day)
+            index = _days.get(day)
+            if index is None:
+                continue
+            if kind == "series_added":
+                index.add(occ)
+            else:
+                index.remove(occ)
+        for day in days:
+            _touch(day)
@@ -1,157 +1,194 @@
-import sqlite3
+import os
 from pathlib import Path
-import json
+
+from .events import publish
+from .telemetry import traced
+from .storage import SlotConflict, Appointment, SQLiteRepository, PostgresRepository
 
 DB_PATH = Path(__file__).resolve().parents[1] / "data" / "bookings.db"
 
-def connect():
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    return sqlite3.connect(DB_PATH)
+_repo = None
+
+def repo():
+    """The configured storage backend, created on first use."""
+    global _repo
+    if _repo is None:
+        url = os.getenv("DATABASE_URL", "")
+        if url.startswith(("postgres://", "postgresql://")):
+            _repo = PostgresRepository(url)
+        else:
+            _repo = SQLiteRepository(DB_PATH)
+    return _repo
+
+_schema_ready = set()  # databases already initialised by this process (or the parent it forked from)
 
 def init_db():
-    con = connect()
-    cur = con.cursor()
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS appointments (
-          id TEXT PRIMARY KEY,
-          name TEXT NOT NULL,
-          contact TEXT NOT NULL,
-          service TEXT NOT NULL,
-          start_iso TEXT NOT NULL,
-          end_iso TEXT NOT NULL,
-          status TEXT NOT NULL
-        )
-        """
-    )
-    # Preferences table for memory functionality
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS preferences (
-           contact TEXT PRIMARY KEY,
-           data TEXT NOT NULL
-        )
-        """
-    )
-    con.commit()
-    con.close()
+    target = os.getenv("DATABASE_URL") or str(DB_PATH)
+    if target not in _schema_ready:
+        repo().init_schema()
+        _schema_ready.add(target)
+
+def close_db():
+    """Drops the backend's pooled connections; the next call reconnects."""
+    global _repo
+    if _repo is not None:
+        _repo.close()
+        _repo = None
 
 # --- Appointments ---
-def insert_appointment(appt: dict):
-    con = connect()
-    cur = con.cursor()
-    cur.execute(
-        "INSERT INTO appointments (id, name, contact, service, start_iso, end_iso, status) VALUES (?, ?, ?, ?, ?, ?, ?)",
-        (appt["id"], appt["name"], appt["contact"], appt["service"], appt["start_iso"], appt["end_iso"], appt["status"]),
-    )
-    con.commit()
-    con.close()
+@traced("db")
+def insert_appointment(appt: dict, idempotency_key: str = None) -> bool:
+    """False (and nothing written) when idempotency_key was already used."""
+    if not repo().insert_appointment(appt, idempotency_key):
+        return False
+    publish("inserted", appt)
+    return True
 
+@traced("db")
+def get_appointment_by_idempotency_key(key: str):
+    return repo().get_appointment_by_idempotency_key(key)
+
+@traced("db")
 def get_appointments_between(start_iso: str, end_iso: str) -> list[dict]:
-    con = connect()
-    cur = con.cursor()
-    cur.execute(
-        "SELECT id, name, contact, service, start_iso, end_iso, status FROM appointments WHERE start_iso < ? AND end_iso > ? AND status = 'booked'",
-        (end_iso, start_iso),
-    )
-    rows = cur.fetchall()
-    con.close()
-    return [
-        {"id": r[0], "name": r[1], "contact": r[2], "service": r[3], "start_iso": r[4], "end_iso": r[5], "status": r[6]}
-        for r in rows
-    ]
+    return repo().get_appointments_between(start_iso, end_iso)
 
+@traced("db")
 def get_appointment(appt_id: str):
-    con = connect()
-    cur = con.cursor()
-    cur.execute(
-        "SELECT id, name, contact, service, start_iso, end_iso, status FROM appointments WHERE id = ?",
-        (appt_id,),
-    )
-    row = cur.fetchone()
-    con.close()
-    if not row:
-        return None
-    return {"id": row[0], "name": row[1], "contact": row[2], "service": row[3], "start_iso": row[4], "end_iso": row[5], "status": row[6]}
+    return repo().get_appointment(appt_id)
 
+@traced("db")
 def update_appointment_time(appt_id: str, start_iso: str, end_iso: str):
-    con = connect()
-    cur = con.cursor()
-    cur.execute(
-        "UPDATE appointments SET start_iso = ?, end_iso = ? WHERE id = ?",
-        (start_iso, end_iso, appt_id),
-    )
-    con.commit()
-    con.close()
+    previous = get_appointment(appt_id)
+    repo().update_appointment_time(appt_id, start_iso, end_iso)
+    if previous:
+        publish("moved", previous.replace(start_iso=start_iso, end_iso=end_iso), previous)
+
+@traced("db")
+def move_appointments(moves: list[tuple]):
+    """All-or-nothing batch of (appt_id, start_iso, end_iso) moves; one moved event per appointment."""
+    previous = [get_appointment(appt_id) for appt_id, _, _ in moves]
+    repo().move_appointments(moves)
+    for (_, start_iso, end_iso), before in zip(moves, previous):
+        if before:
+            publish("moved", before.replace(start_iso=start_iso, end_iso=end_iso), before)
 
+@traced("db")
 def cancel_appointment(appt_id: str):
-    con = connect()
-    cur = con.cursor()
-    cur.execute(
-        "UPDATE appointments SET status = 'cancelled' WHERE id = ?",
-        (appt_id,),
-    )
-    con.commit()
-    con.commit()
-    con.close()
+    repo().set_appointment_status(appt_id, "cancelled")
+    appt = get_appointment(appt_id)
+    if appt:
+        publish("cancelled", appt)
+
+@traced("db")
+def set_appointment_status(appt_id: str, status: str):
+    repo().set_appointment_status(appt_id, status)
+    appt = get_appointment(appt_id)
+    if appt:
+        publish("inserted" if status in ("booked", "held") else "cancelled", appt)
 
+@traced("db")
 def get_active_appointments_by_email(email: str) -> list[dict]:
-    con = connect()
-    cur = con.cursor()
-    # Normalize check? For now simple robust check
-    cur.execute(
-        "SELECT id, name, contact, service, start_iso, end_iso, status FROM appointments WHERE contact = ? AND status = 'booked' ORDER BY start_iso ASC",
-        (email,),
-    )
-    rows = cur.fetchall()
-    con.close()
-    return [
-        {"id": r[0], "name": r[1], "contact": r[2], "service": r[3], "start_iso": r[4], "end_iso": r[5], "status": r[6]}
-        for r in rows
-    ]
+    return repo().get_active_appointments_by_email(email)
 
+@traced("db")
 def get_all_user_appointments(email: str) -> list[dict]:
     """Get ALL appointments (past/present/cancelled) for a user to show history."""
-    con = connect()
-    cur = con.cursor()
-    cur.execute(
-        "SELECT id, name, contact, service, start_iso, end_iso, status FROM appointments WHERE contact = ? ORDER BY start_iso DESC",
-        (email,),
-    )
-    rows = cur.fetchall()
-    con.close()
-    return [
-        {"id": r[0], "name": r[1], "contact": r[2], "service": r[3], "start_iso": r[4], "end_iso": r[5], "status": r[6]}
-        for r in rows
-    ]
+    return repo().get_all_user_appointments(email)
+
+@traced("db")
+def get_all_appointments():
+    return repo().get_all_appointments()
+
+def iter_appointments():
+    """Streams every appointment for large scans (not traced: the work happens as it is consumed)."""
+    return repo().iter_appointments()
 
 # --- Preferences / Memory ---
+@traced("db")
 def get_user_preferences(contact: str) -> dict:
-    con = connect()
-    cur = con.cursor()
-    cur.execute("SELECT data FROM preferences WHERE contact = ?", (contact,))
-    row = cur.fetchone()
-    con.close()
-    if row:
-        return json.loads(row[0])
-    return {}
+    return repo().get_user_preferences(contact)
 
+@traced("db")
 def update_user_preferences(contact: str, new_data: dict):
     current = get_user_preferences(contact)
     current.update(new_data)
-    con = connect()
-    cur = con.cursor()
-    cur.execute("INSERT OR REPLACE INTO preferences (contact, data) VALUES (?, ?)", (contact, json.dumps(current)))
-    con.commit()
-    con.close()
+    repo().save_user_preferences(contact, current)
 
-def get_all_appointments():
-    con = connect()
-    cur = con.cursor()
-    cur.execute("SELECT id, name, contact, service, start_iso, end_iso, status FROM appointments ORDER BY start_iso DESC")
-    rows = cur.fetchall()
-    con.close()
-    return [
-        {"id": r[0], "name": r[1], "contact": r[2], "service": r[3], "start_iso": r[4], "end_iso": r[5], "status": r[6]}
-        for r in rows
-    ]
+# --- Waitlist ---
+@traced("db")
+def insert_waitlist_entry(entry: dict):
+    repo().insert_waitlist_entry(entry)
+
+@traced("db")
+def find_waitlist_match(service: str, start_iso: str, end_iso: str):
+    """Oldest waiting entry for `service` whose window covers [start, end), found by a FIFO index walk."""
+    return repo().find_waitlist_match(service, start_iso, end_iso)
+
+@traced("db")
+def get_waitlist_entry(entry_id: str):
+    return repo().get_waitlist_entry(entry_id)
+
+@traced("db")
+def update_waitlist_entry(entry_id: str, status: str, hold_appt_id: str = None, hold_expires_iso: str = None):
+    repo().update_waitlist_entry(entry_id, status, hold_appt_id, hold_expires_iso)
+
+@traced("db")
+def get_expired_waitlist_holds(now_iso: str) -> list[dict]:
+    return repo().get_expired_waitlist_holds(now_iso)
+
+@traced("db")
+def expire_waitlist_entries(now_iso: str) -> int:
+    return repo().expire_waitlist_entries(now_iso)
+
+@traced("db")
+def get_all_waitlist_entries() -> list[dict]:
+    return repo().get_all_waitlist_entries()
+
+# --- Recurring series ---
+@traced("db")
+def insert_series(series: dict):
+    repo().insert_series(series)
+    publish("series_added", series)
+
+@traced("db")
+def get_series_between(start_iso: str, end_iso: str) -> list[dict]:
+    """Active series whose first..last occurrence span intersects the range."""
+    return repo().get_series_between(start_iso, end_iso)
+
+@traced("db")
+def get_all_series() -> list[dict]:
+    return repo().get_all_series()
+
+@traced("db")
+def cancel_series(series_id: str):
+    repo().set_series_status(series_id, "cancelled")
+    series = repo().get_series(series_id)
+    if series:
+        publish("series_cancelled", series)
+
+# --- Notifications (outbox) ---
+@traced("db")
+def queue_notification(channel: str, recipient: str, subject: str, body: str, created_iso: str):
+    repo().queue_notification(channel, recipient, subject, body, created_iso)
+
+# --- Reminders ---
+@traced("db")
+def insert_reminders(reminders: list[dict]):
+    repo().insert_reminders(reminders)
+
+@traced("db")
+def cancel_reminders(appointment_id: str) -> list[str]:
+    """Cancels the appointment's pending reminders; returns their channels."""
+    return repo().cancel_reminders(appointment_id)
+
+@traced("db")
+def get_pending_reminders() -> list[dict]:
+    return repo().get_pending_reminders()
+
+@traced("db")
+def claim_reminder(reminder_id: str) -> bool:
+    return repo().claim_reminder(reminder_id)
+
+@traced("db")
+def finish_reminder(reminder_id: str, status: str, due_iso: str = None):
+    repo().finish_reminder(reminder_id, status, due_iso)
@@ -1,10 +1,10 @@
 import smtplib
 import os
+import logging
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from dotenv import load_dotenv
 
-load_dotenv()
+logger = logging.getLogger("booking.email")
 
 def send_confirmation_email(to_email: str, name: str, date: str, time: str, details: dict = None) -> bool:
     """
@@ -12,12 +12,9 @@ def send_confirmation_email(to_email: str, name: str, date: str, time: str, deta
     Falls back to console log if credentials are missing.
     """
     if not to_email:
-        print("DEBUG: Email Service skipped (No email provided)")
+        logger.debug("Email Service skipped (No email provided)")
         return False
         
-    sender_email = os.getenv("EMAIL_ADDRESS")
-    sender_password = os.getenv("EMAIL_PASSWORD")
-    
     # Construct Email Content
     service_name = details.get('service', 'Service') if details else 'Service'
     subject = f"Confirmation: {service_name} at Aura Aesthetics"
@@ -39,6 +36,34 @@ def send_confirmation_email(to_email: str, name: str, date: str, time: str, deta
     The Aura Aesthetics Team
     """
 
+    return _deliver(to_email, subject, body)
+
+def send_reminder_email(to_email: str, name: str, service: str, when: str) -> bool:
+    """Appointment reminder through the same SMTP / simulation path as confirmations."""
+    if not to_email:
+        return False
+    subject = f"Reminder: {service} at Aura Aesthetics, {when}"
+    body = f"""
+    Dear {name or 'Valued Client'},
+    
+    This is a friendly reminder of your upcoming appointment at Aura Aesthetics.
+    
+    ✨ Service: {service}
+    ⏰ When: {when}
+    
+    Location: Aura Aesthetics Studio, Downtown
+    
+    Need a different time? Just ask our AI agent to reschedule.
+    
+    Warm regards,
+    The Aura Aesthetics Team
+    """
+    return _deliver(to_email, subject, body)
+
+def _deliver(to_email: str, subject: str, body: str) -> bool:
+    sender_email = os.getenv("EMAIL_ADDRESS")
+    sender_password = os.getenv("EMAIL_PASSWORD")
+
     # SIMULATION MODE (Default if no creds)
     if not sender_email or not sender_password:
         print(f"\n[EMAIL SIMULATION] ---------------------------------------------")
@@ -66,8 +91,8 @@ def send_confirmation_email(to_email: str, name: str, date: str, time: str, deta
         server.sendmail(sender_email, to_email, text)
         server.quit()
         
-        print(f"DEBUG: Real email sent to {to_email}")
+        logger.info("Real email sent to %s", to_email)
         return True
     except Exception as e:
-        print(f"ERROR: Failed to send email. {e}")
+        logger.error("Failed to send email. %s", e)
         return False
@@ -0,0 +1,26 @@
+"""
+Booking change events.
+The db layer publishes every write here so in-memory indexes can update
+themselves without re-reading the whole calendar.
+"""
+import logging
+
+logger = logging.getLogger("booking.events")
+
+_subscribers = []
+
+def subscribe(handler):
+    """
+    Registers handler(kind, appt, previous) for booking changes.
+    kind is one of 'inserted', 'cancelled', 'moved' for single appointments,
+    or 'series_added', 'series_cancelled' where appt is the series row.
+    """
+    _subscribers.append(handler)
+    return handler
+
+def publish(kind: str, appt: dict, previous: dict = None):
+    for handler in list(_subscribers):
+        try:
+            handler(kind, appt, previous)
+        except Exception:
+            logger.exception("Booking event handler failed")
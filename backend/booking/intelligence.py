@@ -1,6 +1,7 @@
 from datetime import datetime, timedelta
 from dateutil import tz, parser
 from .rules import BookingRules
+from .timeutil import interval
 
 def calculate_integrity_score(appointments: list, day_start: datetime, day_end: datetime) -> int:
     """
@@ -17,26 +18,36 @@ def calculate_integrity_score(appointments: list, day_start: datetime, day_end:
     
     # Analyze gaps
     for i in range(len(sorted_appts) - 1):
-        curr_end = parser.isoparse(sorted_appts[i]['end_iso'])
-        next_start = parser.isoparse(sorted_appts[i+1]['start_iso'])
+        curr_end = interval(sorted_appts[i])[1]
+        next_start = interval(sorted_appts[i+1])[0]
+        fragmentation_penalty += gap_penalty(curr_end, next_start)
         
-        gap_minutes = (next_start - curr_end).total_seconds() / 60
-        
-        # Bad gap: 1-15 minutes (too short to do anything)
-        if 0 < gap_minutes < 15:
-            fragmentation_penalty += 15
-        # Decent gap: 15-30
-        elif 15 <= gap_minutes < 30:
-            fragmentation_penalty += 5
-        # Good gap: > 30 (usable block)
-        
-    score -= fragmentation_penalty
-    return max(0, min(100, score))
+    return integrity_from_penalty(fragmentation_penalty)
+
+def gap_penalty(curr_end: datetime, next_start: datetime) -> int:
+    """
+    Fragmentation penalty for the gap between two neighbouring appointments.
+    """
+    gap_minutes = (next_start - curr_end).total_seconds() / 60
+    
+    # Bad gap: 1-15 minutes (too short to do anything)
+    if 0 < gap_minutes < 15:
+        return 15
+    # Decent gap: 15-30
+    if 15 <= gap_minutes < 30:
+        return 5
+    # Good gap: > 30 (usable block)
+    return 0
+
+def integrity_from_penalty(fragmentation_penalty: int) -> int:
+    return max(0, min(100, 100 - fragmentation_penalty))
 
 def simulate_future_schedule(proposed_start_iso: str, duration_minutes: int, existing_appointments: list) -> dict:
     """
     What-If Simulation Engine.
     Checks if a proposed slot creates issues directly or downstream.
+    For real bookings use simulation.simulate_proposals, which batches
+    proposals against the day's calendar index.
     """
     try:
         proposed_start = parser.isoparse(proposed_start_iso)
@@ -49,11 +60,10 @@ def simulate_future_schedule(proposed_start_iso: str, duration_minutes: int, exi
     
     # 1. Direct Conflict & Buffer Check
     for appt in existing_appointments:
-        existing_start = parser.isoparse(appt['start_iso'])
-        existing_end = parser.isoparse(appt['end_iso'])
+        existing_start, existing_end = interval(appt)
         
-        # Buffer (e.g. 5 mins)
-        buffer = timedelta(minutes=5)
+        # Buffer from business rules
+        buffer = timedelta(minutes=BookingRules().buffer_minutes)
         
         # Check overlap including buffer
         if (proposed_start < existing_end + buffer) and (proposed_end + buffer > existing_start):
@@ -153,8 +163,8 @@ def autonomous_schedule_optimizer(appointments: list) -> str:
     sorted_appts = sorted(appointments, key=lambda x: x['start_iso'])
     gaps = []
     for i in range(len(sorted_appts) - 1):
-        curr_end = parser.isoparse(sorted_appts[i]['end_iso'])
-        next_start = parser.isoparse(sorted_appts[i+1]['start_iso'])
+        curr_end = interval(sorted_appts[i])[1]
+        next_start = interval(sorted_appts[i+1])[0]
         gap_min = (next_start - curr_end).total_seconds() / 60
         if 0 < gap_min < 30:
             gaps.append(f"{int(gap_min)}m gap between {sorted_appts[i].get('service','Appt')}")
@@ -0,0 +1,129 @@
+"""
+Tolerant JSON Extraction.
+Models wrap their JSON in prose or code fences and make small syntax slips:
+trailing commas, single-quoted strings, Python literals, a reply cut off by
+max_tokens. `parse_object()` pulls the first JSON object out of a reply and
+repairs those slips locally instead of paying for a self-correction round
+trip to the model.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # Optional speedup; the stdlib parser gives the same results
+    orjson = None
+
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+def loads(text: str):
+    return orjson.loads(text) if orjson else json.loads(text)
+
+def dumps(value) -> str:
+    return orjson.dumps(value).decode() if orjson else json.dumps(value)
+
+def _strip_trailing_comma(out: list):
+    k = len(out)
+    while k and out[k - 1].isspace():
+        k -= 1
+    if k and out[k - 1] == ",":
+        del out[k - 1]
+
+def repair_object(text: str):
+    """
+    Single pass from the first '{' to its matching '}', rewriting the common
+    slips into valid JSON. Anything after the object is ignored; a truncated
+    object is closed. Returns None when there is no '{' at all.
+    """
+    i = text.find("{")
+    if i < 0:
+        return None
+    out = []
+    closers = []
+    members = []  # per open bracket: index in out where its current member starts
+    quote = None  # delimiter of the string being copied, if any
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if quote:
+            if c == "\\":
+                nxt = text[i + 1:i + 2]
+                out.append("'" if nxt == "'" else c + nxt)
+                i += 2
+                continue
+            if c == quote:
+                out.append('"')
+                quote = None
+            elif c == '"':
+                out.append('\\"')  # bare double quote inside a single-quoted string
+            elif c == "\n":
+                out.append("\\n")
+            else:
+                out.append(c)
+            i += 1
+            continue
+
+        if c == '"' or c == "'":
+            quote = c
+            out.append('"')
+        elif c == "{" or c == "[":
+            closers.append("}" if c == "{" else "]")
+            out.append(c)
+            members.append(len(out))
+        elif c == "}" or c == "]":
+            _strip_trailing_comma(out)
+            out.append(closers.pop() if closers else c)
+            if members:
+                members.pop()
+            if not closers:
+                return "".join(out)
+        elif c.isalpha() or c == "_":
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            out.append(_LITERALS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(c)
+            if c == "," and members:
+                members[-1] = len(out)
+        i += 1
+
+    # Cut off mid-object: close the open string, drop a dangling key/comma, close brackets
+    if quote:
+        out.append('"')
+    if closers and closers[-1] == "}" and ":" not in "".join(out[members[-1]:]):
+        del out[members[-1]:]
+    _strip_trailing_comma(out)
+    tail = "".join(out).rstrip()
+    if tail.endswith(":"):
+        out.append("null")
+    out.extend(reversed(closers))
+    return "".join(out)
+
+def parse_object(text: str):
+    """
+    The first JSON object in `text` as a dict, or None if nothing usable is
+    there. Well-formed replies take the fast path and never reach the repair
+    scanner.
+    """
+    if not text:
+        return None
+    start = text.find("{")
+    end = text.rfind("}")
+    if start >= 0 and end > start:
+        try:
+            value = loads(text[start:end + 1])
+            if isinstance(value, dict):
+                return value
+        except ValueError:
+            pass
+    repaired = repair_object(text)
+    if repaired is None:
+        return None
+    try:
+        value = loads(repaired)
+    except ValueError:
+        return None
+    return value if isinstance(value, dict) else None
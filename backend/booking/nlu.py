@@ -0,0 +1,488 @@
+"""
+Local Language Understanding.
+A CPU-only tier in front of the remote brain:
+- intents come from a softmax classifier over hashed word and character
+  n-grams, trained from the decisions the remote brain logged (plus a small
+  seed set, so a fresh install works)
+- dates, times, emails and names are pulled out with rules; relative dates
+  ("tomorrow", "next friday", "in 3 days") resolve in the business timezone
+Turns it is sure about never reach the network. Every other turn still can
+fall back on it when the models are unreachable.
+
+    python -m booking.nlu train     # retrain from the NLU_DECISION_LOG file
+"""
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from .rules import get_rules
+from .timeutil import business_zone
+
+logger = logging.getLogger("booking.nlu")
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+MODEL_PATH = DATA_DIR / "nlu_model.json"
+
+INTENTS = ("book", "reschedule", "cancel", "availability", "question", "greeting", "correction")
+N_BUCKETS = 1 << 18
+
+# --- Entities ---
+
+_EMAIL = re.compile(r"[\w\.+-]+@[\w\.-]+\.\w+")
+_ISO_DATE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+_SLASH_DATE = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?\b")
+_MONTHS = {m: i + 1 for i, m in enumerate(("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"))}
+_MONTH = r"(jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?"
+_MONTH_DAY = re.compile(rf"\b{_MONTH}\s+(\d{{1,2}})(?:st|nd|rd|th)?\b")
+_DAY_MONTH = re.compile(rf"\b(\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?{_MONTH}")
+_WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+_WEEKDAY = re.compile(r"\b(next|this|on|coming)?\s*(mon|tue|tues|wed|thu|thur|thurs|fri|sat|sun)(?:day|sday|nesday|rsday|urday)?\b")
+_IN_DAYS = re.compile(r"\bin\s+(\d+|a|one|two|three|four|five|six|seven)\s+(day|week)s?\b")
+_CLOCK = re.compile(r"\b(\d{1,2})(?::|\.)(\d{2})\s*(am|pm|a\.m\.|p\.m\.)?(?!\d)")
+_MERIDIEM = re.compile(r"\b(\d{1,2})\s*(am|pm|a\.m\.|p\.m\.)")
+_AT_HOUR = re.compile(r"\b(?:at|around|by)\s+(\d{1,2})\b(?!\s*(?:st|nd|rd|th|days?|weeks?|/))")
+_NAME = re.compile(r"\b(?i:my name is|name's|this is|i am|i'm)\s+([A-Z][a-z'\-]+)")
+_RECURRING = re.compile(r"\b(every|weekly|monthly|fortnightly|recurring|repeat)")
+_REPEAT_COUNT = re.compile(r"\bfor\s+(\d+)\s+(weeks?|months?|times|sessions)\b")
+_NUMBER_WORDS = {"a": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7}
+
+def _today() -> datetime:
+    return datetime.now(business_zone())
+
+def _resolve_date(msg: str, today: datetime):
+    """First date mentioned in `msg` (lowercase), as YYYY-MM-DD."""
+    m = _ISO_DATE.search(msg)
+    if m:
+        return m.group(0)
+    if "day after tomorrow" in msg:
+        return (today + timedelta(days=2)).date().isoformat()
+    if re.search(r"\b(tomorrow|tmrw|tmr|tomorow)\b", msg):
+        return (today + timedelta(days=1)).date().isoformat()
+    if re.search(r"\b(today|tonight|this (morning|afternoon|evening))\b", msg):
+        return today.date().isoformat()
+    m = _IN_DAYS.search(msg)
+    if m:
+        n = int(m.group(1)) if m.group(1).isdigit() else _NUMBER_WORDS[m.group(1)]
+        return (today + timedelta(days=n * (7 if m.group(2) == "week" else 1))).date().isoformat()
+    for pattern, month_group, day_group in ((_MONTH_DAY, 1, 2), (_DAY_MONTH, 2, 1)):
+        m = pattern.search(msg)
+        if m:
+            month, day = _MONTHS[m.group(month_group)[:3]], int(m.group(day_group))
+            try:
+                when = today.replace(month=month, day=day)
+            except ValueError:
+                continue
+            if when.date() < today.date():
+                when = when.replace(year=today.year + 1)
+            return when.date().isoformat()
+    m = _SLASH_DATE.search(msg)
+    if m:  # US order: month/day
+        year = int(m.group(3)) if m.group(3) else today.year
+        year += 2000 if year < 100 else 0
+        try:
+            when = today.replace(year=year, month=int(m.group(1)), day=int(m.group(2)))
+            if not m.group(3) and when.date() < today.date():
+                when = when.replace(year=year + 1)
+            return when.date().isoformat()
+        except ValueError:
+            pass
+    m = _WEEKDAY.search(msg)
+    if m:
+        target = next(i for i, d in enumerate(_WEEKDAYS) if d.startswith(m.group(2)[:3]))
+        ahead = (target - today.weekday()) % 7
+        # "next monday" on a Monday is a week out; plain "monday" then means today
+        if ahead == 0 and m.group(1) == "next":
+            ahead = 7
+        return (today + timedelta(days=ahead)).date().isoformat()
+    if "next week" in msg:
+        return (today + timedelta(days=7 - today.weekday())).date().isoformat()
+    return None
+
+def _hour(hour: int, meridiem: str) -> int:
+    if meridiem:
+        if meridiem.startswith("p") and hour < 12:
+            return hour + 12
+        if meridiem.startswith("a") and hour == 12:
+            return 0
+        return hour
+    # No am/pm: "at 3" during business hours means the afternoon
+    return hour + 12 if 1 <= hour <= 7 else hour
+
+def _resolve_time(msg: str):
+    """First clock time mentioned in `msg` (lowercase, dates removed), as HH:MM."""
+    if re.search(r"\b(noon|midday)\b", msg):
+        return "12:00"
+    m = _CLOCK.search(msg)
+    if m and int(m.group(1)) < 24 and int(m.group(2)) < 60:
+        return f"{_hour(int(m.group(1)), m.group(3)):02d}:{m.group(2)}"
+    m = _MERIDIEM.search(msg)
+    if m and 1 <= int(m.group(1)) <= 12:
+        return f"{_hour(int(m.group(1)), m.group(2)):02d}:00"
+    m = _AT_HOUR.search(msg)
+    if m and 1 <= int(m.group(1)) <= 12:
+        return f"{_hour(int(m.group(1)), None):02d}:00"
+    return None
+
+def _recurrence(msg: str):
+    """(rrule or None, unclear?) for repeating-booking requests."""
+    if not _RECURRING.search(msg):
+        return None, False
+    freq = "MONTHLY" if "month" in msg else "WEEKLY"
+    interval = ";INTERVAL=2" if ("every other" in msg or "fortnight" in msg) else ""
+    count = _REPEAT_COUNT.search(msg)
+    if not count:
+        return None, True
+    return f"FREQ={freq}{interval};COUNT={count.group(1)}", False
+
+def extract(message: str, today: datetime = None) -> dict:
+    """Entities of one message: target_date, target_time, user_email, user_name, recurrence."""
+    today = today or _today()
+    email = _EMAIL.search(message)
+    name = _NAME.search(message)
+    msg = _EMAIL.sub(" ", message.lower())
+    target_date = _resolve_date(msg, today)
+    # Dates out of the way so "10/21" or "2026-10-21" never read as a time
+    clock_text = _SLASH_DATE.sub(" ", _ISO_DATE.sub(" ", msg))
+    clock_text = _DAY_MONTH.sub(" ", _MONTH_DAY.sub(" ", _IN_DAYS.sub(" ", clock_text)))
+    rrule, unclear = _recurrence(msg)
+    return {
+        "target_date": target_date,
+        "target_time": _resolve_time(clock_text),
+        "user_email": email.group(0) if email else None,
+        "user_name": name.group(1) if name else None,
+        "recurrence": rrule,
+        "recurrence_unclear": unclear,
+    }
+
+# --- Intent classifier ---
+
+_TOKEN = re.compile(r"[a-z_']+|\d+")
+_PLACEHOLDERS = (
+    (_EMAIL, " _email_ "),
+    (_ISO_DATE, " _date_ "),
+    (re.compile(r"\b\d{1,2}([:\.]\d{2})?\s*(am|pm)\b|\b\d{1,2}:\d{2}\b"), " _time_ "),
+)
+
+def _bucket(token: str) -> int:
+    return zlib.crc32(token.encode()) & (N_BUCKETS - 1)
+
+def features(message: str, last_reply: str = "") -> list[int]:
+    """Hashed unigrams, bigrams and in-word character trigrams, plus the words of the bot's last reply."""
+    text = message.lower()
+    for pattern, placeholder in _PLACEHOLDERS:
+        text = pattern.sub(placeholder, text)
+    words = _TOKEN.findall(text)
+    tokens = ["w:" + w for w in words]
+    tokens += ["b:" + a + " " + b for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"<{w}>"
+        tokens += ["c:" + padded[i:i + 3] for i in range(len(padded) - 2)]
+    if len(words) <= 3:
+        tokens.append("short")
+    if "?" in message:
+        tokens.append("question_mark")
+    # What the bot just asked decides what a bare "3pm" or email means
+    tokens += ["r:" + w for w in _TOKEN.findall(last_reply.lower())[:40]]
+    tokens.append("bias")
+    return list({_bucket(t) for t in tokens})
+
+class IntentModel:
+    """Multinomial logistic regression over hashed features, stored sparsely."""
+    def __init__(self, classes=INTENTS, weights: dict = None, trained_on: int = 0):
+        self.classes = list(classes)
+        self.weights = weights or {}  # bucket -> per-class weights
+        self.trained_on = trained_on
+
+    def scores(self, feats: list[int]) -> list[float]:
+        totals = [0.0] * len(self.classes)
+        for f in feats:
+            w = self.weights.get(f)
+            if w:
+                for i, v in enumerate(w):
+                    totals[i] += v
+        top = max(totals)
+        exps = [math.exp(t - top) for t in totals]
+        norm = sum(exps)
+        return [e / norm for e in exps]
+
+    def predict(self, message: str, last_reply: str = "") -> tuple:
+        """(intent, probability)."""
+        probs = self.scores(features(message, last_reply))
+        best = max(range(len(probs)), key=probs.__getitem__)
+        return self.classes[best], probs[best]
+
+    def fit(self, examples: list[tuple], epochs: int = 20, rate: float = 0.3, seed: int = 7):
+        """SGD on (message, last_reply, intent) examples."""
+        data = [(features(m, r), self.classes.index(i)) for m, r, i in examples if i in self.classes]
+        rng = random.Random(seed)
+        k = len(self.classes)
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            step = rate / (1 + epoch * 0.2)
+            for feats, label in data:
+                probs = self.scores(feats)
+                grads = [step * ((1.0 if c == label else 0.0) - probs[c]) for c in range(k)]
+                for f in feats:
+                    w = self.weights.get(f)
+                    if w is None:
+                        w = self.weights[f] = [0.0] * k
+                    for c in range(k):
+                        w[c] += grads[c]
+        self.trained_on = len(data)
+        return self
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "classes": self.classes, "n_buckets": N_BUCKETS, "trained_on": self.trained_on,
+            "weights": {str(f): [round(v, 4) for v in w] for f, w in self.weights.items()},
+        }
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(payload))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path):
+        payload = json.loads(path.read_text())
+        if payload.get("n_buckets") != N_BUCKETS:
+            raise ValueError("model was trained with a different feature space")
+        return cls(payload["classes"], {int(f): w for f, w in payload["weights"].items()}, payload["trained_on"])
+
+# (message, bot's previous reply, intent): enough for a fresh install to cope
+SEED_EXAMPLES = [
+    ("hi", "", "greeting"), ("hello there", "", "greeting"), ("hey!", "", "greeting"),
+    ("good morning", "", "greeting"), ("good evening", "", "greeting"), ("hiya", "", "greeting"),
+    ("hello, anyone there?", "", "greeting"), ("hey, how's it going", "", "greeting"),
+    ("i'd like to book a facial", "", "book"), ("book me in for a consultation", "", "book"),
+    ("can i book an appointment tomorrow at 3pm", "", "book"), ("schedule a laser session on friday", "", "book"),
+    ("i want to make an appointment", "", "book"), ("book 2026-11-03 at 10:00", "", "book"),
+    ("reserve a slot for next monday morning", "", "book"), ("can you fit me in on thursday at 11am", "", "book"),
+    ("i need a consultation next week", "", "book"), ("please book this for me", "", "book"),
+    ("sign me up for a hydration facial", "", "book"), ("let's do 2pm", "Which time works for you?", "book"),
+    ("3pm works", "What time works best for you?", "book"), ("10:30 please", "What time works best for you?", "book"),
+    ("ann@example.com", "To confirm, may I have your email address?", "book"),
+    ("it's bob@example.com", "Could you share your email to confirm the booking?", "book"),
+    ("yes please book it", "Would you like me to book 10:00?", "book"),
+    ("book this one", "Here are the open slots for Friday.", "book"),
+    ("cancel my appointment", "", "cancel"), ("i need to cancel", "", "cancel"),
+    ("please cancel my booking for tomorrow", "", "cancel"), ("can't make it, cancel it", "", "cancel"),
+    ("remove my appointment", "", "cancel"), ("delete my booking", "", "cancel"),
+    ("cancel this please", "", "cancel"), ("ann@example.com", "Could you confirm the email address used for the booking you want to cancel?", "cancel"),
+    ("reschedule my appointment", "", "reschedule"), ("can i move my booking to friday", "", "reschedule"),
+    ("i need to change my appointment time", "", "reschedule"), ("move it to 4pm", "", "reschedule"),
+    ("push my facial to next week", "", "reschedule"), ("could we shift this to thursday", "", "reschedule"),
+    ("reschedule to tomorrow at 11", "", "reschedule"), ("change my booking to a later time", "", "reschedule"),
+    ("what times are available tomorrow", "", "availability"), ("any free slots on friday?", "", "availability"),
+    ("when are you open", "", "availability"), ("do you have anything this afternoon", "", "availability"),
+    ("show me availability for next week", "", "availability"), ("is this friday open?", "", "availability"),
+    ("what's free on 2026-11-04", "", "availability"), ("any openings for a facial?", "", "availability"),
+    ("when can i come in", "", "availability"), ("which slots do you have monday", "", "availability"),
+    ("how much is a facial", "", "question"), ("what services do you offer", "", "question"),
+    ("what is this laser therapy", "", "question"), ("where are you located", "", "question"),
+    ("show my appointments", "", "question"), ("what's my booking history", "", "question"),
+    ("how long does a consultation take", "", "question"), ("who are you", "", "question"),
+    ("is this painful?", "", "question"), ("do you take insurance", "", "question"),
+    ("thanks", "", "question"), ("ok", "", "question"),
+    ("that's wrong", "", "correction"), ("no, i said thursday not tuesday", "", "correction"),
+    ("you got my email wrong", "", "correction"), ("that's not what i asked", "", "correction"),
+    ("sorry i meant 3pm not 2pm", "", "correction"), ("wrong day, fix it", "", "correction"),
+]
+
+# --- Decision log (training data) ---
+
+# Opt-in: the log holds what clients typed. Emails and introduced names are
+# replaced before writing, and the file is rotated (one .1 generation kept)
+# at NLU_DECISION_LOG_MAX_MB.
+REDACTED_EMAIL = "client@example.com"
+REDACTED_NAME = "Alex"
+
+def _log_path():
+    value = os.getenv("NLU_DECISION_LOG", "off")
+    if value.lower() in ("", "off", "0", "false"):
+        return None
+    return DATA_DIR.parent / value  # relative paths are relative to backend/
+
+_log_lock = threading.Lock()
+
+def redact(text: str) -> str:
+    """Replaces emails and "my name is ..." names with fixed stand-ins, keeping the sentence shape for training."""
+    text = _EMAIL.sub(REDACTED_EMAIL, text or "")
+    return _NAME.sub(lambda m: m.group(0)[:m.start(1) - m.start(0)] + REDACTED_NAME, text)
+
+def _last_reply(history: list) -> str:
+    return next((h.get("content", "") for h in reversed(history) if h.get("role") == "assistant"), "")
+
+def log_decision(message: str, history: list, decision: dict):
+    """Appends a redacted remote-brain decision to the training log, if NLU_DECISION_LOG names one."""
+    path = _log_path()
+    if path is None:
+        return
+    record = {
+        "today": _today().date().isoformat(), "message": redact(message), "last_reply": redact(_last_reply(history)[:300]),
+        **{k: decision.get(k) for k in ("intent", "target_date", "target_time")},
+        "user_email": REDACTED_EMAIL if decision.get("user_email") else None,
+    }
+    max_bytes = float(os.getenv("NLU_DECISION_LOG_MAX_MB", "5")) * 1024 * 1024
+    try:
+        with _log_lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if path.exists() and path.stat().st_size >= max_bytes:
+                path.replace(path.with_name(path.name + ".1"))
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        logger.warning("Could not log decision: %s", e)
+
+def read_log(path: Path) -> list[dict]:
+    if not path or not path.exists():
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def train(records: list[dict], seed_examples: bool = True) -> IntentModel:
+    examples = list(SEED_EXAMPLES) if seed_examples else []
+    examples += [(r["message"], r.get("last_reply", ""), r["intent"]) for r in records if r.get("intent") in INTENTS]
+    return IntentModel().fit(examples)
+
+_model = None
+_model_lock = threading.Lock()
+
+def model() -> IntentModel:
+    """The trained model from MODEL_PATH, or one fitted to the seed set when none has been trained yet."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                try:
+                    _model = IntentModel.load(MODEL_PATH) if MODEL_PATH.exists() else train([])
+                except (ValueError, KeyError, OSError) as e:
+                    logger.warning("Ignoring unusable NLU model %s: %s", MODEL_PATH, e)
+                    _model = train([])
+    return _model
+
+# --- Turn understanding ---
+
+WRITE_INTENTS = ("book", "reschedule", "cancel")  # the intents a bare answer can continue
+# Entities a continuing turn may take from the user's earlier turns. A
+# reschedule never inherits a time: the earlier one is the slot being left.
+_INHERITED = {
+    "book": ("target_date", "target_time", "user_email", "user_name"),
+    "cancel": ("target_date", "target_time", "user_email", "user_name"),
+    "reschedule": ("user_email", "user_name"),
+}
+_NEGATION = re.compile(r"\b(don'?t|do not|doesn'?t|not yet|not now|no need|never|rather not|won'?t|hold off)\b")
+# A question or a second request next to a write ("book me at 10 but first what does laser cost")
+_SECONDARY = re.compile(r"\?|\b(but|also|first|then|instead|or|what|how|why|which|price|prices|cost|costs)\b")
+
+def understand(message: str, history: list = (), today: datetime = None) -> dict:
+    """
+    Decision fields for one turn: intent, confidence, entities (filled from
+    the user's earlier turns when this one leaves them out), missing_info,
+    response_text and reasoning. "defer" marks turns the local tier must not
+    act on alone: booking, moving or cancelling with anything taken from an
+    earlier turn, negated requests, requests next to a question or another
+    request, and unclear repeats.
+    """
+    today = today or _today()
+    last_reply = _last_reply(history)
+    intent, confidence = model().predict(message, last_reply)
+    found = extract(message, today)
+
+    earlier = [h.get("content", "") for h in history if h.get("role") == "user"][-6:]
+    if intent in ("question", "greeting") and (found["user_email"] or found["target_time"]) and earlier:
+        # A bare answer ("3pm", an email) continues whatever the user was doing
+        previous, _ = model().predict(earlier[-1])
+        if previous in WRITE_INTENTS:
+            intent = previous
+    inherited = set()
+    if intent in WRITE_INTENTS:
+        for text in reversed(earlier):
+            before = extract(text, today)
+            for key in _INHERITED[intent]:
+                if not found[key] and before[key]:
+                    found[key] = before[key]
+                    inherited.add(key)
+
+    decision = {
+        "intent": intent, "confidence": round(confidence, 3),
+        "target_date": found["target_date"], "target_time": found["target_time"],
+        "user_email": found["user_email"], "user_contact": found["user_email"], "user_name": found["user_name"],
+        "recurrence": found["recurrence"], "missing_info": [],
+        "reasoning": f"local nlu ({confidence:.2f})",
+    }
+    needed = {"book": ("date", "time", "email"), "reschedule": ("email",), "cancel": ("email",)}.get(intent, ())
+    have = {"date": found["target_date"], "time": found["target_time"], "email": found["user_email"]}
+    decision["missing_info"] = [k for k in needed if not have[k]]
+    decision["response_text"] = _reply(decision)
+    # Repeating bookings without a clear count are left to the model
+    lowered = message.lower()
+    decision["defer"] = found["recurrence_unclear"] or (
+        intent in WRITE_INTENTS and bool(inherited or _NEGATION.search(lowered) or _SECONDARY.search(lowered))
+    )
+    return decision
+
+def confirmation(decision: dict) -> dict:
+    """
+    A deferred write turn answered without the model: nothing is booked,
+    moved or cancelled; the client is asked to state the request in full.
+    """
+    d = decision
+    if d["intent"] == "book" and d["target_date"] and d["target_time"]:
+        ask = f"Just to confirm: should I book {d['target_date']} at {d['target_time']}?"
+    elif d["intent"] == "reschedule":
+        ask = "Just to confirm: which appointment should I move, and to what day and time?"
+    elif d["intent"] == "cancel":
+        ask = "Just to confirm: should I cancel your appointment?"
+    else:
+        ask = "Just to confirm what you'd like me to do:"
+    return {
+        **d, "intent": "question", "missing_info": ["confirmation"],
+        "response_text": f"{ask} Please send the request in one message (day, time and email) and I'll take care of it.",
+        "reasoning": d["reasoning"] + ", write deferred for confirmation",
+    }
+
+def _reply(d: dict) -> str:
+    missing = d["missing_info"]
+    if d["intent"] == "greeting":
+        return f"Hello! Welcome to {get_rules().business_name}. I can help you book, move or cancel an appointment, or check availability. How may I assist you?"
+    if d["intent"] == "book":
+        if "date" in missing:
+            return "I can arrange that. Which day works best for you?"
+        if "time" in missing:
+            return "I can arrange that. What time works best for you?"
+        if "email" in missing:
+            return f"Excellent choice for {d['target_time']}. To confirm, may I have your email address?"
+        return f"Perfect. I'm securing your appointment for {d['target_date']} at {d['target_time']}. One moment..."
+    if d["intent"] in ("cancel", "reschedule") and missing:
+        return "I can certainly help with that. Could you please confirm the email address used for the booking?"
+    if d["intent"] == "availability":
+        return "Let me pull up our current availability for you."
+    if d["intent"] == "correction":
+        return "Sorry about that. Let's fix it: what should I change?"
+    if d["intent"] == "question" and d["user_email"]:
+        return "Retrieving your booking history..."
+    return "I can certainly assist you with our services. We offer Consultations, Facials, and Laser Therapy. Would you like to check availability or book an appointment?"
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Train the local intent model from logged decisions.")
+    parser.add_argument("command", choices=["train"])
+    parser.add_argument("--log", type=Path, default=_log_path(), help="decision log (default: NLU_DECISION_LOG)")
+    parser.add_argument("--out", type=Path, default=MODEL_PATH)
+    args = parser.parse_args()
+    records = read_log(args.log)
+    t0 = time.perf_counter()
+    trained = train(records)
+    trained.save(args.out)
+    print(f"Trained on {trained.trained_on} examples ({len(records)} logged) in {time.perf_counter() - t0:.1f}s -> {args.out}")
+
+if __name__ == "__main__":
+    main()
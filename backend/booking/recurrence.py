@@ -0,0 +1,122 @@
+"""
+Recurring Appointments.
+A series is stored as one row holding an RRULE; occurrences are only
+expanded for the range being queried.
+"""
+import uuid
+from bisect import bisect_left
+from datetime import timedelta
+from dateutil.rrule import rrulestr
+
+from .rules import get_rules
+from .db import SlotConflict, get_appointments_between, get_series_between, insert_series
+from .storage.base import series_starts_between
+from .timeutil import to_local, interval
+
+MAX_OCCURRENCES = 260  # ~5 years of weekly visits
+
+def _rule(rrule: str, dtstart):
+    return rrulestr(rrule, dtstart=dtstart)
+
+def _occurrence(series: dict, start) -> dict:
+    return {
+        "id": f"{series['id']}-{start.strftime('%Y%m%d%H%M')}",
+        "name": series["name"],
+        "contact": series["contact"],
+        "service": series["service"],
+        "start_iso": start.isoformat(),
+        "end_iso": (start + timedelta(minutes=series["duration_minutes"])).isoformat(),
+        "status": "booked",
+        "series_id": series["id"],
+    }
+
+def expand_series(series: dict, start_iso: str, end_iso: str) -> list[dict]:
+    """Occurrences of one series that intersect [start, end)."""
+    return [_occurrence(series, t) for t in series_starts_between(series, to_local(start_iso), to_local(end_iso))]
+
+def occurrences_between(start_iso: str, end_iso: str) -> list[dict]:
+    out = []
+    for series in get_series_between(start_iso, end_iso):
+        out.extend(expand_series(series, start_iso, end_iso))
+    return out
+
+def _intervals(appts: list[dict]) -> list[tuple]:
+    return sorted((*interval(a), a) for a in appts)
+
+def find_series_conflicts(occurrences: list[dict]) -> list[dict]:
+    """
+    Batched check for a whole series: every occurrence must fall in opening
+    hours and keep the buffer to existing bookings, other series and its own
+    neighbours. Loads every booking between the first and last occurrence in
+    one query, then sweeps both sorted lists once.
+    """
+    if not occurrences:
+        return []
+    rules = get_rules()
+    buffer = timedelta(minutes=rules.buffer_minutes)
+    first = (to_local(occurrences[0]["start_iso"]) - buffer).isoformat()
+    last = (to_local(occurrences[-1]["end_iso"]) + buffer).isoformat()
+    existing = _intervals(get_appointments_between(first, last) + occurrences_between(first, last))
+    starts = [e[0] for e in existing]
+    longest = max((e[1] - e[0] for e in existing), default=timedelta(0))
+
+    conflicts = []
+    previous_end = None
+    for occ in occurrences:
+        o0, o1 = interval(occ)
+        problem = rules.hours_problem(o0, o1)
+        if problem is None and previous_end is not None and previous_end + buffer > o0:
+            problem = "Too close to the previous occurrence"
+        previous_end = o1
+        if problem:
+            conflicts.append({"occurrence": occ, "reason": problem})
+            continue
+        i = bisect_left(starts, o0 - buffer - longest)
+        while i < len(existing) and existing[i][0] < o1 + buffer:
+            b0, b1, appt = existing[i]
+            if b1 + buffer > o0:
+                kind = "Conflict" if b0 < o1 and b1 > o0 else "Buffer violation"
+                conflicts.append({"occurrence": occ, "conflicts_with": appt,
+                                  "reason": f"{kind} with {appt.get('service', 'appointment')} at {b0.strftime('%H:%M')}"})
+                break
+            i += 1
+    return conflicts
+
+def book_series(name: str, contact: str, service: str, rrule: str, dtstart_iso: str, duration_minutes: int) -> dict:
+    """
+    Validates the whole series in one pass and stores it as a single row.
+    Returns {"series": ..., "occurrences": n}, {"conflicts": [...]} or {"error": ...}.
+    """
+    dtstart = to_local(dtstart_iso)
+    try:
+        rule = _rule(rrule, dtstart)
+    except ValueError as e:
+        return {"error": f"Invalid recurrence rule ({e})."}
+    starts = []
+    for t in rule:
+        if len(starts) == MAX_OCCURRENCES:
+            return {"error": f"Series too long (max {MAX_OCCURRENCES} occurrences). Add COUNT or UNTIL."}
+        starts.append(t)
+    if not starts:
+        return {"error": "Rule produced no occurrences."}
+
+    series = {
+        "id": str(uuid.uuid4())[:8],
+        "name": name or "Guest",
+        "contact": contact or "Unknown",
+        "service": service,
+        "rrule": rrule,
+        "dtstart_iso": dtstart.isoformat(),
+        "until_iso": (starts[-1] + timedelta(minutes=duration_minutes)).isoformat(),
+        "duration_minutes": duration_minutes,
+        "status": "booked",
+    }
+    conflicts = find_series_conflicts([_occurrence(series, t) for t in starts])
+    if conflicts:
+        return {"conflicts": conflicts}
+    try:
+        insert_series(series)
+    except SlotConflict as e:
+        # Another booking took an occurrence's slot between the check and the write
+        return {"error": f"One of those times was just taken ({e})."}
+    return {"series": series, "occurrences": len(starts)}
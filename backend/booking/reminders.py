@@ -0,0 +1,285 @@
+"""
+Appointment Reminders.
+Bookings get reminders REMINDER_OFFSETS_HOURS before they start (default
+24h and 2h; empty disables). Cancelling an appointment drops its reminders
+and moving it re-times them, through the booking change events.
+
+Pending reminders live in SQLite/Postgres and, per process, in a
+hierarchical timing wheel: insert and cancel are O(1) however many are
+pending, and a tick only touches the reminders that are due. The wheel is
+rebuilt from the pending rows on startup. Every worker may hold the same
+reminder; the one that claims the row sends it, so each is sent at most
+once (a worker dying mid-send drops that reminder).
+
+Channels: email (email_service), sms and webhook (stubs).
+"""
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from .db import (
+    insert_reminders, cancel_reminders, get_pending_reminders, claim_reminder, finish_reminder,
+    get_appointment, queue_notification,
+)
+from .email_service import send_reminder_email
+from .events import subscribe
+from .telemetry import increment, register_collector
+from .timeutil import to_local
+
+logger = logging.getLogger("booking.reminders")
+
+MAX_ATTEMPTS = 3
+RETRY_AFTER = timedelta(minutes=5)
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel over integer ticks. Level L has `slots` slots
+    of slots**L ticks each; an entry sits at the lowest level whose span
+    covers it and moves down a level each time its slot comes round.
+    """
+    def __init__(self, now_tick: int, slots: int = 64, levels: int = 4):
+        self.slots = slots
+        self.levels = levels
+        self.current = now_tick
+        self.wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        self._slot_of = {}  # key -> slot dict holding it
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def __contains__(self, key):
+        return key in self._slot_of
+
+    def add(self, key, due_tick: int, value):
+        self.remove(key)
+        self._place(key, max(due_tick, self.current + 1), value)
+
+    def remove(self, key):
+        slot = self._slot_of.pop(key, None)
+        if slot is not None:
+            return slot.pop(key)[1]
+        return None
+
+    def _place(self, key, due_tick: int, value):
+        delta = due_tick - self.current
+        span = self.slots
+        for level in range(self.levels):
+            if delta < span or level == self.levels - 1:
+                width = span // self.slots
+                if delta >= span:  # beyond the top level: park in its last slot and re-place on the way round
+                    index = (self.current // width - 1) % self.slots
+                else:
+                    index = (due_tick // width) % self.slots
+                slot = self.wheels[level][index]
+                slot[key] = (due_tick, value)
+                self._slot_of[key] = slot
+                return
+            span *= self.slots
+
+    def advance(self, now_tick: int) -> list:
+        """Moves the wheel to now_tick; returns (due_tick, key, value) of every entry that came due, oldest first."""
+        due = []
+        while self.current < now_tick:
+            self.current += 1
+            t = self.current
+            width = self.slots
+            for level in range(1, self.levels):
+                if t % width:
+                    break
+                # This level's slot comes round: spread it over the levels below
+                slot = self.wheels[level][(t // width) % self.slots]
+                entries = list(slot.items())
+                slot.clear()
+                for key, (due_tick, value) in entries:
+                    del self._slot_of[key]
+                    if due_tick <= t:
+                        due.append((due_tick, key, value))
+                    else:
+                        self._place(key, due_tick, value)
+                width *= self.slots
+            slot = self.wheels[0][t % self.slots]
+            for key in [k for k, (due_tick, _) in slot.items() if due_tick <= t]:
+                del self._slot_of[key]
+                due_tick, value = slot.pop(key)
+                due.append((due_tick, key, value))
+        due.sort(key=lambda d: d[0])
+        return due
+
+class ReminderScheduler:
+    def __init__(self, tick_seconds: float = 1.0):
+        self.tick = tick_seconds
+        self.wheel = TimingWheel(self._tick_of(time.time()))
+        self.lock = threading.Lock()
+        self._by_appointment = {}  # appointment id -> ids of its reminders in the wheel
+        self._thread = None
+
+    def _tick_of(self, epoch: float) -> int:
+        return int(epoch // self.tick)
+
+    def add(self, reminder: dict):
+        due = datetime.fromisoformat(reminder["due_iso"]).timestamp()
+        with self.lock:
+            self.wheel.add(reminder["id"], self._tick_of(due), reminder)
+            self._by_appointment.setdefault(reminder["appointment_id"], set()).add(reminder["id"])
+
+    def remove_appointment(self, appointment_id: str):
+        with self.lock:
+            for reminder_id in self._by_appointment.pop(appointment_id, ()):
+                self.wheel.remove(reminder_id)
+
+    def recover(self) -> int:
+        """Loads every pending reminder from the database into the wheel."""
+        pending = get_pending_reminders()
+        for reminder in pending:
+            self.add(reminder)
+        return len(pending)
+
+    def run_due(self, now: float = None) -> int:
+        with self.lock:
+            due = self.wheel.advance(self._tick_of(now if now is not None else time.time()))
+            for _, reminder_id, reminder in due:
+                ids = self._by_appointment.get(reminder["appointment_id"])
+                if ids is not None:
+                    ids.discard(reminder_id)
+                    if not ids:
+                        del self._by_appointment[reminder["appointment_id"]]
+        for _, _, reminder in due:
+            _dispatch(reminder)
+        return len(due)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        def loop():
+            while True:
+                time.sleep(self.tick)
+                try:
+                    self.run_due()
+                except Exception:
+                    logger.exception("Reminder tick failed")
+        self._thread = threading.Thread(target=loop, daemon=True, name="reminders")
+        self._thread.start()
+
+scheduler = ReminderScheduler()
+
+def _offsets() -> list[timedelta]:
+    raw = os.getenv("REMINDER_OFFSETS_HOURS", "24,2")
+    return [timedelta(hours=float(h)) for h in raw.split(",") if h.strip()]
+
+def schedule_reminders(appt: dict, channels=("email",)) -> list[dict]:
+    """
+    Persists and schedules the reminders of a booked appointment; offsets
+    already past are skipped, and so is email when the contact isn't an address.
+    """
+    if appt.get("status") != "booked":
+        return []
+    if "@" not in appt["contact"]:
+        channels = [c for c in channels if c != "email"]
+    start = to_local(appt["start_iso"]).astimezone(timezone.utc)
+    now = datetime.now(timezone.utc)
+    reminders = [
+        {
+            "id": uuid.uuid4().hex[:12], "appointment_id": appt["id"], "channel": channel,
+            "recipient": appt["contact"], "due_iso": (start - offset).isoformat(),
+            "status": "pending", "attempts": 0, "created_iso": now.isoformat(),
+        }
+        for offset in _offsets() if start - offset > now
+        for channel in channels
+    ]
+    if not reminders:
+        return []
+    insert_reminders(reminders)
+    for reminder in reminders:
+        scheduler.add(reminder)
+    return reminders
+
+def cancel_appointment_reminders(appointment_id: str) -> list[str]:
+    """Drops the appointment's pending reminders; returns the channels they used."""
+    channels = cancel_reminders(appointment_id)
+    scheduler.remove_appointment(appointment_id)
+    return channels
+
+@subscribe
+def _on_booking_change(kind: str, appt: dict, previous: dict = None):
+    if kind == "cancelled":
+        cancel_appointment_reminders(appt["id"])
+    elif kind == "moved":
+        channels = cancel_appointment_reminders(appt["id"])
+        if channels:
+            schedule_reminders(appt, tuple(dict.fromkeys(channels)))
+
+# --- Channels ---
+
+_channels = {}
+
+def channel(name: str):
+    """Registers send(reminder, appt) -> bool for a channel name."""
+    def register(fn):
+        _channels[name] = fn
+        return fn
+    return register
+
+def _when(appt: dict) -> str:
+    return to_local(appt["start_iso"]).strftime("%a %b %d, %H:%M")
+
+@channel("email")
+def _send_email(reminder: dict, appt: dict) -> bool:
+    return send_reminder_email(reminder["recipient"], appt["name"], appt["service"], _when(appt))
+
+@channel("sms")
+def _send_sms(reminder: dict, appt: dict) -> bool:
+    # Stub: no SMS provider yet, so the text goes to the notifications outbox
+    queue_notification("sms", reminder["recipient"], "Appointment reminder",
+                       f"Reminder: {appt['service']} on {_when(appt)}.", datetime.now(timezone.utc).isoformat())
+    return True
+
+@channel("webhook")
+def _send_webhook(reminder: dict, appt: dict) -> bool:
+    # Stub: POSTs the reminder to REMINDER_WEBHOOK_URL when set, otherwise only logs it
+    url = os.getenv("REMINDER_WEBHOOK_URL")
+    payload = {"reminder": reminder, "appointment": dict(appt)}
+    if not url:
+        logger.info("Webhook reminder (no REMINDER_WEBHOOK_URL): %s", payload)
+        return True
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return 200 <= response.status < 300
+
+def _dispatch(reminder: dict):
+    if not claim_reminder(reminder["id"]):
+        return  # cancelled, or another worker is sending it
+    appt = get_appointment(reminder["appointment_id"])
+    if not appt or appt["status"] != "booked":
+        finish_reminder(reminder["id"], "cancelled")
+        return
+    send = _channels.get(reminder["channel"])
+    try:
+        ok = bool(send and send(reminder, appt))
+    except Exception as e:
+        logger.warning("Reminder %s via %s failed: %s", reminder["id"], reminder["channel"], e)
+        ok = False
+    increment("booking_reminders_total", {"channel": reminder["channel"], "outcome": "sent" if ok else "failed"})
+    if ok:
+        finish_reminder(reminder["id"], "sent")
+    elif reminder.get("attempts", 0) + 1 < MAX_ATTEMPTS:
+        retry = {**reminder, "attempts": reminder.get("attempts", 0) + 1,
+                 "due_iso": (datetime.now(timezone.utc) + RETRY_AFTER).isoformat()}
+        finish_reminder(reminder["id"], "pending", retry["due_iso"])
+        scheduler.add(retry)
+    else:
+        finish_reminder(reminder["id"], "failed")
+
+def start_reminders() -> int:
+    """Rebuilds the wheel from the database and starts the dispatch thread; returns how many were pending."""
+    recovered = scheduler.recover()
+    scheduler.start()
+    return recovered
+
+@register_collector
+def _reminder_gauges():
+    return [("booking_reminders_pending", {}, len(scheduler.wheel))]
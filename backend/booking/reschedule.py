@@ -0,0 +1,117 @@
+"""
+Transactional Reschedule.
+Moves appointments in place instead of cancelling and rebooking, so a
+client never loses their slot to a failed second step. Each appointment
+keeps its own duration. A batch is checked against opening hours and
+the per-day index (other bookings, series occurrences and the buffer),
+then written in one storage transaction, which re-checks overlaps and
+applies all of the moves or none; each appointment that doesn't fit gets
+the best open times on its target day instead. The moved events refresh
+both days' indexes and slot caches and re-time reminders.
+"""
+from datetime import datetime, timedelta
+
+from .rules import get_rules
+from .db import SlotConflict, get_appointment, update_appointment_time, move_appointments
+from .day_index import get_day_index
+from .availability import get_open_slots
+from .simulation import rank_alternatives
+from .timeutil import to_local, interval, business_zone
+
+def plan_moves(moves: list[tuple]) -> dict:
+    """
+    Resolves (appt_id, new_start_iso) pairs into (appt_id, start_iso, end_iso)
+    storage moves. Returns {"moves": [...], "appointments": [...]} or
+    {"error": ...} if an appointment is missing or no longer booked.
+    """
+    planned, appts = [], []
+    for appt_id, new_start_iso in moves:
+        appt = get_appointment(appt_id)
+        if not appt or appt["status"] != "booked":
+            return {"error": f"Appointment {appt_id} is not an active booking."}
+        start, end = interval(appt)
+        new_start = to_local(new_start_iso)
+        planned.append((appt_id, new_start.isoformat(), (new_start + (end - start)).isoformat()))
+        appts.append(appt)
+    return {"moves": planned, "appointments": appts}
+
+def find_move_conflicts(planned: list[tuple]) -> list[dict]:
+    """
+    Conflicts, buffer violations, past and out-of-hours targets the moves
+    would create, against the rest of the calendar and each other. The moved
+    appointments' current slots don't count, since they are vacated in the
+    same transaction.
+    """
+    rules = get_rules()
+    buffer = timedelta(minutes=rules.buffer_minutes)
+    moving = {appt_id for appt_id, _, _ in planned}
+    targets = sorted((to_local(s), to_local(e), appt_id) for appt_id, s, e in planned)
+
+    now = datetime.now(business_zone())
+    conflicts = []
+    for start, end, appt_id in targets:
+        problem = "That time has already passed" if start <= now else rules.hours_problem(start, end)
+        if problem:
+            conflicts.append({"id": appt_id, "start_iso": start.isoformat(), "reason": problem})
+        for b0, b1, other in get_day_index(start).overlapping(start - buffer, end + buffer):
+            if other["id"] in moving:
+                continue
+            kind = "Direct conflict" if start < b1 and end > b0 else "Buffer violation"
+            conflicts.append({"id": appt_id, "start_iso": start.isoformat(),
+                              "reason": f"{kind} with {other.get('service', 'appointment')} at {b0.strftime('%H:%M')}"})
+    for (s0, e0, first), (s1, _, second) in zip(targets, targets[1:]):
+        if e0 + buffer > s1:
+            conflicts.append({"id": second, "start_iso": s1.isoformat(), "reason": f"Too close to appointment {first}, moved in the same batch"})
+    return conflicts
+
+def suggest_times(appt: dict, day_iso: str, requested_iso: str = None, taken: list = (), limit: int = 3) -> list[str]:
+    """
+    Safest open starts on `day_iso` for the appointment's service and
+    length, nearest the requested time first, clear of the `taken`
+    (start, end) targets of the rest of its batch.
+    """
+    rules = get_rules()
+    buffer = timedelta(minutes=rules.buffer_minutes)
+    start, end = interval(appt)
+    length = end - start
+    service = next((k for k, s in rules.services.items() if appt["service"] in (k, s["name"])), None)
+    candidates = [s["start"] for s in get_open_slots(day_iso, count=96, service=service)]  # the whole day's grid
+    ranked = rank_alternatives(day_iso, int(length.total_seconds() // 60), candidates, requested_iso, limit=len(candidates))
+    fits = [
+        a["start_iso"] for a in ranked
+        if not any(to_local(a["start_iso"]) < t1 + buffer and to_local(a["start_iso"]) + length + buffer > t0 for t0, t1 in taken)
+    ]
+    return fits[:limit]
+
+def reschedule_appointments(moves: list[tuple]) -> dict:
+    """
+    Moves every (appt_id, new_start_iso) in one transaction.
+    Returns {"moved": [appointments after the move]}, {"conflicts": [...]}
+    or {"error": ...}; on anything but "moved" nothing has changed. Each
+    conflict names its appointment and carries "alternatives" on that day.
+    """
+    if not moves:
+        return {"error": "Nothing to reschedule."}
+    plan = plan_moves(moves)
+    if "error" in plan:
+        return plan
+    conflicts = find_move_conflicts(plan["moves"])
+    if conflicts:
+        appts = {a["id"]: a for a in plan["appointments"]}
+        for c in conflicts:
+            day = to_local(c["start_iso"]).date().isoformat()
+            taken = [(to_local(s), to_local(e)) for appt_id, s, e in plan["moves"] if appt_id != c["id"]]
+            c["alternatives"] = suggest_times(appts[c["id"]], day, c["start_iso"], taken)
+        return {"conflicts": conflicts}
+    try:
+        if len(plan["moves"]) == 1:
+            update_appointment_time(*plan["moves"][0])
+        else:
+            move_appointments(plan["moves"])
+    except SlotConflict as e:
+        # Another booking took a target slot between the check and the write
+        return {"conflicts": [{"reason": str(e)}]}
+    return {"moved": [
+        appt.replace(start_iso=start_iso, end_iso=end_iso)
+        for appt, (_, start_iso, end_iso) in zip(plan["appointments"], plan["moves"])
+    ]}
@@ -12,7 +12,9 @@ class BookingRules:
     lunch_end: str = "13:00"
     duration_minutes: int = 30 # Default slot if not specified
     buffer_minutes: int = 5
+    slot_grid_minutes: int = 15 # Candidate start times are offered on this grid
     emergency_override: bool = False 
+    waitlist_hold_minutes: int = 30 # How long a backfilled slot is held for a waitlisted client
     
     # New Business Logic
     services: Dict[str, dict] = field(default_factory=lambda: {
@@ -21,6 +23,19 @@ class BookingRules:
         "laser": {"name": "Laser Precision Therapy", "duration": 45, "price": 200, "desc": "Targeted treatment for skin correction."}
     })
 
+    def hours_problem(self, start, end):
+        """Why [start, end) can't be booked on the calendar (closed day, outside hours, lunch), or None."""
+        def at(hhmm: str):
+            hour, minute = map(int, hhmm.split(":"))
+            return start.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if start.weekday() not in self.work_days:
+            return "Closed that day"
+        if start < at(self.day_start) or end > at(self.day_end):
+            return f"Outside opening hours ({self.day_start}-{self.day_end})"
+        if start < at(self.lunch_end) and end > at(self.lunch_start):
+            return "Overlaps the lunch break"
+        return None
+
     def to_dict(self):
          return {
              "business_name": self.business_name,
@@ -0,0 +1,106 @@
+"""
+What-If Simulation Service.
+Evaluates many proposed slots against a day's real bookings in one pass,
+backed by the sorted per-day calendar index.
+"""
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+from .rules import get_rules
+from .day_index import get_day_index
+from .timeutil import to_local, business_zone
+from .intelligence import gap_penalty, integrity_from_penalty
+
+def _knock_on(entries: list, i: int, end, buffer: timedelta) -> dict:
+    """
+    Follows the chain of appointments from position i that would have to
+    start later if the proposal ending at `end` kept its buffer.
+    """
+    affected = 0
+    delay = timedelta(0)
+    ready = end + buffer
+    for start, finish, _ in entries[i:]:
+        if ready <= start:
+            break
+        push = ready - start
+        affected += 1
+        delay += push
+        ready = finish + push + buffer
+    return {"appointments": affected, "delay_minutes": int(delay.total_seconds() // 60)}
+
+def simulate_proposals(day, proposals: list[dict]) -> list[dict]:
+    """
+    Batched What-If evaluation for one day.
+    `proposals` is a list of {"start_iso": ..., "duration": minutes}. The day
+    is loaded once; each proposal reports direct conflicts, buffer violations,
+    the fragmentation it would create and its downstream knock-on effects.
+    Proposals in the past or outside opening hours are always unsafe.
+    """
+    rules = get_rules()
+    buffer = timedelta(minutes=rules.buffer_minutes)
+    index = get_day_index(day)
+    entries = index.entries
+    now = datetime.now(business_zone())
+
+    results = []
+    for proposal in proposals:
+        try:
+            start = to_local(proposal["start_iso"])
+        except Exception:
+            results.append({**proposal, "future_risk": 0.0, "conflicts_detected": [], "recommendation": "unknown_date"})
+            continue
+        end = start + timedelta(minutes=proposal["duration"])
+
+        problem = "That time has already passed" if start <= now else rules.hours_problem(start, end)
+        conflicts = [problem] if problem else []
+        buffer_violations = 0
+        for b0, b1, appt in index.overlapping(start - buffer, end + buffer):
+            if start < b1 and end > b0:
+                conflicts.append(f"Direct conflict with {appt.get('service', 'appointment')} at {b0.strftime('%H:%M')}")
+            else:
+                buffer_violations += 1
+                conflicts.append(f"Buffer violation with {appt.get('service', 'appointment')} at {b0.strftime('%H:%M')}")
+
+        # Fragmentation: only the gaps around the insertion point change
+        i = bisect_right(index.starts, start)
+        prev_end = entries[i - 1][1] if i > 0 else None
+        next_start = entries[i][0] if i < len(entries) else None
+        delta = 0
+        if prev_end is not None:
+            delta += gap_penalty(prev_end, start)
+        if next_start is not None:
+            delta += gap_penalty(end, next_start)
+        if prev_end is not None and next_start is not None:
+            delta -= gap_penalty(prev_end, next_start)
+
+        knock_on = _knock_on(entries, i, end, buffer)
+
+        risk = 1.0 if conflicts else min(0.4, max(0, delta) / 50)
+        results.append({
+            **proposal,
+            "future_risk": risk,
+            "conflicts_detected": conflicts,
+            "buffer_violations": buffer_violations,
+            "fragmentation_delta": delta,
+            "integrity_after": integrity_from_penalty(index.penalty + delta),
+            "knock_on": knock_on,
+            "recommendation": "unsafe" if risk > 0.5 else "safe"
+        })
+    return results
+
+def rank_alternatives(day, duration: int, candidate_starts: list[str], requested_iso: str = None, limit: int = 3) -> list[dict]:
+    """
+    Simulates all candidates in one call and returns the safest ones,
+    preferring better calendar integrity and closeness to the requested time.
+    """
+    results = simulate_proposals(day, [{"start_iso": s, "duration": duration} for s in candidate_starts])
+    requested = to_local(requested_iso) if requested_iso else None
+
+    def distance(r):
+        if requested is None:
+            return 0
+        return abs((to_local(r["start_iso"]) - requested).total_seconds())
+
+    safe = [r for r in results if r["recommendation"] == "safe"]
+    safe.sort(key=lambda r: (r["future_risk"], -r["integrity_after"], distance(r)))
+    return safe[:limit]
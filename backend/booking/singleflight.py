@@ -0,0 +1,98 @@
+"""
+Chat Turn Coordination.
+Double-clicks and client retries resend the same /chat turn. Turns are
+keyed by the client's request id (or a hash of the turn when it sends
+none):
+- a turn already in flight is joined rather than run again
+- a turn that just finished replays its result for a short while
+- turns of one session run one at a time, in arrival order
+
+All of this is per process and lives on the event loop. Across uvicorn
+workers, bookings are still applied once through their idempotency key.
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from starlette.concurrency import run_in_threadpool
+
+from .telemetry import increment
+
+def turn_key(session_id: str, message: str, history: list, request_id: str = None) -> str:
+    if request_id:
+        return f"{session_id}:{request_id}"
+    # History length tells a retry (same length) from the same words said again later
+    digest = hashlib.sha1(f"{len(history)}\x00{message}".encode()).hexdigest()[:16]
+    return f"{session_id}:{digest}"
+
+class TurnCoordinator:
+    def __init__(self, replay_seconds: float = 30, max_replays: int = 1024):
+        self.replay_seconds = replay_seconds
+        self.max_replays = max_replays
+        self._inflight = {}          # turn key -> Future shared by duplicates
+        self._recent = OrderedDict() # turn key -> (expires, result)
+        self._sessions = {}          # session id -> [Lock, users]
+
+    @asynccontextmanager
+    async def _session_lock(self, session_id: str):
+        entry = self._sessions.setdefault(session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._sessions[session_id]
+
+    def _replay(self, key: str):
+        hit = self._recent.get(key)
+        if hit is None:
+            return None
+        if hit[0] < time.monotonic():
+            del self._recent[key]
+            return None
+        return hit
+
+    def _remember(self, key: str, result):
+        self._recent[key] = (time.monotonic() + self.replay_seconds, result)
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.max_replays:
+            self._recent.popitem(last=False)
+
+    def is_known(self, key: str) -> bool:
+        """True for a duplicate of a turn in flight or recently answered."""
+        return key in self._inflight or self._replay(key) is not None
+
+    async def run(self, session_id: str, key: str, fn):
+        """Runs fn() (blocking) in the threadpool once per turn key, serialized per session."""
+        hit = self._replay(key)
+        if hit is not None:
+            increment("booking_chat_coalesced_total", {"kind": "replay"})
+            return hit[1]
+        shared = self._inflight.get(key)
+        if shared is not None:
+            increment("booking_chat_coalesced_total", {"kind": "inflight"})
+            return await asyncio.shield(shared)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            async with self._session_lock(session_id):
+                result = await run_in_threadpool(fn)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # duplicates re-raise it; nobody else needs to retrieve it
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        self._remember(key, result)
+        future.set_result(result)
+        return result
+
+turns = TurnCoordinator()
@@ -0,0 +1,7 @@
+"""
+Pluggable storage backends.
+SQLite is the default; set DATABASE_URL=postgresql://... to use Postgres.
+"""
+from .base import Repository, SlotConflict, Appointment
+from .sqlite import SQLiteRepository
+from .postgres import PostgresRepository
@@ -0,0 +1,273 @@
+from bisect import bisect_left
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+from dateutil.rrule import rrulestr
+
+from ..timeutil import to_local
+
+class SlotConflict(Exception):
+    """Raised when a write would make two active (booked/held) appointments overlap."""
+
+class Repository:
+    """
+    Storage contract shared by every backend.
+    Appointments are read back as Appointment records and accepted as any
+    mapping with the same keys; waitlist entries and series are plain dicts.
+    Timestamps are ISO-8601 strings. Writes that make an appointment active
+    raise SlotConflict on overlap with another active appointment or with an
+    occurrence of an active series. The db module publishes change events
+    on top of this.
+    """
+    ACTIVE_STATUSES = ("booked", "held")
+
+    def init_schema(self):
+        raise NotImplementedError
+
+    def close(self):
+        """Releases pooled connections (e.g. before forking workers)."""
+
+    # --- Appointments ---
+    def insert_appointment(self, appt: dict, idempotency_key: str = None) -> bool:
+        """
+        Writes the appointment, raising SlotConflict on overlap. With an
+        idempotency_key the key is recorded in the same transaction; if it was
+        already used nothing is written and False is returned.
+        """
+        raise NotImplementedError
+
+    def get_appointment_by_idempotency_key(self, key: str):
+        raise NotImplementedError
+
+    def get_appointments_between(self, start_iso: str, end_iso: str) -> list[dict]:
+        raise NotImplementedError
+
+    def get_appointment(self, appt_id: str):
+        raise NotImplementedError
+
+    def update_appointment_time(self, appt_id: str, start_iso: str, end_iso: str):
+        raise NotImplementedError
+
+    def move_appointments(self, moves: list[tuple]):
+        """
+        Applies (appt_id, start_iso, end_iso) moves in one transaction. If any
+        active appointment would overlap another, including one moved in the
+        same batch, SlotConflict is raised and nothing moves.
+        """
+        raise NotImplementedError
+
+    def set_appointment_status(self, appt_id: str, status: str):
+        raise NotImplementedError
+
+    def get_active_appointments_by_email(self, email: str) -> list[dict]:
+        raise NotImplementedError
+
+    def get_all_user_appointments(self, email: str) -> list[dict]:
+        raise NotImplementedError
+
+    def get_all_appointments(self) -> list[dict]:
+        raise NotImplementedError
+
+    def iter_appointments(self):
+        """Every appointment, streamed from the cursor instead of built into one list."""
+        raise NotImplementedError
+
+    # --- Preferences ---
+    def get_user_preferences(self, contact: str) -> dict:
+        raise NotImplementedError
+
+    def save_user_preferences(self, contact: str, data: dict):
+        raise NotImplementedError
+
+    # --- Waitlist ---
+    def insert_waitlist_entry(self, entry: dict):
+        raise NotImplementedError
+
+    def find_waitlist_match(self, service: str, start_iso: str, end_iso: str):
+        raise NotImplementedError
+
+    def get_waitlist_entry(self, entry_id: str):
+        raise NotImplementedError
+
+    def update_waitlist_entry(self, entry_id: str, status: str, hold_appt_id: str = None, hold_expires_iso: str = None):
+        raise NotImplementedError
+
+    def get_expired_waitlist_holds(self, now_iso: str) -> list[dict]:
+        raise NotImplementedError
+
+    def expire_waitlist_entries(self, now_iso: str) -> int:
+        """Marks waiting entries whose window ended before now as expired; returns how many."""
+        raise NotImplementedError
+
+    def get_all_waitlist_entries(self) -> list[dict]:
+        raise NotImplementedError
+
+    # --- Recurring series ---
+    def insert_series(self, series: dict):
+        """Raises SlotConflict if an active series' occurrence would overlap an active appointment or series."""
+        raise NotImplementedError
+
+    def get_series(self, series_id: str):
+        raise NotImplementedError
+
+    def get_series_between(self, start_iso: str, end_iso: str) -> list[dict]:
+        raise NotImplementedError
+
+    def get_all_series(self) -> list[dict]:
+        raise NotImplementedError
+
+    def set_series_status(self, series_id: str, status: str):
+        raise NotImplementedError
+
+    # --- Notifications (outbox) ---
+    def queue_notification(self, channel: str, recipient: str, subject: str, body: str, created_iso: str):
+        raise NotImplementedError
+
+    # --- Reminders ---
+    def insert_reminders(self, reminders: list[dict]):
+        raise NotImplementedError
+
+    def cancel_reminders(self, appointment_id: str) -> list[str]:
+        """Cancels the appointment's pending reminders; returns their channels."""
+        raise NotImplementedError
+
+    def get_pending_reminders(self) -> list[dict]:
+        raise NotImplementedError
+
+    def claim_reminder(self, reminder_id: str) -> bool:
+        """pending -> sending, counting the attempt. False if another worker got there first or it was cancelled."""
+        raise NotImplementedError
+
+    def finish_reminder(self, reminder_id: str, status: str, due_iso: str = None):
+        """Records the outcome; status 'pending' with a new due_iso schedules a retry."""
+        raise NotImplementedError
+
+APPOINTMENT_COLUMNS = "id, name, contact, service, start_iso, end_iso, status"
+
+class Appointment(Mapping):
+    """
+    One appointments row, built straight from the cursor.
+    Reads like the dict it replaces (appt["start_iso"], .get, {**appt}) but
+    carries no per-row dict, and parses start/end into the business timezone
+    once, the first time they are asked for.
+    """
+    FIELDS = ("id", "name", "contact", "service", "start_iso", "end_iso", "status")
+    __slots__ = FIELDS + ("_start", "_end")
+
+    def __init__(self, id, name, contact, service, start_iso, end_iso, status):
+        self.id = id
+        self.name = name
+        self.contact = contact
+        self.service = service
+        self.start_iso = start_iso
+        self.end_iso = end_iso
+        self.status = status
+        self._start = self._end = None
+
+    @property
+    def start(self) -> datetime:
+        if self._start is None:
+            self._start = to_local(self.start_iso)
+        return self._start
+
+    @property
+    def end(self) -> datetime:
+        if self._end is None:
+            self._end = to_local(self.end_iso)
+        return self._end
+
+    def __getitem__(self, key):
+        if key not in _APPOINTMENT_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __repr__(self):
+        return f"Appointment({self.id!r}, {self.service!r}, {self.start_iso!r}, {self.status!r})"
+
+    def replace(self, **changes) -> "Appointment":
+        """Copy with some fields changed; parsed times are kept where they still apply."""
+        appt = Appointment(*(changes.get(f, getattr(self, f)) for f in self.FIELDS))
+        if "start_iso" not in changes:
+            appt._start = self._start
+        if "end_iso" not in changes:
+            appt._end = self._end
+        return appt
+
+    def to_dict(self) -> dict:
+        return {f: getattr(self, f) for f in self.FIELDS}
+
+_APPOINTMENT_FIELDS = frozenset(Appointment.FIELDS)
+
+def appointment_row(cursor, row) -> Appointment:
+    """sqlite3 row factory for APPOINTMENT_COLUMNS queries."""
+    return Appointment(*row)
+
+WAITLIST_COLUMNS = "id, name, contact, service, window_start_iso, window_end_iso, status, created_iso, hold_appt_id, hold_expires_iso"
+
+def waitlist_row(r) -> dict:
+    return {
+        "id": r[0], "name": r[1], "contact": r[2], "service": r[3],
+        "window_start_iso": r[4], "window_end_iso": r[5], "status": r[6],
+        "created_iso": r[7], "hold_appt_id": r[8], "hold_expires_iso": r[9],
+    }
+
+SERIES_COLUMNS = "id, name, contact, service, rrule, dtstart_iso, until_iso, duration_minutes, status"
+
+def series_row(r) -> dict:
+    return {
+        "id": r[0], "name": r[1], "contact": r[2], "service": r[3], "rrule": r[4],
+        "dtstart_iso": r[5], "until_iso": r[6], "duration_minutes": r[7], "status": r[8],
+    }
+
+def series_starts_between(series: dict, start: datetime, end: datetime) -> list[datetime]:
+    """Start times of the series' occurrences that intersect [start, end)."""
+    rule = rrulestr(series["rrule"], dtstart=to_local(series["dtstart_iso"]))
+    return [t for t in rule.between(start - timedelta(minutes=series["duration_minutes"]), end, inc=False) if t < end]
+
+def series_conflict(series_list: list[dict], start_iso: str, end_iso: str):
+    """
+    Message for the first occurrence among `series_list` overlapping the
+    interval, or None. Series live outside the appointments table, so the
+    backends run this next to their own overlap check.
+    """
+    start, end = to_local(start_iso), to_local(end_iso)
+    for series in series_list:
+        hits = series_starts_between(series, start, end)
+        if hits:
+            return f"Overlaps series {series['id']} at {hits[0].isoformat()}"
+    return None
+
+def series_overlap(series: dict, appointments: list, others: list[dict]):
+    """
+    Message for the first occurrence of `series` overlapping one of the
+    active `appointments` or an occurrence of the `others` series, or None.
+    The backends load both for the series' span inside the insert transaction.
+    """
+    taken = sorted((to_local(a["start_iso"]), to_local(a["end_iso"]), a["id"]) for a in appointments)
+    starts = [t[0] for t in taken]
+    longest = max((t[1] - t[0] for t in taken), default=timedelta(0))
+    length = timedelta(minutes=series["duration_minutes"])
+    for start in series_starts_between(series, to_local(series["dtstart_iso"]), to_local(series["until_iso"])):
+        end = start + length
+        i = bisect_left(starts, start - longest)
+        while i < len(taken) and taken[i][0] < end:
+            if taken[i][1] > start:
+                return f"Occurrence at {start.isoformat()} overlaps appointment {taken[i][2]}"
+            i += 1
+        conflict = series_conflict(others, start.isoformat(), end.isoformat())
+        if conflict:
+            return f"Occurrence at {start.isoformat()}: {conflict.lower()}"
+    return None
+
+REMINDER_COLUMNS = "id, appointment_id, channel, recipient, due_iso, status, attempts, created_iso"
+
+def reminder_row(r) -> dict:
+    return {
+        "id": r[0], "appointment_id": r[1], "channel": r[2], "recipient": r[3],
+        "due_iso": r[4], "status": r[5], "attempts": r[6], "created_iso": r[7],
+    }
@@ -0,0 +1,402 @@
+"""
+PostgreSQL backend (psycopg 3 + psycopg_pool).
+Overlaps between active appointments are prevented by the database itself
+through a tstzrange exclusion constraint, so any number of app nodes can
+write concurrently. Series occurrences are not rows, so writes check them
+in the same transaction: appointment writes take a SHARE lock on the series
+table and series inserts a SHARE ROW EXCLUSIVE one, so the two can't pass
+each other's check (appointment writes still run concurrently).
+
+Requires: pip install "psycopg[binary]" psycopg_pool
+"""
+import os
+from datetime import datetime, timezone
+
+from .base import (
+    Repository, SlotConflict, APPOINTMENT_COLUMNS, Appointment, WAITLIST_COLUMNS, waitlist_row,
+    SERIES_COLUMNS, series_row, series_conflict, series_overlap, REMINDER_COLUMNS, reminder_row,
+)
+
+# Optional dependency, imported on first use so SQLite deployments never pay for it
+psycopg = Jsonb = ConnectionPool = None
+
+def _load_driver():
+    global psycopg, Jsonb, ConnectionPool
+    if psycopg is None:
+        try:
+            import psycopg as driver
+            from psycopg.types.json import Jsonb
+            from psycopg_pool import ConnectionPool
+        except ImportError:
+            raise RuntimeError('DATABASE_URL points at Postgres but psycopg is not installed (pip install "psycopg[binary]" psycopg_pool).')
+        psycopg = driver
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS appointments (
+      id TEXT PRIMARY KEY,
+      name TEXT NOT NULL,
+      contact TEXT NOT NULL,
+      service TEXT NOT NULL,
+      start_iso TEXT COLLATE "C" NOT NULL,
+      end_iso TEXT COLLATE "C" NOT NULL,
+      status TEXT NOT NULL,
+      during TSTZRANGE NOT NULL,
+      CONSTRAINT appointments_no_overlap EXCLUDE USING gist (during WITH &&) WHERE (status IN ('booked', 'held'))
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_appointments_contact ON appointments (contact, start_iso)",
+    """
+    CREATE TABLE IF NOT EXISTS preferences (
+       contact TEXT PRIMARY KEY,
+       data JSONB NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS waitlist (
+       id TEXT PRIMARY KEY,
+       name TEXT NOT NULL,
+       contact TEXT NOT NULL,
+       service TEXT NOT NULL,
+       window_start_iso TEXT COLLATE "C" NOT NULL,
+       window_end_iso TEXT COLLATE "C" NOT NULL,
+       status TEXT NOT NULL,
+       created_iso TEXT COLLATE "C" NOT NULL,
+       hold_appt_id TEXT,
+       hold_expires_iso TEXT COLLATE "C"
+    )
+    """,
+    "DROP INDEX IF EXISTS idx_waitlist_match",
+    "CREATE INDEX IF NOT EXISTS idx_waitlist_fifo ON waitlist (service, status, created_iso)",
+    "CREATE INDEX IF NOT EXISTS idx_waitlist_holds ON waitlist (status, hold_expires_iso)",
+    "CREATE INDEX IF NOT EXISTS idx_waitlist_windows ON waitlist (status, window_end_iso)",
+    """
+    CREATE TABLE IF NOT EXISTS series (
+       id TEXT PRIMARY KEY,
+       name TEXT NOT NULL,
+       contact TEXT NOT NULL,
+       service TEXT NOT NULL,
+       rrule TEXT NOT NULL,
+       dtstart_iso TEXT COLLATE "C" NOT NULL,
+       until_iso TEXT COLLATE "C" NOT NULL,
+       duration_minutes INTEGER NOT NULL,
+       status TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_series_range ON series (status, dtstart_iso, until_iso)",
+    """
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+       key TEXT PRIMARY KEY,
+       appointment_id TEXT NOT NULL,
+       created_iso TEXT COLLATE "C" NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS notifications (
+       id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+       channel TEXT NOT NULL,
+       recipient TEXT NOT NULL,
+       subject TEXT NOT NULL,
+       body TEXT NOT NULL,
+       status TEXT NOT NULL,
+       created_iso TEXT COLLATE "C" NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS reminders (
+       id TEXT PRIMARY KEY,
+       appointment_id TEXT NOT NULL,
+       channel TEXT NOT NULL,
+       recipient TEXT NOT NULL,
+       due_iso TEXT COLLATE "C" NOT NULL,
+       status TEXT NOT NULL,
+       attempts INTEGER NOT NULL DEFAULT 0,
+       created_iso TEXT COLLATE "C" NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_reminders_appt ON reminders (appointment_id, status)",
+    "CREATE INDEX IF NOT EXISTS idx_reminders_pending ON reminders (status, due_iso)",
+]
+
+class PostgresRepository(Repository):
+    def __init__(self, dsn: str, pool_size: int = None):
+        _load_driver()
+        self.pool = ConnectionPool(
+            dsn,
+            min_size=1,
+            max_size=pool_size or int(os.getenv("DB_POOL_SIZE", "10")),
+            open=True,
+        )
+
+    def _fetchall(self, sql: str, params: tuple = ()) -> list:
+        with self.pool.connection() as con:
+            return con.execute(sql, params).fetchall()
+
+    def _fetchone(self, sql: str, params: tuple = ()):
+        with self.pool.connection() as con:
+            return con.execute(sql, params).fetchone()
+
+    def _execute(self, sql: str, params: tuple = ()):
+        # The pool commits on a clean exit and rolls back on error
+        try:
+            with self.pool.connection() as con:
+                con.execute(sql, params)
+        except psycopg.errors.ExclusionViolation as e:
+            raise SlotConflict(str(e)) from e
+
+    def close(self):
+        self.pool.close()
+
+    def init_schema(self):
+        with self.pool.connection() as con:
+            for statement in SCHEMA:
+                con.execute(statement)
+
+    def _check_series_free(self, con, start_iso: str, end_iso: str):
+        con.execute("LOCK TABLE series IN SHARE MODE")  # waits for a series insert in flight
+        rows = con.execute(
+            f"SELECT {SERIES_COLUMNS} FROM series WHERE status = 'booked' AND dtstart_iso < %s AND until_iso > %s",
+            (end_iso, start_iso),
+        ).fetchall()
+        conflict = series_conflict([series_row(r) for r in rows], start_iso, end_iso)
+        if conflict:
+            raise SlotConflict(conflict)
+
+    # --- Appointments ---
+    def insert_appointment(self, appt: dict, idempotency_key: str = None) -> bool:
+        try:
+            with self.pool.connection() as con:
+                if idempotency_key:
+                    # The key row is claimed first; a concurrent retry blocks on it and then sees the conflict
+                    claimed = con.execute(
+                        "INSERT INTO idempotency_keys (key, appointment_id, created_iso) VALUES (%s, %s, %s) ON CONFLICT (key) DO NOTHING RETURNING key",
+                        (idempotency_key, appt["id"], datetime.now(timezone.utc).isoformat()),
+                    ).fetchone()
+                    if not claimed:
+                        return False
+                if appt["status"] in self.ACTIVE_STATUSES:
+                    self._check_series_free(con, appt["start_iso"], appt["end_iso"])
+                con.execute(
+                    f"INSERT INTO appointments ({APPOINTMENT_COLUMNS}, during) VALUES (%s, %s, %s, %s, %s, %s, %s, tstzrange(%s::timestamptz, %s::timestamptz, '[)'))",
+                    (appt["id"], appt["name"], appt["contact"], appt["service"], appt["start_iso"], appt["end_iso"], appt["status"],
+                     appt["start_iso"], appt["end_iso"]),
+                )
+                return True
+        except psycopg.errors.ExclusionViolation as e:
+            raise SlotConflict(str(e)) from e
+
+    def get_appointment_by_idempotency_key(self, key: str):
+        row = self._fetchone(
+            f"SELECT {', '.join('a.' + c for c in APPOINTMENT_COLUMNS.split(', '))} FROM idempotency_keys k JOIN appointments a ON a.id = k.appointment_id WHERE k.key = %s",
+            (key,),
+        )
+        return Appointment(*row) if row else None
+
+    def get_appointments_between(self, start_iso: str, end_iso: str) -> list[dict]:
+        rows = self._fetchall(
+            f"SELECT {APPOINTMENT_COLUMNS} FROM appointments WHERE during && tstzrange(%s::timestamptz, %s::timestamptz, '[)') AND status IN ('booked', 'held')",
+            (start_iso, end_iso),
+        )
+        return [Appointment(*r) for r in rows]
+
+    def get_appointment(self, appt_id: str):
+        row = self._fetchone(f"SELECT {APPOINTMENT_COLUMNS} FROM appointments WHERE id = %s", (appt_id,))
+        return Appointment(*row) if row else None
+
+    def update_appointment_time(self, appt_id: str, start_iso: str, end_iso: str):
+        self.move_appointments([(appt_id, start_iso, end_iso)])
+
+    def move_appointments(self, moves: list[tuple]):
+        try:
+            with self.pool.connection() as con:
+                active = {r[0] for r in con.execute(
+                    "SELECT id FROM appointments WHERE id = ANY(%s) AND status IN ('booked', 'held') FOR UPDATE",
+                    ([m[0] for m in moves],),
+                ).fetchall()}
+                # Empty ranges overlap nothing, so the batch may swap slots without tripping the constraint mid-way
+                con.execute("UPDATE appointments SET during = 'empty' WHERE id = ANY(%s)", ([m[0] for m in moves],))
+                for appt_id, start_iso, end_iso in moves:
+                    if appt_id in active:
+                        self._check_series_free(con, start_iso, end_iso)
+                    con.execute(
+                        "UPDATE appointments SET start_iso = %s, end_iso = %s, during = tstzrange(%s::timestamptz, %s::timestamptz, '[)') WHERE id = %s",
+                        (start_iso, end_iso, start_iso, end_iso, appt_id),
+                    )
+        except psycopg.errors.ExclusionViolation as e:
+            raise SlotConflict(str(e)) from e
+
+    def set_appointment_status(self, appt_id: str, status: str):
+        try:
+            with self.pool.connection() as con:
+                if status in self.ACTIVE_STATUSES:
+                    row = con.execute("SELECT start_iso, end_iso FROM appointments WHERE id = %s FOR UPDATE", (appt_id,)).fetchone()
+                    if row:
+                        self._check_series_free(con, row[0], row[1])
+                con.execute("UPDATE appointments SET status = %s WHERE id = %s", (status, appt_id))
+        except psycopg.errors.ExclusionViolation as e:
+            raise SlotConflict(str(e)) from e
+
+    def get_active_appointments_by_email(self, email: str) -> list[dict]:
+        rows = self._fetchall(
+            f"SELECT {APPOINTMENT_COLUMNS} FROM appointments WHERE contact = %s AND status = 'booked' ORDER BY start_iso ASC",
+            (email,),
+        )
+        return [Appointment(*r) for r in rows]
+
+    def get_all_user_appointments(self, email: str) -> list[dict]:
+        rows = self._fetchall(
+            f"SELECT {APPOINTMENT_COLUMNS} FROM appointments WHERE contact = %s ORDER BY start_iso DESC",
+            (email,),
+        )
+        return [Appointment(*r) for r in rows]
+
+    def get_all_appointments(self) -> list[dict]:
+        rows = self._fetchall(f"SELECT {APPOINTMENT_COLUMNS} FROM appointments ORDER BY start_iso DESC")
+        return [Appointment(*r) for r in rows]
+
+    def iter_appointments(self):
+        # Server-side cursor: rows arrive in batches of itersize, not all at once
+        with self.pool.connection() as con:
+            with con.cursor(name="iter_appointments") as cur:
+                cur.itersize = 500
+                cur.execute(f"SELECT {APPOINTMENT_COLUMNS} FROM appointments")
+                for row in cur:
+                    yield Appointment(*row)
+
+    # --- Preferences ---
+    def get_user_preferences(self, contact: str) -> dict:
+        row = self._fetchone("SELECT data FROM preferences WHERE contact = %s", (contact,))
+        return row[0] if row else {}
+
+    def save_user_preferences(self, contact: str, data: dict):
+        self._execute(
+            "INSERT INTO preferences (contact, data) VALUES (%s, %s) ON CONFLICT (contact) DO UPDATE SET data = EXCLUDED.data",
+            (contact, Jsonb(data)),
+        )
+
+    # --- Waitlist ---
+    def insert_waitlist_entry(self, entry: dict):
+        self._execute(
+            f"INSERT INTO waitlist ({WAITLIST_COLUMNS}) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            (entry["id"], entry["name"], entry["contact"], entry["service"], entry["window_start_iso"], entry["window_end_iso"],
+             entry["status"], entry["created_iso"], entry.get("hold_appt_id"), entry.get("hold_expires_iso")),
+        )
+
+    def find_waitlist_match(self, service: str, start_iso: str, end_iso: str):
+        # Oldest-first walk of idx_waitlist_fifo, stopping at the first covering window;
+        # passed windows are expired (expire_waitlist_entries), so only live entries are crossed
+        row = self._fetchone(
+            f"SELECT {WAITLIST_COLUMNS} FROM waitlist WHERE service = %s AND status = 'waiting' AND window_start_iso <= %s AND window_end_iso >= %s ORDER BY created_iso ASC LIMIT 1",
+            (service, start_iso, end_iso),
+        )
+        return waitlist_row(row) if row else None
+
+    def get_waitlist_entry(self, entry_id: str):
+        row = self._fetchone(f"SELECT {WAITLIST_COLUMNS} FROM waitlist WHERE id = %s", (entry_id,))
+        return waitlist_row(row) if row else None
+
+    def update_waitlist_entry(self, entry_id: str, status: str, hold_appt_id: str = None, hold_expires_iso: str = None):
+        self._execute(
+            "UPDATE waitlist SET status = %s, hold_appt_id = %s, hold_expires_iso = %s WHERE id = %s",
+            (status, hold_appt_id, hold_expires_iso, entry_id),
+        )
+
+    def get_expired_waitlist_holds(self, now_iso: str) -> list[dict]:
+        rows = self._fetchall(
+            f"SELECT {WAITLIST_COLUMNS} FROM waitlist WHERE status = 'held' AND hold_expires_iso < %s",
+            (now_iso,),
+        )
+        return [waitlist_row(r) for r in rows]
+
+    def expire_waitlist_entries(self, now_iso: str) -> int:
+        with self.pool.connection() as con:
+            return con.execute(
+                "UPDATE waitlist SET status = 'expired' WHERE status = 'waiting' AND window_end_iso < %s", (now_iso,)
+            ).rowcount
+
+    def get_all_waitlist_entries(self) -> list[dict]:
+        rows = self._fetchall(f"SELECT {WAITLIST_COLUMNS} FROM waitlist ORDER BY created_iso DESC")
+        return [waitlist_row(r) for r in rows]
+
+    # --- Recurring series ---
+    def insert_series(self, series: dict):
+        with self.pool.connection() as con:
+            if series["status"] == "booked":
+                # Waits for appointment writes in flight and holds off new ones and other series
+                con.execute("LOCK TABLE series IN SHARE ROW EXCLUSIVE MODE")
+                span = (series["until_iso"], series["dtstart_iso"])
+                appointments = con.execute(
+                    "SELECT id, start_iso, end_iso FROM appointments WHERE start_iso < %s AND end_iso > %s AND status IN ('booked', 'held')", span,
+                ).fetchall()
+                others = con.execute(
+                    f"SELECT {SERIES_COLUMNS} FROM series WHERE status = 'booked' AND dtstart_iso < %s AND until_iso > %s", span,
+                ).fetchall()
+                conflict = series_overlap(series, [{"id": r[0], "start_iso": r[1], "end_iso": r[2]} for r in appointments],
+                                          [series_row(r) for r in others])
+                if conflict:
+                    raise SlotConflict(conflict)
+            con.execute(
+                f"INSERT INTO series ({SERIES_COLUMNS}) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                (series["id"], series["name"], series["contact"], series["service"], series["rrule"],
+                 series["dtstart_iso"], series["until_iso"], series["duration_minutes"], series["status"]),
+            )
+
+    def get_series(self, series_id: str):
+        row = self._fetchone(f"SELECT {SERIES_COLUMNS} FROM series WHERE id = %s", (series_id,))
+        return series_row(row) if row else None
+
+    def get_series_between(self, start_iso: str, end_iso: str) -> list[dict]:
+        rows = self._fetchall(
+            f"SELECT {SERIES_COLUMNS} FROM series WHERE status = 'booked' AND dtstart_iso < %s AND until_iso > %s",
+            (end_iso, start_iso),
+        )
+        return [series_row(r) for r in rows]
+
+    def get_all_series(self) -> list[dict]:
+        rows = self._fetchall(f"SELECT {SERIES_COLUMNS} FROM series ORDER BY dtstart_iso DESC")
+        return [series_row(r) for r in rows]
+
+    def set_series_status(self, series_id: str, status: str):
+        self._execute("UPDATE series SET status = %s WHERE id = %s", (status, series_id))
+
+    # --- Notifications (outbox) ---
+    def queue_notification(self, channel: str, recipient: str, subject: str, body: str, created_iso: str):
+        self._execute(
+            "INSERT INTO notifications (channel, recipient, subject, body, status, created_iso) VALUES (%s, %s, %s, %s, 'queued', %s)",
+            (channel, recipient, subject, body, created_iso),
+        )
+
+    # --- Reminders ---
+    def insert_reminders(self, reminders: list[dict]):
+        with self.pool.connection() as con:
+            with con.cursor() as cur:
+                cur.executemany(
+                    f"INSERT INTO reminders ({REMINDER_COLUMNS}) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                    [(r["id"], r["appointment_id"], r["channel"], r["recipient"], r["due_iso"], r["status"], r.get("attempts", 0), r["created_iso"])
+                     for r in reminders],
+                )
+
+    def cancel_reminders(self, appointment_id: str) -> list[str]:
+        rows = self._fetchall(
+            "UPDATE reminders SET status = 'cancelled' WHERE appointment_id = %s AND status = 'pending' RETURNING channel",
+            (appointment_id,),
+        )
+        return [r[0] for r in rows]
+
+    def get_pending_reminders(self) -> list[dict]:
+        rows = self._fetchall(f"SELECT {REMINDER_COLUMNS} FROM reminders WHERE status = 'pending'")
+        return [reminder_row(r) for r in rows]
+
+    def claim_reminder(self, reminder_id: str) -> bool:
+        with self.pool.connection() as con:
+            cur = con.execute(
+                "UPDATE reminders SET status = 'sending', attempts = attempts + 1 WHERE id = %s AND status = 'pending'",
+                (reminder_id,),
+            )
+            return cur.rowcount == 1
+
+    def finish_reminder(self, reminder_id: str, status: str, due_iso: str = None):
+        self._execute(
+            "UPDATE reminders SET status = %s, due_iso = COALESCE(%s, due_iso) WHERE id = %s",
+            (status, due_iso, reminder_id),
+        )
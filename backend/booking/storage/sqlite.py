@@ -0,0 +1,487 @@
+import sqlite3
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .base import (
+    Repository, SlotConflict, APPOINTMENT_COLUMNS, appointment_row, WAITLIST_COLUMNS, waitlist_row,
+    SERIES_COLUMNS, series_row, series_conflict, series_overlap, REMINDER_COLUMNS, reminder_row,
+)
+
+SCHEMA_VERSION = 4  # bump whenever the DDL in init_schema changes
+
+class SQLiteRepository(Repository):
+    """
+    Default single-file backend.
+    SQLite has no range exclusion constraint, so overlapping writes are
+    rejected inside a BEGIN IMMEDIATE transaction instead.
+    """
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        return sqlite3.connect(self.path)
+
+    def init_schema(self):
+        con = self.connect()
+        cur = con.cursor()
+        # Up-to-date files (every worker after the first) skip the DDL entirely
+        if cur.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+            con.close()
+            return
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS appointments (
+              id TEXT PRIMARY KEY,
+              name TEXT NOT NULL,
+              contact TEXT NOT NULL,
+              service TEXT NOT NULL,
+              start_iso TEXT NOT NULL,
+              end_iso TEXT NOT NULL,
+              status TEXT NOT NULL
+            )
+            """
+        )
+        # Preferences table for memory functionality
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS preferences (
+               contact TEXT PRIMARY KEY,
+               data TEXT NOT NULL
+            )
+            """
+        )
+        # Waitlist for automatic backfill of cancelled slots
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS waitlist (
+               id TEXT PRIMARY KEY,
+               name TEXT NOT NULL,
+               contact TEXT NOT NULL,
+               service TEXT NOT NULL,
+               window_start_iso TEXT NOT NULL,
+               window_end_iso TEXT NOT NULL,
+               status TEXT NOT NULL,
+               created_iso TEXT NOT NULL,
+               hold_appt_id TEXT,
+               hold_expires_iso TEXT
+            )
+            """
+        )
+        # Matching walks a service's waiting entries oldest first (see find_waitlist_match)
+        cur.execute("DROP INDEX IF EXISTS idx_waitlist_match")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_waitlist_fifo ON waitlist (service, status, created_iso)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_waitlist_holds ON waitlist (status, hold_expires_iso)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_waitlist_windows ON waitlist (status, window_end_iso)")
+        # Recurring series: one row per series, occurrences are expanded on read
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS series (
+               id TEXT PRIMARY KEY,
+               name TEXT NOT NULL,
+               contact TEXT NOT NULL,
+               service TEXT NOT NULL,
+               rrule TEXT NOT NULL,
+               dtstart_iso TEXT NOT NULL,
+               until_iso TEXT NOT NULL,
+               duration_minutes INTEGER NOT NULL,
+               status TEXT NOT NULL
+            )
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_series_range ON series (status, dtstart_iso, until_iso)")
+        # Booking requests already applied, so client retries don't book twice
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+               key TEXT PRIMARY KEY,
+               appointment_id TEXT NOT NULL,
+               created_iso TEXT NOT NULL
+            )
+            """
+        )
+        # Outbox of notifications waiting to be dispatched
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS notifications (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               channel TEXT NOT NULL,
+               recipient TEXT NOT NULL,
+               subject TEXT NOT NULL,
+               body TEXT NOT NULL,
+               status TEXT NOT NULL,
+               created_iso TEXT NOT NULL
+            )
+            """
+        )
+        # Scheduled reminders; the scheduler's timing wheel is rebuilt from the pending ones
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS reminders (
+               id TEXT PRIMARY KEY,
+               appointment_id TEXT NOT NULL,
+               channel TEXT NOT NULL,
+               recipient TEXT NOT NULL,
+               due_iso TEXT NOT NULL,
+               status TEXT NOT NULL,
+               attempts INTEGER NOT NULL DEFAULT 0,
+               created_iso TEXT NOT NULL
+            )
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_reminders_appt ON reminders (appointment_id, status)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_reminders_pending ON reminders (status, due_iso)")
+        cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        con.commit()
+        con.close()
+
+    def _check_free(self, cur, start_iso: str, end_iso: str, exclude_id: str = None):
+        cur.execute(
+            "SELECT id FROM appointments WHERE start_iso < ? AND end_iso > ? AND status IN ('booked', 'held') AND id != ? LIMIT 1",
+            (end_iso, start_iso, exclude_id or ""),
+        )
+        row = cur.fetchone()
+        if row:
+            raise SlotConflict(f"Overlaps appointment {row[0]}")
+        cur.execute(
+            f"SELECT {SERIES_COLUMNS} FROM series WHERE status = 'booked' AND dtstart_iso < ? AND until_iso > ?",
+            (end_iso, start_iso),
+        )
+        conflict = series_conflict([series_row(r) for r in cur.fetchall()], start_iso, end_iso)
+        if conflict:
+            raise SlotConflict(conflict)
+
+    # --- Appointments ---
+    def insert_appointment(self, appt: dict, idempotency_key: str = None) -> bool:
+        con = self.connect()
+        cur = con.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            if idempotency_key:
+                cur.execute("SELECT 1 FROM idempotency_keys WHERE key = ?", (idempotency_key,))
+                if cur.fetchone():
+                    con.rollback()
+                    return False
+            if appt["status"] in self.ACTIVE_STATUSES:
+                self._check_free(cur, appt["start_iso"], appt["end_iso"])
+            cur.execute(
+                f"INSERT INTO appointments ({APPOINTMENT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (appt["id"], appt["name"], appt["contact"], appt["service"], appt["start_iso"], appt["end_iso"], appt["status"]),
+            )
+            if idempotency_key:
+                cur.execute(
+                    "INSERT INTO idempotency_keys (key, appointment_id, created_iso) VALUES (?, ?, ?)",
+                    (idempotency_key, appt["id"], datetime.now(timezone.utc).isoformat()),
+                )
+            con.commit()
+            return True
+        finally:
+            con.close()
+
+    def get_appointment_by_idempotency_key(self, key: str):
+        con = self.connect()
+        cur = con.cursor()
+        cur.execute("SELECT appointment_id FROM idempotency_keys WHERE key = ?", (key,))
+        row = cur.fetchone()
+        con.close()
+        return self.get_appointment(row[0]) if row else None
+
+    def _appointments(self, where: str, params: tuple = ()):
+        """Appointment records for `SELECT ... FROM appointments <where>`, one cursor step at a time."""
+        con = self.connect()
+        try:
+            cur = con.cursor()
+            cur.row_factory = appointment_row
+            cur.execute(f"SELECT {APPOINTMENT_COLUMNS} FROM appointments {where}", params)
+            yield from cur
+        finally:
+            con.close()
+
+    def get_appointments_between(self, start_iso: str, end_iso: str) -> list[dict]:
+        return list(self._appointments(
+            "WHERE start_iso < ? AND end_iso > ? AND status IN ('booked', 'held')", (end_iso, start_iso)
+        ))
+
+    def get_appointment(self, appt_id: str):
+        rows = list(self._appointments("WHERE id = ?", (appt_id,)))
+        return rows[0] if rows else None
+
+    def update_appointment_time(self, appt_id: str, start_iso: str, end_iso: str):
+        con = self.connect()
+        cur = con.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute("SELECT status FROM appointments WHERE id = ?", (appt_id,))
+            row = cur.fetchone()
+            if row and row[0] in self.ACTIVE_STATUSES:
+                self._check_free(cur, start_iso, end_iso, exclude_id=appt_id)
+            cur.execute(
+                "UPDATE appointments SET start_iso = ?, end_iso = ? WHERE id = ?",
+                (start_iso, end_iso, appt_id),
+            )
+            con.commit()
+        finally:
+            con.close()
+
+    def move_appointments(self, moves: list[tuple]):
+        con = self.connect()
+        cur = con.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            cur.executemany(
+                "UPDATE appointments SET start_iso = ?, end_iso = ? WHERE id = ?",
+                [(start_iso, end_iso, appt_id) for appt_id, start_iso, end_iso in moves],
+            )
+            # Checked once every row is in place, so the batch may swap slots
+            for appt_id, start_iso, end_iso in moves:
+                cur.execute("SELECT status FROM appointments WHERE id = ?", (appt_id,))
+                row = cur.fetchone()
+                if row and row[0] in self.ACTIVE_STATUSES:
+                    self._check_free(cur, start_iso, end_iso, exclude_id=appt_id)
+            con.commit()
+        finally:
+            con.close()
+
+    def set_appointment_status(self, appt_id: str, status: str):
+        con = self.connect()
+        cur = con.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            if status in self.ACTIVE_STATUSES:
+                cur.execute("SELECT start_iso, end_iso FROM appointments WHERE id = ?", (appt_id,))
+                row = cur.fetchone()
+                if row:
+                    self._check_free(cur, row[0], row[1], exclude_id=appt_id)
+            cur.execute(
+                "UPDATE appointments SET status = ? WHERE id = ?",
+                (status, appt_id),
+            )
+            con.commit()
+        finally:
+            con.close()
+
+    def get_active_appointments_by_email(self, email: str) -> list[dict]:
+        return list(self._appointments("WHERE contact = ? AND status = 'booked' ORDER BY start_iso ASC", (email,)))
+
+    def get_all_user_appointments(self, email: str) -> list[dict]:
+        """Get ALL appointments (past/present/cancelled) for a user to show history."""
+        return list(self._appointments("WHERE contact = ? ORDER BY start_iso DESC", (email,)))
+
+    def get_all_appointments(self) -> list[dict]:
+        return list(self._appointments("ORDER BY start_iso DESC"))
+
+    def iter_appointments(self):
+        return self._appointments("")
+
+    # --- Preferences / Memory ---
+    def get_user_preferences(self, contact: str) -> dict:
+        con = self.connect()
+        cur = con.cursor()
+        cur.execute("SELECT data FROM preferences WHERE contact = ?", (contact,))
+        row = cur.fetchone()
+        con.close()
+        if row:
+            return json.loads(row[0])
+        return {}
+
+    def save_user_preferences(self, contact: str, data: dict):
+        con = self.connect()
+        cur = con.cursor()
+        cur.execute("INSERT OR REPLACE INTO preferences (contact, data) VALUES (?, ?)", (contact, json.dumps(data)))
+        con.commit()
+        con.close()
+
+    # --- Waitlist ---
+    def insert_waitlist_entry(self, entry: dict):
+        con = self.connect()
+        cur = con.cursor()
+        cur.execute(
+            f"INSERT INTO waitlist ({WAITLIST_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (entry["id"], entry["name"], entry["contact"], entry["service"], entry["window_start_iso"], entry["window_end_iso"],
+             entry["status"], entry["created_iso"], entry.get("hold_appt_id"), entry.get("hold_expires_iso")),
+        )
+        con.commit()
+        con.close()
+
+    def find_waitlist_match(self, service: str, start_iso: str, end_iso: str):
+        """
+        Oldest waiting entry for `service` whose window covers [start, end).
+        Walks idx_waitlist_fifo oldest first and stops at the first covering
+        window: no sort, but entries ahead in the queue whose windows don't
+        fit are read on the way (linear in those, not logarithmic). Entries
+        whose window has passed are expired, so only live ones are crossed.
+        """
+        con = self.connect()
+        cur = con.cursor()
+        cur.execute(
+            # Pinned: without statistics the planner would take idx_waitlist_windows and sort
+            f"SELECT {WAITLIST_COLUMNS} FROM waitlist INDEXED BY idx_waitlist_fifo "
+            "WHERE service = ? AND status = 'waiting' AND window_start_iso <= ? AND window_end_iso >= ? ORDER BY created_iso ASC LIMIT 1",
+            (service, start_iso, end_iso),
+        )
+        row = cur.fetchone()
+        con.close()
+        return waitlist_row(row) if row else None
+
+    def get_waitlist_entry(self, entry_id: str):
+        con = self.connect()
+        cur = con.cursor()
+        cur.execute(f"SELECT {WAITLIST_COLUMNS} FROM waitlist WHERE id = ?", (entry_id,))
+        row = cur.fetchone()
+        con.close()
+        return waitlist_row(row) if row else None
+
+    def update_waitlist_entry(self, entry_id: str, status: str, hold_appt_id: str = None, hold_expires_iso: str = None):
+        con = self.connect()
+        cur = con.cursor()
+        cur.execute(
+            "UPDATE waitlist SET status = ?, hold_appt_id = ?, hold_expires_iso = ? WHERE id = ?",
+            (status, hold_appt_id, hold_expires_iso, entry_id),
+        )
+        con.commit()
+        con.close()
+
+    def get_expired_waitlist_holds(self, now_iso: str) -> list[dict]:
+        con = self.connect()
+        cur = con.cursor()
+        cur.execute(
+            f"SELECT {WAITLIST_COLUMNS} FROM waitlist WHERE status = 'held' AND hold_expires_iso < ?",
+            (now_iso,),
+        )
+        rows = cur.fetchall()
+        con.close()
+        return [waitlist_row(r) for r in rows]
+
+    def expire_waitlist_entries(self, now_iso: str) -> int:
+        con = self.connect()
+        cur = con.cursor()
+        cur.execute("UPDATE waitlist SET status = 'expired' WHERE status = 'waiting' AND window_end_iso < ?", (now_iso,))
+        con.commit()
+        con.close()
+        return cur.rowcount
+
+    def get_all_waitlist_entries(self) -> list[dict]:
+        con = self.connect()
+        cur = con.cursor()
+        cur.execute(f"SELECT {WAITLIST_COLUMNS} FROM waitlist ORDER BY created_iso DESC")
+        rows = cur.fetchall()
+        con.close()
+        return [waitlist_row(r) for r in rows]
+
+    # --- Recurring series ---
+    def insert_series(self, series: dict):
+        con = self.connect()
+        cur = con.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            if series["status"] == "booked":
+                span = (series["until_iso"], series["dtstart_iso"])
+                cur.execute("SELECT id, start_iso, end_iso FROM appointments WHERE start_iso < ? AND end_iso > ? AND status IN ('booked', 'held')", span)
+                appointments = [{"id": r[0], "start_iso": r[1], "end_iso": r[2]} for r in cur.fetchall()]
+                cur.execute(f"SELECT {SERIES_COLUMNS} FROM series WHERE status = 'booked' AND dtstart_iso < ? AND until_iso > ?", span)
+                conflict = series_overlap(series, appointments, [series_row(r) for r in cur.fetchall()])
+                if conflict:
+                    raise SlotConflict(conflict)
+            cur.execute(
+                f"INSERT INTO series ({SERIES_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (series["id"], series["name"], series["contact"], series["service"], series["rrule"],
+                 series["dtstart_iso"], series["until_iso"], series["duration_minutes"], series["status"]),
+            )
+            con.commit()
+        finally:
+            con.close()
+
+    def get_series(self, series_id: str):
+        con = self.connect()
+        cur = con.cursor()
+        cur.execute(f"SELECT {SERIES_COLUMNS} FROM series WHERE id = ?", (series_id,))
+        row = cur.fetchone()
+        con.close()
+        return series_row(row) if row else None
+
+    def get_series_between(self, start_iso: str, end_iso: str) -> list[dict]:
+        """Active series whose first..last occurrence span intersects the range."""
+        con = self.connect()
+        cur = con.cursor()
+        cur.execute(
+            f"SELECT {SERIES_COLUMNS} FROM series WHERE status = 'booked' AND dtstart_iso < ? AND until_iso > ?",
+            (end_iso, start_iso),
+        )
+        rows = cur.fetchall()
+        con.close()
+        return [series_row(r) for r in rows]
+
+    def get_all_series(self) -> list[dict]:
+        con = self.connect()
+        cur = con.cursor()
+        cur.execute(f"SELECT {SERIES_COLUMNS} FROM series ORDER BY dtstart_iso DESC")
+        rows = cur.fetchall()
+        con.close()
+        return [series_row(r) for r in rows]
+
+    def set_series_status(self, series_id: str, status: str):
+        con = self.connect()
+        cur = con.cursor()
+        cur.execute("UPDATE series SET status = ? WHERE id = ?", (status, series_id))
+        con.commit()
+        con.close()
+
+    # --- Notifications (outbox) ---
+    def queue_notification(self, channel: str, recipient: str, subject: str, body: str, created_iso: str):
+        con = self.connect()
+        cur = con.cursor()
+        cur.execute(
+            "INSERT INTO notifications (channel, recipient, subject, body, status, created_iso) VALUES (?, ?, ?, ?, 'queued', ?)",
+            (channel, recipient, subject, body, created_iso),
+        )
+        con.commit()
+        con.close()
+
+    # --- Reminders ---
+    def insert_reminders(self, reminders: list[dict]):
+        con = self.connect()
+        con.executemany(
+            f"INSERT INTO reminders ({REMINDER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(r["id"], r["appointment_id"], r["channel"], r["recipient"], r["due_iso"], r["status"], r.get("attempts", 0), r["created_iso"])
+             for r in reminders],
+        )
+        con.commit()
+        con.close()
+
+    def cancel_reminders(self, appointment_id: str) -> list[str]:
+        con = self.connect()
+        cur = con.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute("SELECT channel FROM reminders WHERE appointment_id = ? AND status = 'pending'", (appointment_id,))
+            channels = [r[0] for r in cur.fetchall()]
+            cur.execute("UPDATE reminders SET status = 'cancelled' WHERE appointment_id = ? AND status = 'pending'", (appointment_id,))
+            con.commit()
+            return channels
+        finally:
+            con.close()
+
+    def get_pending_reminders(self) -> list[dict]:
+        con = self.connect()
+        cur = con.cursor()
+        cur.execute(f"SELECT {REMINDER_COLUMNS} FROM reminders WHERE status = 'pending'")
+        rows = cur.fetchall()
+        con.close()
+        return [reminder_row(r) for r in rows]
+
+    def claim_reminder(self, reminder_id: str) -> bool:
+        con = self.connect()
+        cur = con.cursor()
+        cur.execute("UPDATE reminders SET status = 'sending', attempts = attempts + 1 WHERE id = ? AND status = 'pending'", (reminder_id,))
+        con.commit()
+        claimed = cur.rowcount == 1
+        con.close()
+        return claimed
+
+    def finish_reminder(self, reminder_id: str, status: str, due_iso: str = None):
+        con = self.connect()
+        cur = con.cursor()
+        cur.execute("UPDATE reminders SET status = ?, due_iso = COALESCE(?, due_iso) WHERE id = ?", (status, due_iso, reminder_id))
+        con.commit()
+        con.close()
@@ -0,0 +1,203 @@
+"""
+Tracing & Latency Metrics.
+`span()` times one phase of a request, logs it as a structured line,
+records it in a per-stage histogram and, when OpenTelemetry is installed
+and OTEL_EXPORTER_OTLP_ENDPOINT is set, mirrors it as an OTel span.
+`render_prometheus()` serves everything in the Prometheus text format.
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger("booking.trace")
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+_trace_id = ContextVar("trace_id", default=None)
+_parent = ContextVar("parent_span", default=None)
+
+class Histogram:
+    """Cumulative buckets for Prometheus plus a bounded reservoir for exact recent quantiles."""
+    def __init__(self, reservoir: int = 2048):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.n = 0
+        self.recent = deque(maxlen=reservoir)
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.n += 1
+        self.recent.append(seconds)
+
+    def quantiles(self) -> dict:
+        if not self.recent:
+            return {q: 0.0 for q in QUANTILES}
+        ordered = sorted(self.recent)
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+_lock = threading.Lock()
+_histograms = {}  # (stage, labels tuple) -> Histogram
+_counters = {}    # (name, labels tuple) -> int
+_collectors = []
+
+def _otel_tracer():
+    if not os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        return None
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        logger.warning("OTEL_EXPORTER_OTLP_ENDPOINT is set but opentelemetry-sdk/exporter are not installed")
+        return None
+    provider = TracerProvider()
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    return trace.get_tracer("booking")
+
+_tracer = None
+_tracer_ready = False
+
+def _get_tracer():
+    global _tracer, _tracer_ready
+    if not _tracer_ready:
+        _tracer = _otel_tracer()
+        _tracer_ready = True
+    return _tracer
+
+def observe(stage: str, seconds: float, labels: dict = None):
+    key = (stage, tuple(sorted((labels or {}).items())))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = Histogram()
+        hist.observe(seconds)
+
+def increment(name: str, labels: dict = None, amount: int = 1):
+    key = (name, tuple(sorted((labels or {}).items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+def register_collector(fn):
+    """fn() -> list of (metric_name, labels dict, value) gauges sampled at scrape time."""
+    _collectors.append(fn)
+    return fn
+
+@contextmanager
+def span(stage: str, **labels):
+    """
+    Times a phase. Labels (e.g. model=...) become histogram labels and
+    structured log fields; the first span in a context starts a new trace.
+    """
+    trace_id = _trace_id.get()
+    token_trace = None
+    if trace_id is None:
+        trace_id = uuid.uuid4().hex[:16]
+        token_trace = _trace_id.set(trace_id)
+    span_id = uuid.uuid4().hex[:8]
+    parent = _parent.get()
+    token_parent = _parent.set(span_id)
+
+    tracer = _get_tracer()
+    otel_cm = tracer.start_as_current_span(stage, attributes={k: str(v) for k, v in labels.items()}) if tracer else None
+    if otel_cm:
+        otel_cm.__enter__()
+
+    error = None
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        observe(stage, elapsed, labels)
+        if error:
+            increment("booking_stage_errors_total", {"stage": stage})
+        if otel_cm:
+            otel_cm.__exit__(None, None, None)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps({
+                "trace": trace_id, "span": span_id, "parent": parent, "stage": stage,
+                "ms": round(elapsed * 1000, 2), "error": error, **{k: str(v) for k, v in labels.items()},
+            }))
+        _parent.reset(token_parent)
+        if token_trace is not None:
+            _trace_id.reset(token_trace)
+
+def traced(stage: str):
+    """Decorator form of span(); the function name becomes the 'op' label."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with span(stage, op=fn.__name__):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+def _fmt_labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+def snapshot() -> dict:
+    """Per-stage count and p50/p95/p99 in milliseconds (for dashboards and benchmarks)."""
+    with _lock:
+        out = {}
+        for (stage, labels), hist in _histograms.items():
+            name = stage + _fmt_labels(labels)
+            qs = hist.quantiles()
+            out[name] = {"count": hist.n, **{f"p{int(q * 100)}_ms": round(v * 1000, 2) for q, v in qs.items()}}
+        return out
+
+def render_prometheus() -> str:
+    lines = [
+        "# HELP booking_stage_duration_seconds Latency of each request phase.",
+        "# TYPE booking_stage_duration_seconds histogram",
+    ]
+    with _lock:
+        items = list(_histograms.items())
+        counters = list(_counters.items())
+        quantile_lines = []
+        for (stage, labels), hist in items:
+            base = (("stage", stage),) + labels
+            cumulative = 0
+            for bound, count in zip(BUCKETS + (float("inf"),), hist.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"booking_stage_duration_seconds_bucket{_fmt_labels(base + (('le', le),))} {cumulative}")
+            lines.append(f"booking_stage_duration_seconds_sum{_fmt_labels(base)} {hist.total}")
+            lines.append(f"booking_stage_duration_seconds_count{_fmt_labels(base)} {hist.n}")
+            for q, v in hist.quantiles().items():
+                quantile_lines.append(f"booking_stage_duration_quantile_seconds{_fmt_labels(base + (('quantile', str(q)),))} {v}")
+
+    lines.append("# HELP booking_stage_duration_quantile_seconds Recent p50/p95/p99 per phase.")
+    lines.append("# TYPE booking_stage_duration_quantile_seconds gauge")
+    lines.extend(quantile_lines)
+
+    seen = set()
+    for (name, labels), value in counters:
+        if name not in seen:
+            lines.append(f"# TYPE {name} counter")
+            seen.add(name)
+        lines.append(f"{name}{_fmt_labels(labels)} {value}")
+
+    for collector in _collectors:
+        for name, labels, value in collector():
+            if name not in seen:
+                lines.append(f"# TYPE {name} gauge")
+                seen.add(name)
+            lines.append(f"{name}{_fmt_labels(tuple(sorted(labels.items())))} {value}")
+    return "\n".join(lines) + "\n"
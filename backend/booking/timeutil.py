@@ -0,0 +1,33 @@
+"""
+Business-timezone helpers shared by the calendar modules.
+"""
+from datetime import datetime, timedelta
+from dateutil import tz
+from dateutil.parser import isoparse
+
+from .rules import get_rules
+
+def business_zone():
+    return tz.gettz(get_rules().timezone)
+
+def to_local(value) -> datetime:
+    """Parses/converts a timestamp into the business timezone (naive = local)."""
+    zone = business_zone()
+    dt = isoparse(value) if isinstance(value, str) else value
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=zone)
+    return dt.astimezone(zone)
+
+def interval(appt) -> tuple:
+    """(start, end) of an appointment in the business timezone, reusing the times a storage record already parsed."""
+    if hasattr(appt, "start"):
+        return appt.start, appt.end
+    return to_local(appt["start_iso"]), to_local(appt["end_iso"])
+
+def day_key(value) -> str:
+    """'YYYY-MM-DD' of a timestamp in the business timezone."""
+    return to_local(value).date().isoformat()
+
+def day_bounds(day) -> tuple:
+    start = to_local(day).replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, start + timedelta(days=1)
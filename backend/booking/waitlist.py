@@ -0,0 +1,116 @@
+"""
+Waitlist & Automatic Backfill.
+When a slot is freed (cancellation or move), the oldest waitlisted client
+whose desired window covers it gets a time-limited hold and a queued
+notification, without any admin polling.
+"""
+import uuid
+from datetime import datetime, timedelta
+from dateutil import tz
+
+from .rules import get_rules
+from .db import (
+    SlotConflict, insert_appointment, get_appointment, set_appointment_status, insert_waitlist_entry, find_waitlist_match,
+    get_waitlist_entry, update_waitlist_entry, get_expired_waitlist_holds, expire_waitlist_entries, queue_notification
+)
+from .events import subscribe
+from .reminders import schedule_reminders
+from .day_index import get_day_index
+from .timeutil import to_local
+
+def _now():
+    return datetime.now(tz.gettz(get_rules().timezone))
+
+def join_waitlist(name: str, contact: str, service_key: str, window_start_iso: str, window_end_iso: str) -> dict:
+    entry = {
+        "id": str(uuid.uuid4())[:8],
+        "name": name or "Guest",
+        "contact": contact,
+        "service": service_key,
+        "window_start_iso": to_local(window_start_iso).isoformat(),
+        "window_end_iso": to_local(window_end_iso).isoformat(),
+        "status": "waiting",
+        "created_iso": _now().isoformat(),
+    }
+    insert_waitlist_entry(entry)
+    return entry
+
+def match_freed_slot(start_iso: str, end_iso: str):
+    """
+    Finds the best waitlisted client for a freed interval and places a hold.
+    Each service that fits the interval is one indexed lookup; the client
+    who has waited longest wins.
+    """
+    rules = get_rules()
+    start = to_local(start_iso)
+    freed = to_local(end_iso) - start
+
+    best = None
+    for key, srv in rules.services.items():
+        duration = timedelta(minutes=srv["duration"])
+        if duration > freed:
+            continue
+        entry = find_waitlist_match(key, start.isoformat(), (start + duration).isoformat())
+        if entry and (best is None or entry["created_iso"] < best["created_iso"]):
+            best = entry
+    if not best:
+        return None
+
+    service = rules.services[best["service"]]
+    end = start + timedelta(minutes=service["duration"])
+    if get_day_index(start).overlapping(start, end):
+        return None  # Slot was taken again before we got here
+
+    hold = {
+        "id": str(uuid.uuid4())[:8],
+        "name": best["name"],
+        "contact": best["contact"],
+        "service": service["name"],
+        "start_iso": start.isoformat(),
+        "end_iso": end.isoformat(),
+        "status": "held",
+    }
+    expires = _now() + timedelta(minutes=rules.waitlist_hold_minutes)
+    try:
+        insert_appointment(hold)
+    except SlotConflict:
+        return None
+    update_waitlist_entry(best["id"], "held", hold["id"], expires.isoformat())
+
+    queue_notification(
+        "email", best["contact"],
+        f"A {service['name']} slot opened up at {rules.business_name}",
+        f"Good news {best['name']}! {start.strftime('%b %d, %H:%M')} is now available and held for you "
+        f"until {expires.strftime('%H:%M')}. Confirm with waitlist id {best['id']}.",
+        _now().isoformat(),
+    )
+    return {**best, "status": "held", "hold_appt_id": hold["id"], "hold_expires_iso": expires.isoformat()}
+
+def confirm_hold(entry_id: str):
+    entry = get_waitlist_entry(entry_id)
+    if not entry or entry["status"] != "held" or entry["hold_expires_iso"] < _now().isoformat():
+        return None
+    update_waitlist_entry(entry_id, "booked", entry["hold_appt_id"], entry["hold_expires_iso"])
+    set_appointment_status(entry["hold_appt_id"], "booked")
+    schedule_reminders(get_appointment(entry["hold_appt_id"]))
+    return {**entry, "status": "booked"}
+
+def expire_holds() -> int:
+    """
+    Releases lapsed holds; each release is a cancellation, so the next client
+    in line is offered the slot. Waiting entries whose window has passed are
+    retired, so matching never walks past them again.
+    """
+    expire_waitlist_entries(_now().isoformat())
+    expired = get_expired_waitlist_holds(_now().isoformat())
+    for entry in expired:
+        update_waitlist_entry(entry["id"], "expired", entry["hold_appt_id"], entry["hold_expires_iso"])
+        set_appointment_status(entry["hold_appt_id"], "cancelled")
+    return len(expired)
+
+@subscribe
+def _on_booking_change(kind: str, appt: dict, previous: dict = None):
+    if kind == "cancelled":
+        match_freed_slot(appt["start_iso"], appt["end_iso"])
+    elif kind == "moved" and previous:
+        match_freed_slot(previous["start_iso"], previous["end_iso"])
@@ -1,14 +1,38 @@
-from fastapi import FastAPI
+import logging
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+load_dotenv()  # once, before any booking module reads its settings
+
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import PlainTextResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
+from datetime import date, datetime, timedelta
 
-from booking.db import init_db, get_all_appointments, cancel_appointment
+from booking.db import init_db, get_all_appointments, cancel_appointment, get_all_waitlist_entries, get_all_series, cancel_series
 from booking.agent import handle_request
-from booking.availability import get_open_slots
+from booking.availability import get_open_slots, cache_stats
+from booking.day_index import get_integrity_report
+from booking.waitlist import join_waitlist, confirm_hold
+from booking.reminders import start_reminders
+from booking.reschedule import reschedule_appointments
+from booking.singleflight import turns, turn_key
+from booking.admission import admit
+from booking.telemetry import render_prometheus, register_collector
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
 
 app = FastAPI()
 
+@register_collector
+def _availability_cache_gauges():
+    stats = cache_stats()
+    return [(f"booking_availability_cache_{k}", {}, v) for k, v in stats.items()]
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -21,29 +45,143 @@ class ChatIn(BaseModel):
     session_id: str = "default"
     message: str
     history: List[dict]
+    request_id: Optional[str] = None  # same id on retries of one turn
 
 @app.on_event("startup")
 def startup():
     init_db()
+    start_reminders()
+    interval = float(os.getenv("ANALYTICS_SNAPSHOT_SECONDS", "300"))
+    if interval > 0:
+        threading.Thread(target=_analytics_snapshots, args=(interval,), daemon=True, name="analytics-snapshots").start()
+
+def _analytics_snapshots(interval: float):
+    # Every worker may run one; the snapshot's file lock keeps a single writer.
+    # booking.analytics (and numpy) load when the first snapshot is due, not at startup.
+    while True:
+        time.sleep(interval)
+        try:
+            from booking.analytics import snapshot
+            snapshot()
+        except Exception:
+            logging.getLogger("booking.analytics").exception("Analytics snapshot failed")
 
 @app.post("/chat")
-def chat_endpoint(payload: ChatIn):
-    # The main entry point for the agent
-    response = handle_request(payload.session_id, payload.message, payload.history)
-    return response
+async def chat_endpoint(payload: ChatIn, request: Request, idempotency_key: Optional[str] = Header(None)):
+    # The main entry point for the agent. Duplicate turns share one run and
+    # each session's turns are handled in order.
+    request_id = payload.request_id or idempotency_key
+    key = turn_key(payload.session_id, payload.message, payload.history, request_id)
+    if not turns.is_known(key):
+        client = request.headers.get("x-forwarded-for", request.client.host if request.client else "unknown").split(",")[0].strip()
+        retry_after = admit(payload.session_id, client)
+        if retry_after:
+            return JSONResponse(
+                status_code=429,
+                headers={"Retry-After": str(max(1, round(retry_after)))},
+                content={"text": "You're sending messages a little fast. Give me a moment and try again.", "intent": "question", "data": None},
+            )
+    return await turns.run(
+        payload.session_id, key,
+        lambda: handle_request(payload.session_id, payload.message, payload.history, request_id),
+    )
 
 @app.post("/simple_availability")
 def simple_avail(payload: dict):
     # Legacy/Direct helper
     day = payload.get("day_iso")
-    return {"slots": get_open_slots(day)}
+    return {"slots": get_open_slots(day, service=payload.get("service"))}
+
+@app.post("/waitlist")
+def waitlist_join(payload: dict):
+    # payload { "name", "contact", "service", "window_start_iso", "window_end_iso" }
+    return join_waitlist(payload.get("name"), payload.get("contact"), payload.get("service", "consultation"),
+                         payload.get("window_start_iso"), payload.get("window_end_iso"))
+
+@app.post("/waitlist/confirm")
+def waitlist_confirm(payload: dict):
+    entry = confirm_hold(payload.get("id"))
+    return {"status": "ok" if entry else "expired", "entry": entry}
 
 @app.get("/admin/appointments")
 def admin_get_appts():
-    return get_all_appointments()
+    # Storage hands back Appointment records; they become JSON only here.
+    # (Records nested in /chat payloads are Mappings, which FastAPI encodes the same way.)
+    return [a.to_dict() for a in get_all_appointments()]
+
+@app.get("/admin/cache_stats")
+def admin_cache_stats():
+    return {"availability": cache_stats()}
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus scrape target: per-stage latency histograms, error counters, cache gauges
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+# Analytics read the columnar snapshot, never the booking database.
+# numpy is imported on first use so it stays off the startup path.
+def _report_range(start: Optional[str], end: Optional[str]):
+    first = date.fromisoformat(start) if start else date.today().replace(day=1)
+    last = date.fromisoformat(end) if end else first + timedelta(days=30)
+    return first, last
+
+@app.post("/admin/analytics/snapshot")
+def admin_analytics_snapshot():
+    from booking.analytics import snapshot
+    return snapshot()
+
+@app.get("/admin/analytics/utilization")
+def admin_analytics_utilization(start: Optional[str] = None, end: Optional[str] = None, by: str = "day"):
+    from booking.analytics import utilization
+    try:
+        return utilization(*_report_range(start, end), by=by)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+@app.get("/admin/analytics/revenue")
+def admin_analytics_revenue(start: Optional[str] = None, end: Optional[str] = None, by: str = "service"):
+    from booking.analytics import revenue
+    try:
+        return revenue(*_report_range(start, end), by=by)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+@app.get("/admin/analytics/cancellations")
+def admin_analytics_cancellations(start: Optional[str] = None, end: Optional[str] = None, by: str = "service"):
+    from booking.analytics import cancellations
+    try:
+        return cancellations(*_report_range(start, end), by=by)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+@app.get("/admin/integrity")
+def admin_integrity(day: Optional[str] = None, days: int = 7):
+    # Served from the per-day index; no recompute over the full calendar
+    return get_integrity_report(day or datetime.now().isoformat(), days)
+
+@app.get("/admin/waitlist")
+def admin_waitlist():
+    return get_all_waitlist_entries()
+
+@app.get("/admin/series")
+def admin_series():
+    return get_all_series()
+
+@app.post("/admin/series/cancel")
+def admin_cancel_series(payload: dict):
+    cancel_series(payload.get("id"))
+    return {"status": "ok"}
 
 @app.post("/admin/cancel")
 def admin_cancel(payload: dict):
     # payload { "id": "..." }
     cancel_appointment(payload.get("id"))
     return {"status": "ok"}
+
+@app.post("/admin/reschedule")
+def admin_reschedule(payload: dict):
+    # payload { "moves": [{"id": "...", "start_iso": "..."}, ...] }, applied all-or-nothing
+    result = reschedule_appointments([(m.get("id"), m.get("start_iso")) for m in payload.get("moves", [])])
+    if "moved" not in result:
+        return JSONResponse(result, status_code=409 if "conflicts" in result else 400)
+    return {"status": "ok", **result}
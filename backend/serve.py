@@ -0,0 +1,155 @@
+"""
+Preforked server.
+Imports the app and warms the cheap-to-build shared state once in a master
+process, then forks workers that share those pages copy-on-write. The warm
+state is the rules, the db schema check, the NLU model and the per-day
+calendar indexes and slot lists for the coming days. The OpenAI SDK import
+(~0.4s) is kept off the path to the first response: each worker loads it
+in the background once it is serving (--preload-sdk loads it in the master
+instead, sharing the pages at the cost of a later first response). Workers
+are restarted if they die.
+
+The warm-up still runs before the first response, so this starts later
+than plain uvicorn (~0.2s on 10 days, see bench.startup); the Procfile
+keeps uvicorn. Use this where workers' first requests and shared memory
+matter more than time to first response.
+
+    python serve.py --workers 4 --port 8000 --warm-days 10
+
+Versions of cached days are shared through AVAILABILITY_CACHE=shared, so a
+booking in one worker invalidates the others. Use this on Linux/macOS; on
+Windows run uvicorn directly.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("AVAILABILITY_CACHE", "shared")
+
+logger = logging.getLogger("booking.serve")
+
+def warm(days: int, preload_sdk: bool = False):
+    """Fills the caches workers would otherwise build on their first requests."""
+    if preload_sdk:
+        import openai  # noqa: F401 -- ~0.4s shared by every worker, but before the first response
+    from booking.rules import get_rules
+    from booking.db import init_db, close_db
+    from booking.brain import _response_format
+    from booking.nlu import model
+    from booking.availability import get_open_slots
+    from booking.day_index import get_integrity_score
+
+    rules = get_rules()
+    init_db()
+    _response_format()
+    model()
+    day = datetime.now()
+    warmed = 0
+    while warmed < days:
+        if day.weekday() in rules.work_days:
+            get_integrity_score(day)
+            for service in [None, *rules.services]:
+                get_open_slots(day.isoformat(), service=service)
+            warmed += 1
+        day += timedelta(days=1)
+    # Connection pools don't survive fork; workers open their own
+    close_db()
+
+def _import_sdk():
+    try:
+        import openai  # noqa: F401
+    except ImportError:
+        pass
+
+def run_worker(sock: socket.socket, log_level: str):
+    import uvicorn
+    from booking import cache
+    import main
+
+    store = cache.day_versions()
+    if hasattr(store, "after_fork"):
+        store.after_fork()
+    if "openai" not in sys.modules:
+        # After the app's own startup, so the import doesn't hold the worker back from
+        # serving; it is usually done before the first chat needs it
+        main.app.router.on_startup.append(lambda: threading.Thread(
+            target=_import_sdk, daemon=True, name="sdk-import").start())
+    config = uvicorn.Config(main.app, log_level=log_level.lower())
+    uvicorn.Server(config).run(sockets=[sock])
+
+def spawn(sock: socket.socket, log_level: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 0
+        try:
+            run_worker(sock, log_level)
+        except Exception:
+            logger.exception("Worker crashed")
+            code = 1
+        os._exit(code)
+    return pid
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "2")))
+    parser.add_argument("--warm-days", type=int, default=10)
+    parser.add_argument("--preload-sdk", action="store_true",
+                        help="import the OpenAI SDK in the master (shared pages, ~0.4s later first response)")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    import main as app_module  # noqa: F401 -- loads .env, logging and every booking module
+    import uvicorn  # noqa: F401 -- once here rather than in every worker after the fork
+    warm(args.warm_days, preload_sdk=args.preload_sdk)
+    log_level = os.getenv("LOG_LEVEL", "INFO")
+    # Objects that exist now are never collected; gc passes in workers won't dirty their pages
+    gc.freeze()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    workers = {spawn(sock, log_level) for _ in range(args.workers)}
+    logger.info("Master %d warmed in %.0f ms; %d workers on %s:%d",
+                os.getpid(), (time.perf_counter() - t0) * 1000, len(workers), args.host, args.port)
+
+    stopping = False
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            logger.warning("Worker %d exited (status %d); restarting", pid, status)
+            workers.add(spawn(sock, log_level))
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
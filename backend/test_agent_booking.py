@@ -0,0 +1,101 @@
+"""
+Agent booking flow against a throwaway SQLite calendar, with the brain's
+decision stubbed so each test fixes exactly what the model "said".
+
+    python -m pytest test_agent_booking.py
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from booking import agent, availability, day_index, db
+from booking.brain import AgentDecision
+from booking.cache import VersionedCache
+from booking.simulation import simulate_proposals
+from booking.timeutil import day_bounds
+
+def _booked_on(day: str) -> list:
+    start, end = day_bounds(day)
+    return db.get_appointments_between(start.isoformat(), end.isoformat())
+
+def _next(weekday: int) -> str:
+    """The next date (after today) falling on weekday, Monday=0."""
+    day = date.today() + timedelta(days=1)
+    while day.weekday() != weekday:
+        day += timedelta(days=1)
+    return day.isoformat()
+
+@pytest.fixture
+def calendar(tmp_path, monkeypatch):
+    db.close_db()
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "bookings.db")
+    monkeypatch.setattr(day_index, "_days", {})
+    monkeypatch.setattr(availability, "_slot_cache", VersionedCache())
+    db.init_db()
+    yield
+    db.close_db()
+
+@pytest.fixture
+def decide(monkeypatch):
+    """Makes the brain return a decision with the given fields."""
+    def set_decision(**fields):
+        base = {"intent": "book", "confidence": 0.99, "reasoning": "", "response_text": "Booked."}
+        monkeypatch.setattr(agent.brain, "think", lambda *a, **k: AgentDecision(**{**base, **fields}))
+    return set_decision
+
+@pytest.mark.parametrize("target_date, target_time", [
+    (_next(5), "10:00"),  # Saturday: closed
+    (_next(2), "03:00"),  # before opening
+])
+def test_out_of_hours_slot_is_neither_safe_nor_booked(calendar, decide, target_date, target_time):
+    start_iso = f"{target_date}T{target_time}"
+    assert simulate_proposals(target_date, [{"start_iso": start_iso, "duration": 30}])[0]["recommendation"] == "unsafe"
+
+    decide(target_date=target_date, target_time=target_time, user_name="Ann", user_email="ann@example.com")
+    result = agent.handle_request("s1", "book me in", [])
+    assert result["text"].startswith("I paused this booking")
+    assert _booked_on(target_date) == []
+
+def test_open_slot_is_booked(calendar, decide):
+    day = _next(2)
+    decide(target_date=day, target_time="10:00", user_name="Ann", user_email="ann@example.com")
+    result = agent.handle_request("s1", "book me in", [])
+    assert result["data"]["type"] == "confirmation"
+    assert [a["start_iso"][:16] for a in _booked_on(day)] == [f"{day}T10:00"]
+
+@pytest.mark.parametrize("fields, recipients", [
+    ({"user_email": "ann@example.com"}, ["ann@example.com"]),
+    ({"user_email": "ann@example.com", "user_contact": "+1 555 0100"}, ["ann@example.com"]),
+    ({"user_contact": "+1 555 0100"}, []),  # no address: no email reminder
+])
+def test_email_reminders_go_to_the_email_address(calendar, decide, monkeypatch, fields, recipients):
+    monkeypatch.setenv("REMINDER_OFFSETS_HOURS", "2")
+    decide(target_date=_next(2), target_time="11:00", user_name="Ann", **fields)
+    agent.handle_request("s1", "book me in", [])
+    assert [r["recipient"] for r in db.get_pending_reminders() if r["channel"] == "email"] == recipients
+
+def _day_after(day: str, n: int = 1) -> str:
+    return (date.fromisoformat(day) + timedelta(days=n)).isoformat()
+
+@pytest.mark.parametrize("first, second, target_date, target_time, reason", [
+    # Same day, moved a day later and six hours on: the 15:30 lands at 21:30
+    ((_next(2), "10:00"), (_next(2), "15:30"), _day_after(_next(2)), "16:00", "Outside opening hours"),
+    # Thursday and Friday, moved a day later: Friday's lands on Saturday
+    ((_next(3), "10:00"), (_day_after(_next(3)), "10:00"), _day_after(_next(3)), "10:00", "Closed that day"),
+])
+def test_batch_reschedule_that_does_not_fit_moves_nothing(calendar, decide, first, second, target_date, target_time, reason):
+    booked = [agent.book_internal("Ann", "ann@example.com", "Glow Consultation", f"{d}T{t}") for d, t in (first, second)]
+
+    decide(intent="reschedule", user_email="ann@example.com", target_date=target_date, target_time=target_time)
+    result = agent.handle_request("s1", "move both of them", [])
+
+    assert reason in result["text"] and "Nothing was moved" in result["text"]
+    assert [db.get_appointment(a["id"])["start_iso"] for a in booked] == [a["start_iso"] for a in booked]
+    conflict = next(c for c in result["data"]["conflicts"] if c["reason"].startswith(reason))
+    assert conflict["id"] == booked[1]["id"]
+    if reason == "Outside opening hours":
+        assert conflict["alternatives"] and all(a.startswith(target_date) for a in conflict["alternatives"])
+        # Never where the first appointment of the batch is going
+        assert not any(a.startswith(f"{target_date}T{target_time}") for a in conflict["alternatives"])
+    else:
+        assert conflict["alternatives"] == []  # nothing opens on a closed day
@@ -0,0 +1,23 @@
+"""
+Model-output parsing: near-miss enum values are only bent into a choice
+when they name exactly one, so garbage never becomes a write intent.
+
+    python -m pytest test_decision_parsing.py
+"""
+import json
+import pytest
+
+from booking.brain import parse_decision
+
+def _reply(intent):
+    return json.dumps({"intent": intent, "confidence": 0.95, "reasoning": "", "response_text": "ok"})
+
+@pytest.mark.parametrize("intent", ["", "b", "c", "x"])
+def test_fragments_fall_back_to_question(intent):
+    assert parse_decision(_reply(intent)).intent == "question"
+
+@pytest.mark.parametrize("intent, expected", [
+    ("Book", "book"), ("booking", "book"), ("booked", "book"), ("canc", "cancel"), ("resched", "reschedule"),
+])
+def test_near_misses_are_coerced(intent, expected):
+    assert parse_decision(_reply(intent)).intent == expected
@@ -0,0 +1,49 @@
+"""
+Local NLU tier: it may book, move or cancel on its own only when the turn
+is one clear request; everything else goes to the model, or is confirmed
+first when there is no model to ask.
+
+    python -m pytest test_local_tier.py
+"""
+import pytest
+
+from booking.brain import Brain
+from booking.nlu import understand
+
+CLEAR = "book me thursday at 10, ann@example.com"
+MIXED = [
+    "book me thursday at 10 but first what does laser cost, ann@example.com",
+    "book me thursday at 10, how long is a facial? ann@example.com",
+    "cancel my appointment and also book friday at 10, ann@example.com",
+]
+
+@pytest.fixture
+def brain():
+    b = Brain()
+    b._client, b._client_ready = None, True  # no API key: only the local tier answers
+    return b
+
+def test_single_write_request_is_not_deferred():
+    assert not understand(CLEAR)["defer"]
+
+@pytest.mark.parametrize("message", MIXED)
+def test_write_with_a_question_or_second_request_is_deferred(message):
+    assert understand(message)["defer"]
+
+@pytest.mark.parametrize("message", MIXED)
+def test_mixed_turns_go_to_the_model(brain, monkeypatch, message):
+    brain._client = object()
+    monkeypatch.setattr(brain, "_think_remote", lambda *a: "remote")
+    assert brain.think(message, [], "") == "remote"
+
+@pytest.mark.parametrize("message", MIXED)
+def test_without_a_model_mixed_turns_are_confirmed_not_acted_on(brain, message):
+    decision = brain.think(message, [], "")
+    assert decision.intent == "question"
+    assert decision.missing_info == ["confirmation"]
+
+def test_without_a_model_unsure_writes_are_confirmed(brain, monkeypatch):
+    monkeypatch.setenv("NLU_LOCAL_CONFIDENCE", "2")
+    assert brain.think(CLEAR, [], "").intent == "question"
+    monkeypatch.delenv("NLU_LOCAL_CONFIDENCE")
+    assert brain.think(CLEAR, [], "").intent == "book"
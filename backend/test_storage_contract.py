@@ -0,0 +1,212 @@
+"""
+Storage contract suite, run against every backend.
+SQLite always runs; Postgres runs when TEST_DATABASE_URL points at a local
+server (its tables are dropped and recreated):
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/booking_test python -m pytest test_storage_contract.py
+"""
+import os
+import pytest
+
+from datetime import timedelta
+
+from booking.storage import Appointment, SlotConflict, SQLiteRepository, PostgresRepository
+
+PG_URL = os.getenv("TEST_DATABASE_URL")
+
+def _appt(appt_id, start, end, status="booked", contact="ann@example.com"):
+    return {"id": appt_id, "name": "Ann", "contact": contact, "service": "Glow Consultation",
+            "start_iso": f"2026-10-20T{start}:00-05:00", "end_iso": f"2026-10-20T{end}:00-05:00", "status": status}
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def repo(request, tmp_path):
+    if request.param == "sqlite":
+        r = SQLiteRepository(tmp_path / "bookings.db")
+    else:
+        if not PG_URL:
+            pytest.skip("TEST_DATABASE_URL not set")
+        r = PostgresRepository(PG_URL, pool_size=2)
+        with r.pool.connection() as con:
+            con.execute("DROP TABLE IF EXISTS appointments, preferences, waitlist, series, notifications, idempotency_keys, reminders")
+    r.init_schema()
+    yield r
+    r.close()
+
+def test_insert_and_get_roundtrip(repo):
+    repo.insert_appointment(_appt("a1", "10:00", "10:30"))
+    assert repo.get_appointment("a1") == _appt("a1", "10:00", "10:30")
+    assert repo.get_appointment("missing") is None
+
+def test_between_returns_only_active_overlaps(repo):
+    repo.insert_appointment(_appt("a1", "09:00", "09:30"))
+    repo.insert_appointment(_appt("a2", "10:00", "10:30"))
+    repo.insert_appointment(_appt("a3", "11:00", "11:30", status="cancelled"))
+    repo.insert_appointment(_appt("a4", "12:00", "12:30", status="held"))
+    found = repo.get_appointments_between("2026-10-20T09:30:00-05:00", "2026-10-20T13:00:00-05:00")
+    assert sorted(a["id"] for a in found) == ["a2", "a4"]
+
+def test_overlapping_insert_is_rejected(repo):
+    repo.insert_appointment(_appt("a1", "10:00", "10:30"))
+    with pytest.raises(SlotConflict):
+        repo.insert_appointment(_appt("a2", "10:15", "10:45"))
+    # Touching intervals are fine; cancelled ones never block
+    repo.insert_appointment(_appt("a3", "10:30", "11:00"))
+    repo.insert_appointment(_appt("a4", "10:00", "10:30", status="cancelled"))
+    assert repo.get_appointment("a2") is None
+
+def test_idempotency_key_applies_once(repo):
+    assert repo.insert_appointment(_appt("a1", "10:00", "10:30"), idempotency_key="req-1") is True
+    assert repo.insert_appointment(_appt("a2", "14:00", "14:30"), idempotency_key="req-1") is False
+    assert repo.get_appointment("a2") is None
+    assert repo.get_appointment_by_idempotency_key("req-1")["id"] == "a1"
+    assert repo.get_appointment_by_idempotency_key("req-2") is None
+    # A conflicting insert does not burn its key
+    with pytest.raises(SlotConflict):
+        repo.insert_appointment(_appt("a3", "10:15", "10:45"), idempotency_key="req-3")
+    assert repo.get_appointment_by_idempotency_key("req-3") is None
+
+def test_cancel_frees_the_slot(repo):
+    repo.insert_appointment(_appt("a1", "10:00", "10:30"))
+    repo.set_appointment_status("a1", "cancelled")
+    repo.insert_appointment(_appt("a2", "10:00", "10:30"))
+    assert repo.get_appointment("a1")["status"] == "cancelled"
+    with pytest.raises(SlotConflict):
+        repo.set_appointment_status("a1", "booked")
+
+def test_update_time_checks_conflicts(repo):
+    repo.insert_appointment(_appt("a1", "10:00", "10:30"))
+    repo.insert_appointment(_appt("a2", "11:00", "11:30"))
+    repo.update_appointment_time("a1", "2026-10-20T10:15:00-05:00", "2026-10-20T10:45:00-05:00")
+    assert repo.get_appointment("a1")["start_iso"] == "2026-10-20T10:15:00-05:00"
+    with pytest.raises(SlotConflict):
+        repo.update_appointment_time("a1", "2026-10-20T11:15:00-05:00", "2026-10-20T11:45:00-05:00")
+    assert repo.get_appointment("a1")["start_iso"] == "2026-10-20T10:15:00-05:00"
+
+def test_batch_move_is_all_or_nothing(repo):
+    repo.insert_appointment(_appt("a1", "10:00", "10:30"))
+    repo.insert_appointment(_appt("a2", "11:00", "11:30"))
+    repo.insert_appointment(_appt("a3", "12:00", "12:30"))
+    # Swapping two slots is fine once the whole batch is in place
+    a1, a2 = _appt("a1", "11:00", "11:30"), _appt("a2", "10:00", "10:30")
+    repo.move_appointments([("a1", a1["start_iso"], a1["end_iso"]), ("a2", a2["start_iso"], a2["end_iso"])])
+    assert repo.get_appointment("a1")["start_iso"] == a1["start_iso"]
+    assert repo.get_appointment("a2")["start_iso"] == a2["start_iso"]
+    # One clash (a2 onto a3) rolls back the other move too
+    a1, a2 = _appt("a1", "14:00", "14:30"), _appt("a2", "12:15", "12:45")
+    with pytest.raises(SlotConflict):
+        repo.move_appointments([("a1", a1["start_iso"], a1["end_iso"]), ("a2", a2["start_iso"], a2["end_iso"])])
+    assert repo.get_appointment("a1")["start_iso"] == _appt("a1", "11:00", "11:30")["start_iso"]
+    assert repo.get_appointment("a2")["start_iso"] == _appt("a2", "10:00", "10:30")["start_iso"]
+
+def test_user_listings(repo):
+    repo.insert_appointment(_appt("a1", "11:00", "11:30"))
+    repo.insert_appointment(_appt("a2", "09:00", "09:30"))
+    repo.insert_appointment(_appt("a3", "13:00", "13:30", status="cancelled"))
+    repo.insert_appointment(_appt("b1", "14:00", "14:30", contact="bob@example.com"))
+    assert [a["id"] for a in repo.get_active_appointments_by_email("ann@example.com")] == ["a2", "a1"]
+    assert [a["id"] for a in repo.get_all_user_appointments("ann@example.com")] == ["a3", "a1", "a2"]
+    assert [a["id"] for a in repo.get_all_appointments()] == ["b1", "a3", "a1", "a2"]
+
+def test_appointment_records(repo):
+    repo.insert_appointment(_appt("a1", "10:00", "10:30"))
+    repo.insert_appointment(Appointment(**_appt("a2", "11:00", "11:45")))
+    appt = repo.get_appointment("a2")
+    assert isinstance(appt, Appointment)
+    assert appt.to_dict() == {**appt} == _appt("a2", "11:00", "11:45")
+    assert appt.end - appt.start == timedelta(minutes=45)
+    assert appt.get("staff") is None
+    assert sorted(a.id for a in repo.iter_appointments()) == ["a1", "a2"]
+
+def test_preferences_roundtrip(repo):
+    assert repo.get_user_preferences("ann") == {}
+    repo.save_user_preferences("ann", {"notes": "mornings"})
+    repo.save_user_preferences("ann", {"notes": "mornings; quiet room"})
+    assert repo.get_user_preferences("ann") == {"notes": "mornings; quiet room"}
+
+def _entry(entry_id, service, start, end, created):
+    return {"id": entry_id, "name": "Wai", "contact": f"{entry_id}@example.com", "service": service,
+            "window_start_iso": f"2026-10-20T{start}:00-05:00", "window_end_iso": f"2026-10-20T{end}:00-05:00",
+            "status": "waiting", "created_iso": f"2026-10-19T{created}:00-05:00"}
+
+def test_waitlist_match_and_holds(repo):
+    repo.insert_waitlist_entry(_entry("w1", "facial", "09:00", "12:00", "08:00"))
+    repo.insert_waitlist_entry(_entry("w2", "facial", "09:00", "17:00", "07:00"))
+    repo.insert_waitlist_entry(_entry("w3", "laser", "09:00", "17:00", "06:00"))
+    match = repo.find_waitlist_match("facial", "2026-10-20T10:00:00-05:00", "2026-10-20T11:00:00-05:00")
+    assert match["id"] == "w2"
+    assert repo.find_waitlist_match("facial", "2026-10-20T17:00:00-05:00", "2026-10-20T18:00:00-05:00") is None
+
+    repo.update_waitlist_entry("w2", "held", "h1", "2026-10-19T09:00:00-05:00")
+    assert repo.get_waitlist_entry("w2")["hold_appt_id"] == "h1"
+    assert [e["id"] for e in repo.get_expired_waitlist_holds("2026-10-19T10:00:00-05:00")] == ["w2"]
+    assert repo.get_expired_waitlist_holds("2026-10-19T08:30:00-05:00") == []
+    assert [e["id"] for e in repo.get_all_waitlist_entries()] == ["w1", "w2", "w3"]
+    # Windows that ended are retired; held entries are left to their hold
+    assert repo.expire_waitlist_entries("2026-10-20T13:00:00-05:00") == 1
+    assert repo.get_waitlist_entry("w1")["status"] == "expired"
+    assert repo.get_waitlist_entry("w2")["status"] == "held"
+
+def test_series_lifecycle(repo):
+    series = {"id": "s1", "name": "Ann", "contact": "ann@example.com", "service": "Glow Consultation",
+              "rrule": "FREQ=WEEKLY;COUNT=4", "dtstart_iso": "2026-10-20T10:00:00-05:00",
+              "until_iso": "2026-11-10T10:30:00-06:00", "duration_minutes": 30, "status": "booked"}
+    repo.insert_series(series)
+    assert repo.get_series("s1") == series
+    assert [s["id"] for s in repo.get_series_between("2026-10-27T00:00:00-05:00", "2026-10-28T00:00:00-05:00")] == ["s1"]
+    assert repo.get_series_between("2026-12-01T00:00:00-06:00", "2026-12-02T00:00:00-06:00") == []
+    repo.set_series_status("s1", "cancelled")
+    assert repo.get_series_between("2026-10-27T00:00:00-05:00", "2026-10-28T00:00:00-05:00") == []
+    assert [s["status"] for s in repo.get_all_series()] == ["cancelled"]
+
+def test_series_occurrences_block_writes(repo):
+    repo.insert_series({"id": "s1", "name": "Ann", "contact": "ann@example.com", "service": "Glow Consultation",
+                        "rrule": "FREQ=WEEKLY;COUNT=4", "dtstart_iso": "2026-10-13T10:00:00-05:00",
+                        "until_iso": "2026-11-03T10:30:00-06:00", "duration_minutes": 30, "status": "booked"})
+    # 2026-10-20 10:00 is the second occurrence
+    with pytest.raises(SlotConflict):
+        repo.insert_appointment(_appt("a1", "10:15", "10:45"))
+    repo.insert_appointment(_appt("a2", "10:30", "11:00"))
+    with pytest.raises(SlotConflict):
+        repo.update_appointment_time("a2", "2026-10-20T09:45:00-05:00", "2026-10-20T10:15:00-05:00")
+    repo.insert_appointment(_appt("a3", "10:00", "10:30", status="cancelled"))
+    with pytest.raises(SlotConflict):
+        repo.set_appointment_status("a3", "booked")
+    repo.set_series_status("s1", "cancelled")
+    repo.set_appointment_status("a3", "booked")
+
+def test_overlapping_series_insert_is_rejected(repo):
+    def series(series_id, dtstart, status="booked"):
+        return {"id": series_id, "name": "Ann", "contact": "ann@example.com", "service": "Glow Consultation",
+                "rrule": "FREQ=WEEKLY;COUNT=4", "dtstart_iso": f"2026-10-13T{dtstart}:00-05:00",
+                "until_iso": "2026-11-03T11:00:00-06:00", "duration_minutes": 30, "status": status}
+    # 2026-10-20 is the second week of each series
+    repo.insert_appointment(_appt("a1", "10:15", "10:45"))
+    with pytest.raises(SlotConflict):
+        repo.insert_series(series("s1", "10:00"))
+    assert repo.get_series("s1") is None
+    repo.insert_series(series("s2", "10:45"))  # touching the appointment is fine
+    with pytest.raises(SlotConflict):
+        repo.insert_series(series("s3", "10:50"))  # overlaps every occurrence of s2
+    repo.insert_series(series("s4", "10:00", status="cancelled"))  # inactive series never conflict
+    repo.set_appointment_status("a1", "cancelled")
+    repo.insert_series(series("s1", "10:00"))
+    assert sorted(s["id"] for s in repo.get_all_series()) == ["s1", "s2", "s4"]
+
+def test_queue_notification(repo):
+    repo.queue_notification("email", "ann@example.com", "Hi", "Body", "2026-10-19T08:00:00-05:00")
+
+def test_reminder_lifecycle(repo):
+    def reminder(rid, appt_id, channel="email", due="2026-10-19T15:00:00+00:00"):
+        return {"id": rid, "appointment_id": appt_id, "channel": channel, "recipient": "ann@example.com",
+                "due_iso": due, "status": "pending", "created_iso": "2026-10-19T09:00:00+00:00"}
+    repo.insert_reminders([reminder("r1", "a1"), reminder("r2", "a1", "sms"), reminder("r3", "a2")])
+    assert sorted(r["id"] for r in repo.get_pending_reminders()) == ["r1", "r2", "r3"]
+    assert repo.claim_reminder("r3") is True
+    assert repo.claim_reminder("r3") is False  # a second worker loses the race
+    repo.finish_reminder("r3", "pending", "2026-10-19T15:05:00+00:00")
+    retried = next(r for r in repo.get_pending_reminders() if r["id"] == "r3")
+    assert retried["attempts"] == 1 and retried["due_iso"] == "2026-10-19T15:05:00+00:00"
+    assert sorted(repo.cancel_reminders("a1")) == ["email", "sms"]
+    assert repo.cancel_reminders("a1") == []
+    assert repo.claim_reminder("r1") is False
+    assert [r["id"] for r in repo.get_pending_reminders()] == ["r3"]
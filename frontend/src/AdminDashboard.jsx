@@ -8,6 +8,7 @@ const API_URL = 'http://localhost:8000';
 export default function AdminDashboard({ onClose }) {
     const [appointments, setAppointments] = useState([]);
     const [loading, setLoading] = useState(true);
+    const [integrity, setIntegrity] = useState(null);
 
     const fetchAppointments = async () => {
         setLoading(true);
@@ -17,6 +18,8 @@ export default function AdminDashboard({ onClose }) {
             // But I'll add the endpoint to backend/main.py next
             const res = await axios.get(`${API_URL}/admin/appointments`);
             setAppointments(res.data);
+            const health = await axios.get(`${API_URL}/admin/integrity`, { params: { days: 1 } });
+            setIntegrity(health.data[0]);
         } catch (e) {
             console.error("Failed to fetch", e);
         } finally {
@@ -62,6 +65,12 @@ export default function AdminDashboard({ onClose }) {
                 <h2 style={{ fontSize: '2rem', fontWeight: 'bold', margin: 0, background: 'linear-gradient(to right, #6366f1, #ec4899)', WebkitBackgroundClip: 'text', WebkitTextFillColor: 'transparent' }}>
                     Aura Dashboard
                 </h2>
+                {integrity && (
+                    <div style={{ display: 'flex', alignItems: 'center', gap: '8px', opacity: 0.8 }} title="Calendar Integrity Score (today)">
+                        <Calendar size={16} />
+                        Integrity {integrity.score}/100
+                    </div>
+                )}
                 <button
                     onClick={onClose}
                     style={{ background: 'transparent', border: '1px solid rgba(255,255,255,0.2)', color: 'white', padding: '10px 20px', borderRadius: '8px' }}
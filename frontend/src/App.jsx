@@ -9,6 +9,22 @@ import AdminDashboard from './AdminDashboard'
 // Use VITE_API_URL if set (Production), otherwise localhost (Development)
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000'
 
+// One session per browser: the server orders turns and rate-limits per session
+const SESSION_KEY = 'aura-session-id'
+function browserSessionId() {
+    try {
+        let id = localStorage.getItem(SESSION_KEY)
+        if (!id) {
+            id = crypto.randomUUID()
+            localStorage.setItem(SESSION_KEY, id)
+        }
+        return id
+    } catch {
+        return crypto.randomUUID() // storage blocked (private mode): per page load
+    }
+}
+const SESSION_ID = browserSessionId()
+
 // --- FUTURISTIC SPACE BACKGROUND ---
 function Asteroid({ position, color, scale }) {
     const mesh = useRef()
@@ -188,6 +204,9 @@ export default function App() {
     const [systemState, setSystemState] = useState('idle')
     const [showAdmin, setShowAdmin] = useState(false)
     const [isListening, setIsListening] = useState(false)
+    const [isLoading, setIsLoading] = useState(false)
+    const sending = useRef(false) // set synchronously, so a second Enter in the same tick sees it
+    const pendingTurn = useRef(null) // the turn in flight, or the last one that failed
     const messagesEndRef = useRef(null)
 
     useEffect(() => { messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' }) }, [messages, systemState])
@@ -223,14 +242,29 @@ export default function App() {
 
     const handleSend = async (text = null) => {
         const userMsg = text || inputValue.trim()
-        if (!userMsg) return
-        setMessages(prev => [...prev, { role: 'user', text: userMsg, type: 'text' }])
+        if (!userMsg || sending.current) return
+        sending.current = true
+        setIsLoading(true)
+        // One id per turn: resending a failed turn reuses its id and history, so the
+        // server merges it with a request that did get through and answers (and books) once
+        const retry = pendingTurn.current?.message === userMsg
+        const turn = retry ? pendingTurn.current : {
+            message: userMsg,
+            request_id: crypto.randomUUID(),
+            history: messages.map(m => ({ role: m.role === 'agent' ? 'assistant' : 'user', content: m.text })),
+        }
+        pendingTurn.current = turn
+        if (!retry) setMessages(prev => [...prev, { role: 'user', text: userMsg, type: 'text' }])
         setInputValue('')
         setSystemState('thinking')
 
         try {
-            const history = messages.map(m => ({ role: m.role === 'agent' ? 'assistant' : 'user', content: m.text }))
-            const res = await axios.post(`${API_URL}/chat`, { session_id: 'space-user', message: userMsg, history })
+            const payload = { session_id: SESSION_ID, ...turn }
+            const res = await axios.post(`${API_URL}/chat`, payload).catch(err => {
+                if (err.response) throw err
+                return axios.post(`${API_URL}/chat`, payload) // network blip: retry the same turn
+            })
+            pendingTurn.current = null
             const { text: responseText, data } = res.data
 
             setTimeout(() => {
@@ -246,6 +280,9 @@ export default function App() {
         } catch (error) {
             setSystemState('idle')
             setMessages(prev => [...prev, { role: 'agent', text: "Signal Lost. Please retry.", type: 'text' }])
+        } finally {
+            sending.current = false
+            setIsLoading(false)
         }
     }
     const handleSlotClick = (slot) => handleSend(`Book ${new Date(slot).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })}`)
@@ -298,7 +335,7 @@ export default function App() {
                             style={{ flex: 1, background: 'rgba(255,255,255,0.05)', border: '1px solid rgba(255,255,255,0.1)', borderRadius: '12px', padding: '15px', color: 'white', outline: 'none' }}
                         />
                         <button onClick={toggleMic} style={{ width: '50px', borderRadius: '12px', border: 'none', background: isListening ? '#ff416c' : 'rgba(255,255,255,0.1)', color: 'white', cursor: 'pointer' }}><Mic /></button>
-                        <button onClick={() => handleSend()} style={{ width: '50px', borderRadius: '12px', border: 'none', background: 'linear-gradient(to right, #00c6ff, #0072ff)', color: 'white', cursor: 'pointer' }}><Send /></button>
+                        <button onClick={() => handleSend()} disabled={isLoading} style={{ width: '50px', borderRadius: '12px', border: 'none', background: 'linear-gradient(to right, #00c6ff, #0072ff)', color: 'white', cursor: isLoading ? 'wait' : 'pointer', opacity: isLoading ? 0.5 : 1 }}><Send /></button>
                     </div>
                 </div>
                 <AnimatePresence>{showAdmin && <AdminDashboard onClose={() => setShowAdmin(false)} />}</AnimatePresence>